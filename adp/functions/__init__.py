@@ -5,10 +5,14 @@ from adp.functions.picture_finder_concurrent import *
 from adp.functions.picture_finder_concurrent_one_folder import *
 from adp.functions.duplicates_finder_serial import *
 from adp.functions.duplicates_finder_concurrent import *
+from adp.functions.results_io import *
+from adp.functions.thumbnail_store import *
+from adp.functions.thumbnail_scheduler import *
 
 exclude = ["exclude", "functions", "tools", 'dataklasses',
 		   'duplicates_finder_serial', 'duplicates_finder_concurrent',
-		   "picture_finder_concurrent", 'picture_finder_concurrent_one_folder',]
+		   "picture_finder_concurrent", 'picture_finder_concurrent_one_folder',
+		   'results_io', 'thumbnail_store', 'thumbnail_scheduler']
 
 __all__ = [
 	name for name in dir()
@@ -31,10 +31,14 @@ __email__ = "julianchiayh@gmail.com"
 
 @dataklass
 class RasterImage:
-    """A dataklass to store the hashhex, path and size of a raster image."""
+    """A dataklass to store the hashhex, path, size, pixel width and height
+    and creation time of a raster image."""
     hashhex: str
     path: str
     size: int
+    width: int
+    height: int
+    ctime: float
 
 
 def fast_scandir(dirname: Union[str, bytes, os.PathLike]):
@@ -93,7 +97,9 @@ def scandir_images(dirpath: Union[str, bytes, os.PathLike]) -> Generator[
                     im.close()
                     hashhex = hashlib.sha3_256(img).hexdigest()
                     del img
-                    yield RasterImage(hashhex, itr.path, os.stat(itr).st_size)
+                    stat = itr.stat()
+                    yield RasterImage(hashhex, itr.path, stat.st_size, *csize,
+                                      stat.st_ctime)
 
 
 def list_scandir_images(path: Union[str, bytes, os.PathLike]) -> list:
@@ -31,6 +31,9 @@ class RasterImage:
     hashhex: str
     path: str
     size: int
+    width: int
+    height: int
+    ctime: float
 
 
 def get_filepaths_in(folder: Union[str, bytes, os.PathLike],) -> Generator:
@@ -69,7 +72,9 @@ def get_image(filepath: Union[str, bytes, os.PathLike]) -> RasterImage:
             img = np.asarray(im)
             im.close()
             hashhex = hashlib.sha3_256(img).hexdigest()
-            return RasterImage(hashhex, filepath, os.stat(filepath).st_size)
+            stat = os.stat(filepath)
+            return RasterImage(hashhex, filepath, stat.st_size, *csize,
+                               stat.st_ctime)
 
 
 def get_rasterimages_in_one_folder_concurrently(
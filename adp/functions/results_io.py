@@ -0,0 +1,248 @@
+# Python modules
+import os
+import csv
+import json
+import zipfile
+from itertools import islice, count
+from functools import partial
+from operator import itemgetter, attrgetter
+from pathlib import Path
+from typing import Union, Iterable, Iterator, Generator
+
+# Package module
+from adp.functions.picture_finder_concurrent import RasterImage
+
+# External Packages
+import numpy as np
+
+__all__ = ["write_rows", "read_rows", "export_rasterimages",
+           "import_rasterimages", "export_duplicates", "import_duplicates"]
+__version__ = '0.1.1'
+__license__ = "Apache License, Version 2.0"
+__copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
+__author__ = 'Chia Yan Hon, Julian.'
+__email__ = "julianchiayh@gmail.com"
+
+FORMATS = {".jsonl": "jsonl", ".csv": "csv", ".npz": "npz"}
+CHUNKSIZE = 50_000  # rows held in memory when writing/reading a .npz file
+
+
+def _get_format(path: Union[str, os.PathLike], fmt: str = None) -> str:
+    """Function returns the file format of `path` from its suffix when `fmt`
+    is not given."""
+    if fmt is None:
+        try:
+            fmt = FORMATS[Path(path).suffix.lower()]
+        except KeyError:
+            raise ValueError(f"The suffix of {path} must be one of these: "
+                             f"{tuple(FORMATS)}, else 'fmt' must be given.")
+    if fmt not in FORMATS.values():
+        raise ValueError(f"fmt={fmt} is invalid. It's value must be one of "
+                         f"these: {tuple(FORMATS.values())}.")
+    return fmt
+
+
+def _chunk_to_array(chunk: list, fields: tuple) -> np.ndarray:
+    """Function to convert a list of rows to a numpy structured array. str
+    columns are stored as UTF-8 encoded bytes. An int or str column with None
+    values gets an extra '<field>.null' bool column."""
+    columns = []
+    dtype = []
+    for field, column in zip(fields, zip(*chunk)):
+        types = set(map(type, column))
+        hasnull = type(None) in types
+        types.discard(type(None))
+        if types <= {int, bool}:
+            if hasnull:
+                columns.append([0 if v is None else v for v in column])
+                columns.append([v is None for v in column])
+                dtype.append((field, np.int64))
+                dtype.append((f"{field}.null", np.bool_))
+            else:
+                columns.append(column)
+                dtype.append((field, np.int64))
+        elif types <= {int, float, bool}:
+            columns.append([np.nan if v is None else v for v in column])
+            dtype.append((field, np.float64))
+        else:
+            if types == {str} and not hasnull:
+                try:
+                    column = np.array(column, dtype="S")  # ASCII only
+                except UnicodeEncodeError:
+                    column = [v.encode() for v in column]
+            else:
+                nulls = [v is None for v in column]
+                column = [b"" if v is None else str(v).encode() for v in
+                          column]
+            columns.append(column)
+            dtype.append((field, f"S{max(map(len, column), default=1) or 1}"))
+            if hasnull:
+                columns.append(nulls)
+                dtype.append((f"{field}.null", np.bool_))
+    array = np.empty(len(chunk), dtype=dtype)
+    for (name, _), column in zip(dtype, columns):
+        array[name] = column
+    return array
+
+
+def _array_to_rows(array: np.ndarray, fields: tuple) -> Iterator[tuple]:
+    """Function to convert a numpy structured array created by
+    _chunk_to_array() back to rows."""
+    names = array.dtype.names
+    columns = []
+    for field in fields:
+        column = array[field]
+        match column.dtype.kind:
+            case "S":
+                values = [v.decode() for v in column.tolist()]
+            case "f":
+                values = [None if np.isnan(v) else v for v in column.tolist()]
+            case _:
+                values = column.tolist()
+        if f"{field}.null" in names:
+            values = [None if null else v for v, null in
+                      zip(values, array[f"{field}.null"].tolist())]
+        columns.append(values)
+    return zip(*columns)
+
+
+def write_rows(rows: Iterable[tuple], fields: tuple,
+               path: Union[str, os.PathLike], fmt: str = None) -> int:
+    """Function to stream `rows` into a JSON Lines, CSV or .npz file and
+    returns the quantity of rows written. The file format is given by `fmt`
+    or else by the suffix of `path`. Only one row (JSON Lines or CSV) or one
+    chunk of rows (.npz) is held in memory at a time.
+
+    rows - an iterable of tuples of values
+    fields - the names of the values of each row
+    """
+    fields = tuple(fields)
+    nrows = 0
+    match _get_format(path, fmt):
+        case "jsonl":
+            with open(path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(fields, row))))
+                    f.write("\n")
+                    nrows += 1
+        case "csv":
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(fields)
+                for row in rows:
+                    writer.writerow(["" if v is None else v for v in row])
+                    nrows += 1
+        case "npz":
+            if hasattr(rows, "fetchmany"):  # a sqlite3.Cursor
+                next_chunk = partial(rows.fetchmany, CHUNKSIZE)
+            else:
+                next_chunk = partial(lambda i: list(islice(i, CHUNKSIZE)),
+                                     iter(rows))
+            with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+                with zf.open("fields.npy", "w") as f:
+                    np.lib.format.write_array(f, np.array(fields),
+                                              allow_pickle=False)
+                for n in count():
+                    chunk = next_chunk()
+                    if not chunk:
+                        break
+                    with zf.open(f"chunk{n:06d}.npy", "w",
+                                 force_zip64=True) as f:
+                        np.lib.format.write_array(
+                            f, _chunk_to_array(chunk, fields),
+                            allow_pickle=False)
+                    nrows += len(chunk)
+    return nrows
+
+
+def read_rows(path: Union[str, os.PathLike], fmt: str = None) -> \
+        Generator[tuple, None, None]:
+    """Function to stream the rows of a file written by write_rows(). The
+    first tuple that is yielded contains the names of the fields; it is
+    followed by one tuple per row. Empty CSV values are read as None. The
+    names are an empty tuple when they are not in the file, i.e. it is an
+    empty JSON Lines or CSV file."""
+    match _get_format(path, fmt):
+        case "jsonl":
+            with open(path, "r", encoding="utf-8") as f:
+                fields = None
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if fields is None:
+                        fields = tuple(record)
+                        yield fields
+                    yield tuple(record[i] for i in fields)
+                if fields is None:  # no rows
+                    yield ()
+        case "csv":
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                fields = tuple(next(reader, ()))
+                yield fields
+                for row in reader:
+                    yield tuple(None if v == "" else v for v in row)
+        case "npz":
+            with np.load(path, allow_pickle=False) as npz:
+                fields = tuple(npz["fields"].tolist())
+                yield fields
+                for name in sorted(i for i in npz.files if
+                                   i.startswith("chunk")):
+                    yield from _array_to_rows(npz[name], fields)
+
+
+def export_rasterimages(rasterimages: Iterable[RasterImage],
+                        path: Union[str, os.PathLike], fmt: str = None) -> int:
+    """Function to export the hash inventory of the found pictures, i.e.
+    their RasterImage instances, to a JSON Lines, CSV or .npz file."""
+    fields = tuple(RasterImage.__match_args__)
+    rows = map(attrgetter(*fields), rasterimages)
+    return write_rows(rows, fields, path, fmt)
+
+
+def import_rasterimages(path: Union[str, os.PathLike], fmt: str = None) -> \
+        Generator[RasterImage, None, None]:
+    """Function to stream the RasterImage instances that were exported by
+    export_rasterimages(). The width, height and creation time of the
+    pictures are 0 when they are not in the file, e.g. it was exported by an
+    older version."""
+    rows = read_rows(path, fmt)
+    fields = next(rows)
+    if not fields:  # an empty file
+        return
+    names = [i for i in RasterImage.__match_args__ if i in fields]
+    missing = (0,) * (len(RasterImage.__match_args__) - len(names))
+    getter = itemgetter(*(fields.index(i) for i in names))
+    if _get_format(path, fmt) == "csv":  # values are str
+        numbers = {i: t for i in names if
+                   (t := RasterImage.__annotations__[i]) in (int, float)}
+        for row in rows:
+            ri = RasterImage(*getter(row), *missing)
+            for i, t in numbers.items():
+                setattr(ri, i, t(getattr(ri, i)))
+            yield ri
+    else:
+        for row in rows:
+            yield RasterImage(*getter(row), *missing)
+
+
+def export_duplicates(duplicates: dict, path: Union[str, os.PathLike],
+                      fmt: str = None) -> int:
+    """Function to export the duplicates found by detect_duplicates_serially()
+    or detect_duplicates_concurrently(), i.e. a dict of
+    {hashhex: {path1, path2, ...}}, as one (hashhex, path) row per picture."""
+    rows = ((k, p) for k, v in duplicates.items() for p in sorted(v))
+    return write_rows(rows, ("hashhex", "path"), path, fmt)
+
+
+def import_duplicates(path: Union[str, os.PathLike], fmt: str = None) -> dict:
+    """Function returns the dict of {hashhex: {path1, path2, ...}} that was
+    exported by export_duplicates()."""
+    rows = read_rows(path, fmt)
+    next(rows)  # fields
+    duplicates = {}
+    for hashhex, path in rows:
+        duplicates.setdefault(hashhex, set()).add(path)
+    return duplicates
+
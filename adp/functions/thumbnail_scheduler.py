@@ -0,0 +1,308 @@
+# Python modules
+import os
+import heapq
+import queue
+import logging
+import threading
+import concurrent.futures as cf
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from itertools import count
+from typing import Callable, Iterable, Union
+
+# External Packages
+from PIL import Image
+
+# Project module
+from adp.functions.thumbnail_store import image_to_ppm
+
+__all__ = ["ThumbnailScheduler"]
+__version__ = '0.1.1'
+__license__ = "Apache License, Version 2.0"
+__copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
+__author__ = 'Chia Yan Hon, Julian.'
+__email__ = "julianchiayh@gmail.com"
+
+logger = logging.getLogger(__name__)
+
+# Priorities of jobs; a lower value is served first.
+VISIBLE = 0  # thumbnails in the viewport
+ADJACENT = 1  # thumbnails of the pages around the viewport
+PREFETCH = 2  # thumbnails of the upcoming pages
+
+_slabs = {}  # {name: shared_memory.SharedMemory, ...} attached by a worker
+
+
+def _thumbnail_to_slab(fn: Callable, name: str, offset: int, size: int,
+                       fpath: str) -> tuple[int, int]:
+    """Function runs in a worker process. It writes the RGB pixels of the
+    thumbnail fn(fpath) into the slot of `size` bytes at `offset` of the
+    shared memory `name` and returns the width and height of the thumbnail,
+    i.e. no image is pickled."""
+    try:
+        shm = _slabs[name]
+    except KeyError:
+        shm = _slabs[name] = shared_memory.SharedMemory(name)
+    img = fn(fpath)
+    data = img.tobytes() if img.mode == "RGB" else \
+        img.convert("RGB").tobytes()
+    if len(data) > size:
+        raise ValueError(f"{img.size=} does not fit in a slot of {size} "
+                         f"bytes.")
+    shm.buf[offset:offset + len(data)] = data
+    return img.width, img.height
+
+
+def _thumbnail_to_ppm(fn: Callable, fpath: str) -> bytes:
+    """Function runs in a worker. It returns the thumbnail fn(fpath) as PPM
+    bytes."""
+    return image_to_ppm(fn(fpath))
+
+
+class ThumbnailScheduler:
+    """Class to convert pictures to thumbnails with a persistent
+    concurrent.futures executor in the order of the priority of their jobs,
+    i.e. VISIBLE, ADJACENT and then PREFETCH jobs. At most `ncpu` jobs are
+    given to the executor at a time, so a job that is submitted later with a
+    higher priority waits for at most one job per worker. Jobs that have not
+    started can be cancelled, e.g. when their groups are scrolled out of
+    range, and upgraded to a higher priority.
+
+    A job is a (giid, fiid, fpath) tuple. Its result is put in `rqueue` as
+    ("thumbnail", (giid, fiid, fpath, fn(fpath))). ("completed", ()) is put in
+    `rqueue` whenever the last VISIBLE or ADJACENT job is done, and at the
+    exit of a .batch() that leaves no VISIBLE or ADJACENT job, i.e. not while
+    the jobs of a batch are being cancelled and submitted. A job that fails
+    is logged and does not put a "thumbnail" in `rqueue`.
+
+    With cfe="process", the worker processes return the thumbnails, which
+    must fit in psize, through a slab of shared memory with one slot of RGB
+    pixels per running job instead of pickling them.
+
+    With ppm=True, the thumbnails are put in `rqueue` as PPM bytes, see
+    image_to_ppm(), instead of PIL.Image.Image instances. They are prepared
+    by the workers, i.e. only a header is added to the pixels of a slot.
+
+    User Methods:
+    .submit(giid, fiid, fpath, priority) - schedule a job
+    .prioritize(giids, priority) - upgrade the jobs of giids to priority
+    .cancel(giids=None, priority=None) - cancel the jobs that have not started
+    .batch() - context manager to cancel and submit jobs as one update
+    .shutdown() - cancel all jobs and shut down the executor
+    """
+
+    def __init__(self, fn: Callable, rqueue: queue.Queue,
+                 ncpu: int = os.cpu_count(), cfe: str = "process",
+                 psize: tuple[int, int] = (200, 200), ppm: bool = False):
+        self.fn = fn  # picklable when cfe="process"
+        self.rqueue = rqueue
+        self.ncpu = ncpu
+        self.ppm = ppm
+        self._slab = None  # shared_memory.SharedMemory
+        self._slot_bytes = psize[0] * psize[1] * 3  # RGB
+        self._free_slots = []  # of self._slab
+        self._slots = {}  # {(giid, fiid): slot, ...} of running jobs
+        match cfe:
+            case "process":
+                self._executor = cf.ProcessPoolExecutor(max_workers=ncpu)
+                try:
+                    self._slab = shared_memory.SharedMemory(
+                        create=True, size=ncpu * self._slot_bytes)
+                except OSError as exc:
+                    logger.warning("Thumbnails are pickled: %s", exc)
+                else:
+                    self._free_slots = list(range(ncpu))
+            case "thread":
+                self._executor = cf.ThreadPoolExecutor(
+                    max_workers=ncpu, thread_name_prefix="thumbnail")
+            case _:
+                raise ValueError(f"cfe={cfe} is invalid. It's value must be "
+                                 f"one of these: ('process', 'thread').")
+        self._lock = threading.RLock()  # done callbacks can run in submit
+        self._heap = []  # [(priority, seq, giid, fiid), ...]
+        self._jobs = {}  # {(giid, fiid): [priority, seq, fpath, future], ...}
+        self._groups = {}  # {giid: {fiid, ...}, ...} of self._jobs
+        self._seq = count()
+        self._nrunning = 0  # jobs given to the executor
+        self._nforeground = 0  # VISIBLE and ADJACENT jobs
+        self._nbatches = 0  # nested self.batch() contexts
+
+    def __len__(self):
+        """Quantity of jobs. It is read without the lock, e.g. by a poller of
+        rqueue, i.e. when it is 0, ("completed", ()) is already in rqueue."""
+        return len(self._jobs)
+
+    @property
+    def nforeground(self) -> int:
+        return self._nforeground
+
+    def submit(self, giid: str, fiid: str, fpath: str,
+               priority: int = VISIBLE) -> None:
+        """Method to schedule the conversion of the picture at fpath. A job
+        that is already scheduled is upgraded when priority is higher."""
+        with self._lock:
+            job = self._jobs.get((giid, fiid))
+            if job is None:
+                self._jobs[giid, fiid] = [priority, next(self._seq), fpath,
+                                          None]
+                self._groups.setdefault(giid, set()).add(fiid)
+                if priority < PREFETCH:
+                    self._nforeground += 1
+                heapq.heappush(self._heap,
+                               (priority, self._jobs[giid, fiid][1], giid,
+                                fiid))
+            else:
+                self._upgrade(giid, fiid, job, priority)
+            self._dispatch()
+
+    def prioritize(self, giids: Iterable[str], priority: int = VISIBLE) \
+            -> None:
+        """Method to upgrade the jobs of giids that have not started to
+        priority."""
+        with self._lock:
+            for giid in giids:
+                for fiid in self._groups.get(giid, ()):
+                    self._upgrade(giid, fiid, self._jobs[giid, fiid],
+                                  priority)
+
+    def cancel(self, giids: Iterable[str] = None, priority: int = None) \
+            -> None:
+        """Method to cancel the jobs that have not started, i.e. of giids
+        and/or of priority, or all of them when neither is given."""
+        with self._lock:
+            if giids is None:
+                giids = list(self._groups)
+            for giid in giids:
+                for fiid in list(self._groups.get(giid, ())):
+                    job = self._jobs[giid, fiid]
+                    if job[3] is None and priority in (None, job[0]):
+                        self._remove(giid, fiid)
+
+    @contextmanager
+    def batch(self):
+        """Context manager to cancel and submit jobs as one update. No
+        ("completed", ()) is put in self.rqueue within it, even when the jobs
+        given to the executor are done before the others are submitted. It is
+        put once at its exit if no VISIBLE or ADJACENT job is left."""
+        with self._lock:
+            self._nbatches += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._nbatches -= 1
+                if not self._nbatches and not self._nforeground:
+                    self.rqueue.put(("completed", ()))
+
+    def shutdown(self) -> None:
+        """Method to cancel all jobs, wait for the running jobs and shut down
+        the executor."""
+        self.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._slab is not None:
+            self._slab.close()
+            self._slab.unlink()
+            self._slab = None
+
+    def _upgrade(self, giid: str, fiid: str, job: list, priority: int) \
+            -> None:
+        if job[3] is not None or priority >= job[0]:
+            return  # started or not higher
+        if job[0] >= PREFETCH > priority:
+            self._nforeground += 1
+        job[0], job[1] = priority, next(self._seq)
+        heapq.heappush(self._heap, (priority, job[1], giid, fiid))  # the old
+        # entry is outdated and skipped by self._dispatch()
+
+    def _remove(self, giid: str, fiid: str, done: bool = False) -> None:
+        # "completed" is put before the job leaves self._jobs, i.e. a poller
+        # that sees len(self) == 0 finds it in self.rqueue.
+        job = self._jobs[giid, fiid]
+        if job[0] < PREFETCH:
+            self._nforeground -= 1
+            if done and not self._nforeground and not self._nbatches:
+                self.rqueue.put(("completed", ()))
+        del self._jobs[giid, fiid]
+        self._groups[giid].discard(fiid)
+        if not self._groups[giid]:
+            del self._groups[giid]
+
+    def _dispatch(self) -> None:
+        """Method to give the highest priority jobs to the executor."""
+        while self._heap and self._nrunning < self.ncpu:
+            priority, seq, giid, fiid = heapq.heappop(self._heap)
+            job = self._jobs.get((giid, fiid))
+            if job is None or job[1] != seq or job[3] is not None:
+                continue  # cancelled or outdated entry
+            try:
+                if self._slab is None and self.ppm:
+                    job[3] = self._executor.submit(_thumbnail_to_ppm, self.fn,
+                                                   job[2])
+                elif self._slab is None:
+                    job[3] = self._executor.submit(self.fn, job[2])
+                else:
+                    slot = self._free_slots.pop()
+                    job[3] = self._executor.submit(
+                        _thumbnail_to_slab, self.fn, self._slab.name,
+                        slot * self._slot_bytes, self._slot_bytes, job[2])
+                    self._slots[giid, fiid] = slot
+            except RuntimeError:  # the executor is shut down
+                if self._slab is not None:
+                    self._free_slots.append(slot)
+                self._heap.clear()
+                return
+            self._nrunning += 1
+            job[3].add_done_callback(
+                lambda future, key=(giid, fiid): self._done(key, future))
+
+    def _done(self, key: tuple, future: cf.Future) -> None:
+        with self._lock:
+            self._nrunning -= 1
+            giid, fiid = key
+            fpath = self._jobs[key][2]
+            slot = self._slots.pop(key, None)
+            if not future.cancelled():
+                try:
+                    img = future.result()
+                    if slot is not None:
+                        img = self._read_slot(slot, *img)
+                    self.rqueue.put(("thumbnail", (giid, fiid, fpath, img)))
+                except Exception as exc:
+                    logger.warning("Thumbnail of %s is not created: %s",
+                                   fpath, exc)
+            if slot is not None:
+                self._free_slots.append(slot)
+            self._remove(giid, fiid, done=True)
+            self._dispatch()
+
+    def _read_slot(self, slot: int, width: int, height: int) \
+            -> Union[Image.Image, bytes]:
+        """Method returns the thumbnail in a slot of self._slab."""
+        offset = slot * self._slot_bytes
+        data = self._slab.buf[offset:offset + width * height * 3]
+        if self.ppm:
+            return b"P6 %d %d 255\n" % (width, height) + data
+        return Image.frombytes("RGB", (width, height), bytes(data))
+
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+    from time import perf_counter
+    from adp.widgets.w_dupgroups import get_thumbnail
+
+    # Schedule the pictures of a folder as PREFETCH jobs, then its last 8
+    # pictures as VISIBLE jobs, which are served first.
+    source = Path(sys.argv[1] if len(sys.argv) > 1 else
+                  Path.home() / "Pictures")
+    paths = [str(i) for i in source.rglob("*.jp*g")][:100]
+    rqueue = queue.Queue()
+    scheduler = ThumbnailScheduler(get_thumbnail, rqueue, cfe="thread")
+    start = perf_counter()
+    for n, p in enumerate(paths):
+        scheduler.submit("G0", f"G0_{n}", p, PREFETCH)
+    for n, p in enumerate(paths[-8:], len(paths) - 8):
+        scheduler.submit("G0", f"G0_{n}", p, VISIBLE)
+    while (info := rqueue.get())[0] != "completed":
+        print(f"{info[1][1]} in {perf_counter() - start:.4f} secs")
+    scheduler.shutdown()
@@ -0,0 +1,521 @@
+# Python modules
+import os
+import mmap
+import sqlite3
+import threading
+import io
+import hashlib
+import tempfile
+import urllib.parse
+from collections import OrderedDict
+from pathlib import Path
+from typing import Union
+
+# External Packages
+from PIL import Image, ExifTags
+from PIL.PngImagePlugin import PngInfo
+
+__all__ = ["ThumbnailStore", "ThumbnailCache", "get_thumbnail_store",
+           "get_freedesktop_thumbnail", "put_freedesktop_thumbnail",
+           "get_exif_thumbnail", "get_thumbnail_size", "image_to_ppm"]
+__version__ = '0.1.1'
+__license__ = "Apache License, Version 2.0"
+__copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
+__author__ = 'Chia Yan Hon, Julian.'
+__email__ = "julianchiayh@gmail.com"
+
+XDG_CACHE_HOME = Path(os.environ.get("XDG_CACHE_HOME",
+                                     Path.home() / ".cache"))
+CACHE_DIR = XDG_CACHE_HOME / "adp"
+FREEDESKTOP_DIR = XDG_CACHE_HOME / "thumbnails"
+# The max. pixel width and height of the thumbnails of each size flavour of
+# the freedesktop.org Thumbnail Managing Standard.
+FREEDESKTOP_SIZES = {"normal": 128, "large": 256, "x-large": 512,
+                     "xx-large": 1024}
+CAPACITY = 256 * 1024 * 1024  # max. bytes of the atlas files of a store
+SLOTS_PER_ATLAS = 2048  # max. thumbnails in an atlas file
+CACHE_BYTES = 64 * 1024 * 1024  # budget of a ThumbnailCache
+
+
+class ThumbnailStore:
+    """Class to persist thumbnails in a few memory-mapped atlas files, i.e.
+    in fixed-size slots of raw RGB pixels, with a sqlite3 index that is keyed
+    by the path of their picture and validated by its byte size and
+    modification time. Getting a stored thumbnail is a copy of its slot
+    instead of the decoding of its picture.
+
+    The atlas files are sparse, i.e. only written slots use disk space, and
+    they use at most `capacity` bytes. When all slots are used, they are
+    reused from the oldest slot onwards. The store can be shared by the
+    threads of a process and by processes, e.g. the workers of a
+    concurrent.futures.ProcessPoolExecutor.
+
+    Every write of a slot has a number, `seq`. The index row of a slot is
+    deleted before its pixels are rewritten and a copy of a slot is only
+    returned when its row is unchanged after the copy, i.e. a copy that is
+    torn by another process is discarded.
+
+    The files of a store are named after psize. A store is cleared when it
+    is opened with another capacity. Clearing starts a new epoch of atlas
+    files, i.e. the files of the former epoch, which other processes may
+    still map, are not deleted until a store is opened again. The stores of
+    other psizes are deleted by get_thumbnail_store().
+
+    User Methods:
+    .get(path) - returns the stored thumbnail of path or None
+    .put(path, img) - stores the thumbnail of path
+    .clear() - delete all thumbnails, i.e. start a new epoch of atlas files
+    .close() - close the index and the atlas files
+    """
+
+    def __init__(self, directory: Union[str, os.PathLike] = CACHE_DIR,
+                 psize: tuple[int, int] = (200, 200),
+                 capacity: int = CAPACITY):
+        self.directory = Path(directory)
+        self.psize = tuple(psize)  # max. pixel width and height
+        self.capacity = capacity  # max. bytes of the atlas files
+        self.slot_bytes = self.psize[0] * self.psize[1] * 3  # RGB
+        self.nslots = max(capacity // self.slot_bytes, 1)
+        self.slots_per_atlas = min(self.nslots, SLOTS_PER_ATLAS)
+        self._lock = threading.Lock()
+        self._atlases = {}  # {atlas no.: mmap.mmap, ...} of self._epoch
+        self._epoch = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        prefix = f"thumbnails-{self.psize[0]}x{self.psize[1]}"
+        self._prefix = self.directory / prefix
+        self.con = sqlite3.connect(f"{self._prefix}.sqlite3", timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode = WAL")
+        columns = [i[1] for i in
+                   self.con.execute("PRAGMA table_info(thumbnails)")]
+        if columns and "seq" not in columns:  # of an earlier version
+            self.con.execute("""DROP TABLE thumbnails""")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS thumbnails (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                slot INTEGER UNIQUE,
+                width INTEGER,
+                height INTEGER,
+                seq INTEGER)""")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER)""")
+        self.con.execute("""INSERT OR IGNORE INTO meta VALUES
+                ('next_slot', 0), ('epoch', 0), ('nwrites', 0)""")
+        row = self.con.execute(
+            """SELECT value FROM meta WHERE key = 'nslots'""").fetchone()
+        if row is None or row[0] != self.nslots or "seq" not in columns:
+            self.clear()  # the slots of its thumbnails are not located alike
+        self._remove_stale_atlases()
+
+    def _use_epoch(self, epoch: int) -> None:
+        """Method to map the atlas files of epoch from now on."""
+        if epoch != self._epoch:
+            for mm in self._atlases.values():
+                mm.close()
+            self._atlases.clear()
+            self._epoch = epoch
+
+    def _remove_stale_atlases(self) -> None:
+        """Method to delete the atlas files of the former epochs. Files that
+        cannot be deleted, e.g. mapped files on Windows, are deleted when a
+        store is opened again."""
+        epoch = self.con.execute(
+            """SELECT value FROM meta WHERE key = 'epoch'""").fetchone()[0]
+        current = f"{self._prefix.name}-{epoch}-"
+        for atlas in self.directory.glob(f"{self._prefix.name}-*.atlas"):
+            if not atlas.name.startswith(current):
+                try:
+                    atlas.unlink()
+                except OSError:
+                    pass
+
+    def _get_atlas(self, atlas: int) -> mmap.mmap:
+        try:
+            return self._atlases[atlas]
+        except KeyError:
+            length = self.slots_per_atlas * self.slot_bytes
+            with open(f"{self._prefix}-{self._epoch}-{atlas}.atlas",
+                      "a+b") as f:
+                if os.fstat(f.fileno()).st_size < length:
+                    f.truncate(length)  # sparse
+                mm = self._atlases[atlas] = mmap.mmap(f.fileno(), length)
+            return mm
+
+    def _locate(self, slot: int) -> tuple:
+        """Method returns the atlas and the byte offset of a slot."""
+        atlas, n = divmod(slot, self.slots_per_atlas)
+        return self._get_atlas(atlas), n * self.slot_bytes
+
+    def get(self, path: Union[str, os.PathLike]) -> Union[Image.Image, None]:
+        """Method returns the stored thumbnail of the picture at path as a RGB
+        PIL.Image.Image or None when it is not stored, is outdated or its
+        slot was rewritten while it was copied."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self.con.execute(
+                """SELECT t.slot, t.width, t.height, t.seq, m.value
+                FROM thumbnails AS t, meta AS m
+                WHERE t.path = ? AND t.size = ? AND t.mtime_ns = ?
+                AND m.key = 'epoch'""",
+                (str(path), st.st_size, st.st_mtime_ns)).fetchone()
+            if row is None:
+                return None
+            slot, width, height, seq, epoch = row
+            self._use_epoch(epoch)
+            mm, offset = self._locate(slot)
+            data = mm[offset:offset + width * height * 3]  # a copy
+            # The row of the slot is deleted before it is rewritten, i.e.
+            # the copy is whole when the row is unchanged.
+            if self.con.execute(
+                    """SELECT 1 FROM thumbnails WHERE slot = ? AND seq = ?""",
+                    (slot, seq)).fetchone() is None:
+                return None
+        return Image.frombytes("RGB", (width, height), data)
+
+    def put(self, path: Union[str, os.PathLike], img: Image.Image) -> None:
+        """Method to store `img`, the thumbnail of the picture at path. It is
+        converted to RGB and must fit in self.psize."""
+        if img.width > self.psize[0] or img.height > self.psize[1]:
+            raise ValueError(f"{img.size=} does not fit in {self.psize}.")
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        data = img.convert("RGB").tobytes() if img.mode != "RGB" else \
+            img.tobytes()
+        with self._lock:
+            # 1. Allocate a slot, i.e. the slot of an outdated thumbnail of
+            #    path or the next slot, and delete its rows in a transaction
+            #    that excludes the other processes. So, no reader returns
+            #    the slot while it is written.
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.con.execute(
+                    """SELECT slot FROM thumbnails WHERE path = ?""",
+                    (str(path),)).fetchone()
+                if row:
+                    slot = row[0]
+                else:
+                    slot = self.con.execute(
+                        """SELECT value FROM meta WHERE key = 'next_slot'"""
+                    ).fetchone()[0]
+                    self.con.execute(
+                        """UPDATE meta SET value = ? WHERE key = 'next_slot'
+                        """, ((slot + 1) % self.nslots,))
+                self.con.execute(
+                    """DELETE FROM thumbnails WHERE slot = ? OR path = ?""",
+                    (slot, str(path)))
+                self.con.execute(
+                    """UPDATE meta SET value = value + 1
+                    WHERE key = 'nwrites'""")
+                seq, epoch = self.con.execute(
+                    """SELECT MAX(CASE key WHEN 'nwrites' THEN value END),
+                    MAX(CASE key WHEN 'epoch' THEN value END) FROM meta"""
+                ).fetchone()
+            except BaseException:
+                self.con.execute("ROLLBACK")
+                raise
+            else:
+                self.con.execute("COMMIT")
+
+            # 2. Write the pixels and then index them, unless the store was
+            #    cleared meanwhile.
+            self._use_epoch(epoch)
+            mm, offset = self._locate(slot)
+            mm[offset:offset + len(data)] = data
+            self.con.execute(
+                """INSERT OR REPLACE INTO thumbnails
+                SELECT ?, ?, ?, ?, ?, ?, ? FROM meta
+                WHERE key = 'epoch' AND value = ?""",
+                (str(path), st.st_size, st.st_mtime_ns, slot, img.width,
+                 img.height, seq, epoch))
+
+    def clear(self) -> None:
+        """Method to delete all stored thumbnails. A new epoch of atlas files
+        is started, i.e. the files of the current epoch are not deleted while
+        other processes may still map them."""
+        with self._lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                self.con.execute("""DELETE FROM thumbnails""")
+                self.con.execute("""UPDATE meta SET value = value + 1
+                    WHERE key = 'epoch'""")
+                self.con.execute("""INSERT OR REPLACE INTO meta
+                    VALUES ('next_slot', 0), ('nslots', ?)""",
+                                 (self.nslots,))
+            except BaseException:
+                self.con.execute("ROLLBACK")
+                raise
+            else:
+                self.con.execute("COMMIT")
+            self._use_epoch(None)
+
+    def close(self):
+        with self._lock:
+            self._use_epoch(None)
+            self.con.close()
+
+
+def get_thumbnail_size(size: tuple[int, int], psize: tuple[int, int]) \
+        -> tuple[int, int]:
+    """Function returns the size of the thumbnail of a picture of `size`
+    that fits in psize, i.e. as made by Image.thumbnail(), which does not
+    enlarge a picture."""
+    width, height = size
+    scale = min(psize[0] / width, psize[1] / height, 1.0)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def get_exif_thumbnail(img: Image.Image, size: tuple[int, int],
+                       min_scale: float = 0.75) -> Union[Image.Image, None]:
+    """Function returns the JPEG thumbnail that is embedded in the EXIF data,
+    i.e. IFD1, of the opened picture `img`, as large as `img` reduced to fit
+    in size. None is returned when there is none, or when it is smaller than
+    min_scale of that size or its aspect ratio differs, e.g. it has black
+    bars. So, the usual 160x120 thumbnail of a camera is enlarged to a
+    200x150 thumbnail. Only the EXIF data is read, i.e. the pixels of `img`
+    are not decoded. Its Orientation is not applied."""
+    data = img.info.get("exif")
+    if not data:
+        return None
+    ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+    offset = ifd1.get(0x0201)  # JPEGInterchangeFormat
+    length = ifd1.get(0x0202)  # JPEGInterchangeFormatLength
+    if not offset or not length:
+        return None
+    if data.startswith(b"Exif\x00\x00"):
+        offset += 6  # the offset is from the TIFF header
+    try:
+        thumb = Image.open(io.BytesIO(data[offset:offset + length]))
+        width, height = img.size
+        twidth, theight = get_thumbnail_size(img.size, size)
+        if thumb.width < twidth * min_scale or \
+                thumb.height < theight * min_scale or \
+                abs(thumb.width * height / (thumb.height * width) - 1) > 0.02:
+            return None
+        thumb.load()
+    except (OSError, ValueError, SyntaxError, ZeroDivisionError):
+        return None
+    if thumb.width < twidth or thumb.height < theight:
+        thumb = thumb.resize((twidth, theight), Image.Resampling.BILINEAR)
+    return thumb
+
+
+def image_to_ppm(img: Image.Image) -> bytes:
+    """Function returns `img` as a binary PGM (mode "L") or PPM (else RGB)
+    image, i.e. data that tk.PhotoImage reads without the Tk bridge of
+    PIL."""
+    if img.mode == "L":
+        magic = b"P5"
+    else:
+        magic = b"P6"
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+    return b"%s %d %d 255\n" % (magic, img.width, img.height) + img.tobytes()
+
+
+class ThumbnailCache:
+    """Class to keep decoded thumbnails in memory, i.e. PIL.Image.Image
+    instances or their PPM bytes keyed by the path of their picture, within
+    a byte budget. When
+    the budget is exceeded, the least recently used thumbnails are evicted.
+
+    User Methods:
+    .get(path) - returns the thumbnail of path or None
+    .put(path, img) - keeps the thumbnail of path
+    .clear() - evict all thumbnails
+    """
+
+    def __init__(self, budget: int = CACHE_BYTES):
+        self.budget = budget  # max. bytes of all thumbnails
+        self.nbytes = 0  # bytes of all thumbnails
+        self._lock = threading.Lock()
+        self._images = OrderedDict()  # {path: PIL.Image.Image, ...}
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, path):
+        return path in self._images
+
+    @staticmethod
+    def _get_nbytes(img: Union[Image.Image, bytes]) -> int:
+        if isinstance(img, bytes):
+            return len(img)
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, path: Union[str, os.PathLike]) \
+            -> Union[Image.Image, bytes, None]:
+        """Method returns the thumbnail of path or None, and marks it as the
+        most recently used."""
+        with self._lock:
+            try:
+                self._images.move_to_end(path)
+            except KeyError:
+                return None
+            return self._images[path]
+
+    def put(self, path: Union[str, os.PathLike],
+            img: Union[Image.Image, bytes]) -> None:
+        """Method to keep `img`, the thumbnail of path, as the most recently
+        used thumbnail. It is not kept when it exceeds the budget."""
+        nbytes = self._get_nbytes(img)
+        with self._lock:
+            old = self._images.pop(path, None)
+            if old is not None:
+                self.nbytes -= self._get_nbytes(old)
+            if nbytes > self.budget:
+                return
+            self._images[path] = img
+            self.nbytes += nbytes
+            while self.nbytes > self.budget:
+                _, old = self._images.popitem(last=False)
+                self.nbytes -= self._get_nbytes(old)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self.nbytes = 0
+
+
+def _get_freedesktop_uri_and_name(path: Union[str, os.PathLike]) -> tuple:
+    """Function returns the URI of the file at path and the file name of its
+    freedesktop.org thumbnail, i.e. the MD5 hash of the URI. The URI is
+    escaped like g_filename_to_uri() of GLib, i.e. like file managers, which
+    keeps e.g. the parentheses of "IMG (1).jpg"."""
+    abspath = os.fsencode(os.path.abspath(path))
+    uri = "file://" + urllib.parse.quote(abspath, safe="/!$&'()*+,;=:@~")
+    return uri, f"{hashlib.md5(uri.encode()).hexdigest()}.png"
+
+
+def get_freedesktop_thumbnail(path: Union[str, os.PathLike],
+                              psize: tuple[int, int] = (200, 200)) \
+        -> Union[Image.Image, None]:
+    """Function returns the thumbnail of the picture at path that was made
+    by a file manager, i.e. in FREEDESKTOP_DIR following the freedesktop.org
+    Thumbnail Managing Standard, reduced to fit in psize. The smallest size
+    flavour that is at least as large as psize is looked up first. None is
+    returned when there is no thumbnail or when its Thumb::URI, Thumb::MTime
+    or Thumb::Size does not match the picture."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    uri, name = _get_freedesktop_uri_and_name(path)
+    for flavour, size in FREEDESKTOP_SIZES.items():
+        if size < max(psize):
+            continue
+        try:
+            with Image.open(FREEDESKTOP_DIR / flavour / name) as img:
+                img.load()
+        except (OSError, ValueError, SyntaxError):
+            continue
+        info = img.info
+        if info.get("Thumb::URI") != uri or \
+                info.get("Thumb::MTime") != str(int(st.st_mtime)) or \
+                info.get("Thumb::Size", str(st.st_size)) != str(st.st_size):
+            continue
+        img.thumbnail(psize, resample=Image.Resampling.NEAREST,
+                      reducing_gap=1.1)
+        return img
+    return None
+
+
+def put_freedesktop_thumbnail(path: Union[str, os.PathLike],
+                              img: Image.Image, flavour: str = "large") \
+        -> None:
+    """Function to write `img`, the thumbnail of the picture at path, to
+    FREEDESKTOP_DIR in the PNG format of the freedesktop.org Thumbnail
+    Managing Standard, i.e. for file managers and other applications. `img`
+    must fit in the size of `flavour`."""
+    size = FREEDESKTOP_SIZES[flavour]
+    if img.width > size or img.height > size:
+        raise ValueError(f"{img.size=} does not fit in the {flavour} size.")
+    st = os.stat(path)
+    uri, name = _get_freedesktop_uri_and_name(path)
+    meta = PngInfo()
+    meta.add_text("Thumb::URI", uri)
+    meta.add_text("Thumb::MTime", str(int(st.st_mtime)))
+    meta.add_text("Thumb::Size", str(st.st_size))
+    meta.add_text("Software", "ADP")
+    if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+        img = img.convert("RGB")
+    directory = FREEDESKTOP_DIR / flavour
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # Write to a temporary file that is renamed, i.e. readers never see a
+    # partial thumbnail.
+    fd, tmp = tempfile.mkstemp(suffix=".png", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, "PNG", pnginfo=meta)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, directory / name)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+_stores = {}  # {psize: ThumbnailStore or None, ...} of this process
+_stores_lock = threading.Lock()
+
+
+def _remove_stores(directory: Path, keep: set[tuple[int, int]]) -> None:
+    """Function to delete the files of the ThumbnailStores in directory
+    whose psize is not in keep, e.g. those of a former thumbnail size."""
+    keep = {f"{w}x{h}" for w, h in keep}
+    for path in directory.glob("thumbnails-*"):
+        if path.name.split(".")[0].split("-")[1] not in keep:
+            path.unlink(missing_ok=True)
+
+
+def get_thumbnail_store(psize: tuple[int, int] = (200, 200)) \
+        -> Union[ThumbnailStore, None]:
+    """Function returns the ThumbnailStore of this process for thumbnails of
+    psize in CACHE_DIR, or None when it cannot be opened, e.g. the directory
+    is read-only. Then, thumbnails are not persisted. The stores of the
+    psizes that are not used by this process are deleted, i.e. the stores of
+    a former thumbnail size do not stay on disk."""
+    psize = tuple(psize)
+    with _stores_lock:
+        try:
+            return _stores[psize]
+        except KeyError:
+            try:
+                _remove_stores(CACHE_DIR, {*_stores, psize})
+                store = ThumbnailStore(psize=psize)
+            except (OSError, sqlite3.Error) as exc:
+                print(f"Thumbnails are not persisted: {exc}")
+                store = None
+            _stores[psize] = store
+            return store
+
+
+if __name__ == "__main__":
+    import sys
+    from time import perf_counter
+
+    # Compare the decoding of pictures to thumbnails with getting them from a
+    # ThumbnailStore in a temporary directory.
+    source = Path(sys.argv[1] if len(sys.argv) > 1 else
+                  Path.home() / "Pictures")
+    paths = [i for i in source.rglob("*.jp*g")][:200]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ThumbnailStore(tmpdir)
+        start = perf_counter()
+        for p in paths:
+            with Image.open(p) as im:
+                im.thumbnail(store.psize)
+            store.put(p, im)
+        decode = perf_counter() - start
+        start = perf_counter()
+        hits = sum(store.get(p) is not None for p in paths)
+        get = perf_counter() - start
+        store.close()
+    print(f"{len(paths)} pictures: decoded and stored in {decode:.4f} secs, "
+          f"{hits} thumbnails got in {get:.4f} secs.")
@@ -41,12 +41,16 @@ def timings(time: float) -> tuple:
     return time, 'secs'
 
 
-def sort_pictures_by_creation_time(filestrpaths: list) -> list:
+def sort_pictures_by_creation_time(filestrpaths: list, ctimes: dict = None) \
+        -> list:
     """Identify which picture is the original and which are copies using
     their creation date. Oldest is treated as original. They are then
     sorted in ascending order, i.e. oldest first, followed by
     next younger, etc...
 
+    `ctimes` is a dict of {full_path: creation time} of the pictures that is
+    captured when they were found. A picture that is not in it is stat-ed.
+
     Note: dps_ctime = {i.stat().st_ctime: i for i in dps}
           This dict() comprehension is too simplistic, hence it has been
           commented out and replaced with a longer for-loop check mechanism.
@@ -55,9 +59,14 @@ def sort_pictures_by_creation_time(filestrpaths: list) -> list:
         """
     dps = tuple(Path(i) for i in sorted(filestrpaths, reverse=True))
     # dps_ctime = {i.stat().st_ctime: i for i in dps}
+    if ctimes is None:
+        ctimes = {}
     dps_ctime = {}
     for p in dps:
-        ctime = p.stat().st_ctime
+        try:
+            ctime = ctimes[str(p)]
+        except KeyError:
+            ctime = p.stat().st_ctime
         if ctime in dps_ctime.keys():
             dps_ctime[ctime].append(p)
         else:
@@ -8,6 +8,7 @@ from adp.widgets.w_dupgroups import *
 from adp.widgets.w_findindicators import *
 from adp.widgets.w_find import *
 from adp.widgets.w_scrframe import *
+from adp.widgets.w_filterbar import *
 from adp.widgets.w_table import *
 from adp.widgets.w_gallery import *
 from adp.widgets.w_adp import *
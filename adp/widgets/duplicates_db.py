@@ -1,21 +1,57 @@
 # Python modules
 import sqlite3
-from datetime import datetime
+import threading
+import logging
+import queue
+import concurrent.futures as cf
+import os
+from datetime import datetime, timedelta
 from pathlib import Path
-from itertools import count
+from itertools import count, islice
+from operator import itemgetter
 from typing import Literal
 
+# External Packages
+import numpy as np
+
 # Project modules
 from adp.widgets.constants import CWD, GROUPS_IN_A_PAGE
 from adp.functions.tools import sort_pictures_by_creation_time, filesize
+from adp.functions.results_io import write_rows, read_rows
 
-__all_ = ["DuplicatesDB"]
+__all_ = ["DuplicatesDB", "DuplicatesDBWorker", "SelectionBitmap"]
 __version__ = '0.1.1'
 __license__ = "Apache License, Version 2.0"
 __copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
 __author__ = 'Chia Yan Hon, Julian.'
 __email__ = "julianchiayh@gmail.com"
 
+# The ORDER BY terms of the groups table for each sort key of
+# DuplicatesDB.sort_groups(). Ties are kept in the order they were found.
+SORT_KEYS = {
+	"reclaimable": "total_bytes - original_bytes DESC",  # bytes of copies
+	"nfiles": "nfiles DESC",
+	"newest": "newest DESC",
+	"path": "path",
+	"found": "first_sn",
+}
+# The ORDER BY terms of the files of a group for each keep rule of
+# DuplicatesDB.auto_select(). The first file of a group in this order is kept.
+KEEP_RULES = {
+	"oldest": "create_on",
+	"newest": "create_on DESC",
+	"resolution": "COALESCE(width * height, 0) DESC",  # largest first
+	"bytes": "size_bytes DESC",  # largest first
+	"shortest_path": "LENGTH(full_path)",
+}
+# The quantity of 1 bits of every byte value, i.e. a popcount lookup table.
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+WRITE_BEHIND_DELAY = 500  # milliseconds before selection changes are written
+POLL_MIN = 1  # milliseconds between polls of the callbacks of a busy worker
+POLL_MAX = 32  # milliseconds between polls of the callbacks of an idle worker
+
+logger = logging.getLogger(__name__)
+
 
 class DuplicatesDB:
 	"""Class to create a SQLITE3 database to store picture duplicates info."""
@@ -43,6 +79,9 @@ class DuplicatesDB:
 		# 						     detect_types=sqlite3.PARSE_DECLTYPES)
 		self.con.execute('PRAGMA journal_mode = WAL')
 		self.cur = self.con.cursor()
+		self.fts = None  # tokenizer of the full-text search index, if any
+		self._filter = ("", ())  # (WHERE clause, parameters) of groups
+		self._sort_key = "reclaimable"  # a key of SORT_KEYS
 		self.create_table()
 
 	def create_table(self):
@@ -58,14 +97,272 @@ class DuplicatesDB:
 					file_size TEXT,
 					selected INTEGER NOT NULL CHECK (selected IN (0, 1)),
 					dtype Text,
-					page INTEGER
+					size_bytes INTEGER,
+					width INTEGER,
+					height INTEGER
 					)"""
 		self.cur.execute("""DROP TABLE IF EXISTS duplicates""")
 		self.cur.execute(table)
+		self.cur.execute(
+			"""CREATE INDEX IF NOT EXISTS duplicates_sn ON duplicates (sn)""")
+		for column in ("group_id", "size_bytes", "create_on"):
+			self.cur.execute(f"""CREATE INDEX IF NOT EXISTS
+					duplicates_{column} ON duplicates ({column})""")
+		self.create_aggregate_tables()
+		self.create_search_index()
 		self.con.commit()  # Commit changes
 
+	def create_aggregate_tables(self):
+		"""Method to create the tables that keep the aggregate statistics of
+		the duplicates table, i.e.
+		  groups - the quantity and byte size of the files of each group.
+		  totals - the quantity and byte size of the files and of the selected
+		           files of each dtype.
+		They are computed by self.update_aggregates() after the duplicates
+		table is populated. Thereafter, triggers keep them up-to-date when
+		the selected column of the duplicates table is updated or when its
+		rows are deleted."""
+		groups = """CREATE TABLE IF NOT EXISTS
+				groups (
+					group_id TEXT PRIMARY KEY,
+					nfiles INTEGER,
+					total_bytes INTEGER,
+					original_bytes INTEGER,
+					first_sn INTEGER,
+					newest TEXT,
+					path TEXT,
+					rank INTEGER,
+					page INTEGER,
+					first_row INTEGER
+					)"""
+		totals = """CREATE TABLE IF NOT EXISTS
+				totals (
+					dtype TEXT PRIMARY KEY,
+					nfiles INTEGER,
+					nbytes INTEGER,
+					nselected INTEGER,
+					selected_bytes INTEGER
+					)"""
+		trigger1 = """CREATE TRIGGER IF NOT EXISTS selected_updated
+				AFTER UPDATE OF selected ON duplicates
+				WHEN NEW.selected != OLD.selected
+				BEGIN
+					UPDATE totals
+					SET nselected = nselected + NEW.selected - OLD.selected,
+						selected_bytes = selected_bytes +
+							(NEW.selected - OLD.selected) * NEW.size_bytes
+					WHERE dtype = NEW.dtype;
+				END"""
+		trigger2 = """CREATE TRIGGER IF NOT EXISTS row_deleted
+				AFTER DELETE ON duplicates
+				BEGIN
+					UPDATE totals
+					SET nfiles = nfiles - 1,
+						nbytes = nbytes - OLD.size_bytes,
+						nselected = nselected - OLD.selected,
+						selected_bytes = selected_bytes -
+							OLD.selected * OLD.size_bytes
+					WHERE dtype = OLD.dtype;
+					UPDATE groups
+					SET nfiles = nfiles - 1,
+						total_bytes = total_bytes - OLD.size_bytes,
+						original_bytes = original_bytes - CASE OLD.dtype
+							WHEN 'Original' THEN OLD.size_bytes ELSE 0 END
+					WHERE group_id = OLD.group_id;
+					DELETE FROM groups
+					WHERE group_id = OLD.group_id AND nfiles = 0;
+				END"""
+		self.cur.execute("""DROP TABLE IF EXISTS groups""")
+		self.cur.execute("""DROP TABLE IF EXISTS totals""")
+		for sql in (groups, totals, trigger1, trigger2):
+			self.cur.execute(sql)
+		self.cur.execute("""CREATE INDEX IF NOT EXISTS
+				groups_page ON groups (page, rank)""")
+		self.cur.execute("""CREATE INDEX IF NOT EXISTS
+				groups_first_row ON groups (first_row)""")
+		for key, order in SORT_KEYS.items():
+			self.cur.execute(f"""CREATE INDEX IF NOT EXISTS
+					groups_{key} ON groups ({order}, first_sn)""")
+
+	def create_search_index(self):
+		"""Method to create a FTS5 full-text search index, called
+		duplicates_fts, over the full_path and child_path columns of the
+		duplicates table. The trigram tokenizer is preferred as it matches
+		any substring of a path. When it is not available, the unicode61
+		tokenizer (i.e. prefix matching of words) is used instead. When FTS5
+		itself is not available, self.set_filter() falls back to LIKE
+		patterns.
+
+		The index is rebuilt by self.update_aggregates(). Thereafter, a
+		trigger keeps it up-to-date when rows of the duplicates table are
+		deleted."""
+		self.cur.execute("""DROP TABLE IF EXISTS duplicates_fts""")
+		self.fts = None
+		for tokenizer in ("trigram", "unicode61"):
+			try:
+				self.cur.execute(f"""CREATE VIRTUAL TABLE duplicates_fts
+						USING fts5(full_path, child_path, content=duplicates,
+								   content_rowid=sn, tokenize={tokenizer})""")
+			except sqlite3.OperationalError:
+				continue
+			self.fts = tokenizer
+			break
+		if self.fts:
+			self.cur.execute("""CREATE TRIGGER IF NOT EXISTS row_unindexed
+					AFTER DELETE ON duplicates
+					BEGIN
+						INSERT INTO duplicates_fts
+							(duplicates_fts, rowid, full_path, child_path)
+						VALUES ('delete', OLD.sn, OLD.full_path,
+								OLD.child_path);
+					END""")
+
+	def update_aggregates(self):
+		"""Method to (re)compute the groups and totals tables and the
+		full-text search index from the duplicates table. Thereafter, the
+		groups are ranked by the current sort key and those that match the
+		current filter are paged."""
+		self.cur.execute("""DELETE FROM groups""")
+		self.cur.execute("""DELETE FROM totals""")
+		self.cur.execute(
+			"""INSERT INTO groups
+			SELECT group_id, COUNT(*), SUM(size_bytes),
+				SUM(CASE dtype WHEN 'Original' THEN size_bytes ELSE 0 END),
+				MIN(sn), MAX(create_on), MIN(full_path), NULL, NULL, NULL
+			FROM duplicates GROUP BY group_id""")
+		self.cur.execute(
+			"""INSERT INTO totals
+			SELECT dtype, COUNT(*), SUM(size_bytes), SUM(selected),
+				SUM(selected * size_bytes)
+			FROM duplicates GROUP BY dtype""")
+		if self.fts:
+			self.cur.execute("""INSERT INTO duplicates_fts (duplicates_fts)
+					VALUES ('rebuild')""")
+		self.rank_groups()
+		self.assign_pages()
+
+	def rank_groups(self):
+		"""Method to (re)assign the rank of every group, i.e. its position in
+		the order of the current sort key."""
+		self.cur.execute(
+			f"""UPDATE groups SET rank = m.n
+			FROM (SELECT group_id, ROW_NUMBER() OVER
+				  (ORDER BY {SORT_KEYS[self._sort_key]}, first_sn) AS n
+				  FROM groups) AS m
+			WHERE groups.group_id = m.group_id""")
+
+	def sort_groups(self, key: Literal["reclaimable", "nfiles", "newest",
+									   "path", "found"] = "reclaimable"):
+		"""Method to order the paging of the groups by:
+		reclaimable - the byte size of their copies, largest first (default)
+		nfiles - their quantity of files, largest first
+		newest - the creation date of their newest file, newest first
+		path - the full path of their files, alphabetically
+		found - the order they were found in
+		The sort key is kept until it is changed, i.e. it is reapplied when
+		the duplicates table is repopulated."""
+		if key not in SORT_KEYS:
+			raise ValueError(f"key={key} is invalid. It's value must be one of "
+							 f"these: {tuple(SORT_KEYS)}.")
+		self._sort_key = key
+		self.rank_groups()
+		self.assign_pages()
+
+	def assign_pages(self):
+		"""Method to (re)assign the page of every group that matches the
+		current filter in the order of their rank. The page of a group that
+		does not match is NULL, i.e. it is not shown.
+
+		The row of every matching group in a list of all their group and file
+		rows, i.e. its first_row, is also assigned. It is used to page by
+		rows instead of by groups."""
+		where, params = self._filter
+		self.cur.execute("""UPDATE groups SET page = NULL, first_row = NULL""")
+		self.cur.execute(
+			f"""UPDATE groups SET page = m.n / {GROUPS_IN_A_PAGE},
+				first_row = m.first_row
+			FROM (SELECT group_id, ROW_NUMBER() OVER w - 1 AS n,
+					  SUM(nfiles + 1) OVER w - nfiles - 1 AS first_row
+				  FROM groups AS g {where} WINDOW w AS (ORDER BY rank)) AS m
+			WHERE groups.group_id = m.group_id""", params)
+		self.con.commit()
+
+	def set_filter(self, text: str = "", min_bytes: int = None,
+				   max_bytes: int = None, date_from: str = None,
+				   date_to: str = None, min_files: int = None,
+				   max_files: int = None) -> int:
+		"""Method to filter the duplicate groups and to page only those that
+		match. Returns the quantity of groups that match. Calling it without
+		arguments clears the filter.
+
+		A group matches when its quantity of files is within `min_files` and
+		`max_files` and when at least one of its files matches all of these:
+		text - whitespace separated terms that must each be a substring of
+			   its full_path or child_path (case-insensitive).
+		min_bytes, max_bytes - the range of its byte size.
+		date_from, date_to - the range of its creation date, "YYYY-MM-DD".
+
+		The filter is kept until it is changed, i.e. it is reapplied when the
+		duplicates table is repopulated.
+		"""
+		group_conds = []
+		group_params = []
+		file_conds = []
+		file_params = []
+		if min_files is not None:
+			group_conds.append("g.nfiles >= ?")
+			group_params.append(int(min_files))
+		if max_files is not None:
+			group_conds.append("g.nfiles <= ?")
+			group_params.append(int(max_files))
+		if min_bytes is not None:
+			file_conds.append("size_bytes >= ?")
+			file_params.append(int(min_bytes))
+		if max_bytes is not None:
+			file_conds.append("size_bytes <= ?")
+			file_params.append(int(max_bytes))
+		if date_from:
+			date_from = datetime.strptime(date_from, "%Y-%m-%d")
+			file_conds.append("create_on >= ?")
+			file_params.append(datetime.strftime(date_from, "%Y-%m-%d"))
+		if date_to:
+			date_to = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(1)
+			file_conds.append("create_on < ?")
+			file_params.append(datetime.strftime(date_to, "%Y-%m-%d"))
+		for term in text.split():
+			if self.fts == "trigram" and len(term) >= 3 or \
+					self.fts == "unicode61":
+				phrase = '"' + term.replace('"', '""') + '"'
+				if self.fts == "unicode61":
+					phrase += "*"  # prefix
+				file_conds.append("""sn IN (SELECT rowid FROM duplicates_fts
+								   WHERE duplicates_fts MATCH ?)""")
+				file_params.append(phrase)
+			else:
+				pattern = "%" + term.replace("\\", "\\\\").replace(
+					"%", "\\%").replace("_", "\\_") + "%"
+				file_conds.append(r"""(full_path LIKE ? ESCAPE '\' OR
+								   child_path LIKE ? ESCAPE '\')""")
+				file_params.extend((pattern, pattern))
+		if file_conds:
+			group_conds.append(f"""g.group_id IN (SELECT group_id FROM
+							   duplicates WHERE {" AND ".join(file_conds)})""")
+			group_params.extend(file_params)
+		if group_conds:
+			self._filter = ("WHERE " + " AND ".join(group_conds),
+							tuple(group_params))
+		else:
+			self._filter = ("", ())
+		self.assign_pages()
+		self.cur.execute(
+			"""SELECT COUNT(*) FROM groups WHERE page IS NOT NULL""")
+		return self.cur.fetchone()[0]
+
 	def clear_table(self):
+		self.cur.execute("""DROP TABLE IF EXISTS duplicates_fts""")
 		self.cur.execute("""DROP TABLE IF EXISTS duplicates""")
+		self.cur.execute("""DROP TABLE IF EXISTS groups""")
+		self.cur.execute("""DROP TABLE IF EXISTS totals""")
 		self.con.commit()  # Commit changes
 
 	def is_table_empty(self):
@@ -77,7 +374,12 @@ class DuplicatesDB:
 			return False
 
 	def reset_table(self):
+		self.cur.execute("""DELETE from groups""")
+		self.cur.execute("""DELETE from totals""")
 		self.cur.execute("""DELETE from duplicates""")
+		if self.fts:
+			self.cur.execute("""INSERT INTO duplicates_fts (duplicates_fts)
+					VALUES ('delete-all')""")
 		self.con.commit()  # Commit changes
 
 	# print(f'Deleted {self.cur.rowcount} records from the SQLite3 database.')
@@ -93,12 +395,24 @@ class DuplicatesDB:
 
 	# print(f"Deleted {self.file}.")
 
-	def populate(self, sdir: str, duplicated_pictures: dict):
+	def populate(self, sdir: str, duplicated_pictures: dict,
+				 sizes: dict = None, dimensions: dict = None,
+				 ctimes: dict = None):
 		"""Method to populate sqlite3-database table, called duplicates, with
 		info from the found pictures with duplicates.
 		each row of the database table stores the following info:
-			picture item_id, group_id, hashhex, full_path, child_path, create_on,
-			file_size, selected, dtype, detached
+			picture sn, item_id, group_id, hashhex, full_path, child_path,
+			create_on, file_size, selected, dtype, size_bytes, width, height
+
+		`sizes` is a dict of {full_path: byte size} of the pictures that is
+		captured when they were found, e.g. from the size attribute of their
+		RasterImage instances. A picture that is not in `sizes` is stat-ed.
+		Likewise, `dimensions` is a dict of {full_path: (width, height)}. The
+		width and height of a picture that is not in it are NULL, and `ctimes`
+		is a dict of {full_path: creation time}. A picture that is not in it
+		is stat-ed. The pages of the groups are assigned in the groups table,
+		i.e. by self.assign_pages(). The aggregate tables are updated after the duplicates table is
+		populated.
 		"""
 		# print(f"\ndef populate(self):")
 		# print(f"{sdir=}")
@@ -111,27 +425,40 @@ class DuplicatesDB:
 			raise AttributeError(f"{sdir} is not a directory.")
 		else:
 			directory = sdir
+		if sizes is None:
+			sizes = {}
+		if dimensions is None:
+			dimensions = {}
+		if ctimes is None:
+			ctimes = {}
 
 		if duplicated_pictures:
 			counter = count(start=0, step=1)
 			sn = next(counter)
 
+			rows = []
 			for n, (k, v) in enumerate(duplicated_pictures.items()):
-				page = n // GROUPS_IN_A_PAGE
-				# print(f"{n=}, {page=}")
 				hashhex = k
 				group_id = f"G{n}"
 				# print(f"{v=}")
-				dups = sort_pictures_by_creation_time(v)  # ascending order
+				# ascending order
+				dups = sort_pictures_by_creation_time(v, ctimes)
 				# print(f"{dups=}")
 				for mm, dup in enumerate(dups):
 					full_path = str(dup)
 					child_path = f".{full_path[len(directory):]}"
 					# print(f"{child_path=}")
 					item_id = f"{group_id}_F{mm}"
-					fsize = filesize(dup.stat().st_size)
+					try:
+						size_bytes = sizes[full_path]
+					except KeyError:
+						size_bytes = dup.stat().st_size
+					fsize = filesize(size_bytes)
 					file_size = f"{fsize[0]:.3f} {fsize[1]}"
-					ctime = dup.stat().st_ctime
+					try:
+						ctime = ctimes[full_path]
+					except KeyError:
+						ctime = dup.stat().st_ctime
 					dtime = datetime.fromtimestamp(ctime)
 					create_on = datetime.strftime(dtime, "%Y-%m-%d %H:%M:%S")
 					selected = False  # False
@@ -139,12 +466,60 @@ class DuplicatesDB:
 						dtype = "Original"
 					else:
 						dtype = "Copy"
+					width, height = dimensions.get(full_path, (None, None))
 					values = (
 						sn, item_id, group_id, hashhex, full_path, child_path,
-						create_on, file_size, selected, dtype, page
+						create_on, file_size, selected, dtype, size_bytes, width,
+						height
 					)
-					self.insert_data_row(values)
+					rows.append(values)
 					sn = next(counter)
+			sql = """INSERT OR IGNORE INTO duplicates
+					VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)"""
+			self.cur.executemany(sql, rows)
+			self.con.commit()
+		self.update_aggregates()
+
+	def export_duplicates(self, path, fmt: str = None) -> int:
+		"""Method to stream the rows of the duplicates table, ordered by
+		group and then by file, to a JSON Lines, CSV or .npz file. Returns
+		the quantity of rows exported."""
+		cur = self.con.execute("""SELECT * FROM duplicates ORDER BY sn""")
+		fields = tuple(i[0] for i in cur.description)
+		try:
+			return write_rows(cur, fields, path, fmt)
+		finally:
+			cur.close()
+
+	def import_duplicates(self, path, fmt: str = None, chunksize=50_000) \
+			-> int:
+		"""Method to replace the rows of the duplicates table with those
+		exported by self.export_duplicates() and to recompute the aggregate
+		tables. Returns the quantity of rows imported."""
+		rows = read_rows(path, fmt)
+		fields = next(rows)
+		# The page column of an older export is not stored, i.e. the pages
+		# are assigned in the groups table.
+		if "page" in fields:
+			getter = itemgetter(*(n for n, i in enumerate(fields)
+								  if i != "page"))
+			fields = getter(fields)
+			rows = map(getter, rows)
+		self.cur.execute("""SELECT * FROM duplicates LIMIT 0""")
+		columns = tuple(i[0] for i in self.cur.description)
+		unknown = set(fields).difference(columns)
+		if unknown:
+			raise ValueError(f"{path} has unknown columns: {unknown}.")
+		sql = f"""INSERT OR IGNORE INTO duplicates ({",".join(fields)})
+				VALUES({",".join("?" * len(fields))})"""
+		self.reset_table()
+		nrows = 0
+		while chunk := list(islice(rows, chunksize)):
+			self.cur.executemany(sql, chunk)
+			nrows += len(chunk)
+		self.con.commit()
+		self.update_aggregates()
+		return nrows
 
 	def get_max_sn_of_group_id(self, group_id: str):
 		sql1 = """SELECT MAX(sn) FROM
@@ -157,18 +532,19 @@ class DuplicatesDB:
 	def insert_data_row(self, items):
 		"""Method to insert a row of data into the table, if they do not
 		exist."""
-		sql = """INSERT OR IGNORE INTO duplicates VALUES(?,?,?,?,?,?,?,?,?,?,?)
-		"""
+		sql = """INSERT OR IGNORE INTO duplicates
+				VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)"""
 		self.cur.execute(sql, items)
 		self.con.commit()
 
 	def get_group_ids_of_page(self, page: int):
-		sql = """SELECT DISTINCT group_id FROM duplicates WHERE page in (?)"""
+		sql = """SELECT group_id FROM groups WHERE page = (?) ORDER BY rank"""
 		self.cur.execute(sql, (page,))
 		return [gid[0] for gid in self.cur.fetchall()]
 
 	def get_all_page_numbers(self):
-		sql = """SELECT DISTINCT page FROM duplicates"""
+		sql = """SELECT DISTINCT page FROM groups WHERE page IS NOT NULL
+				ORDER BY page"""
 		self.cur.execute(sql)
 		return [page[0] for page in self.cur.fetchall()]
 
@@ -242,6 +618,83 @@ class DuplicatesDB:
 		self.cur.execute(sql, (grp_id,))
 		return self.cur.fetchall()
 
+	def get_items_of_page(self, page: int):
+		"""Method returns the rows of every group of a page in one query. They
+		are ordered by group and then by file."""
+		sql = """SELECT d.* FROM groups AS g
+				JOIN duplicates AS d ON d.group_id = g.group_id
+				WHERE g.page = (?) ORDER BY g.rank, d.sn"""
+		self.cur.execute(sql, (page,))
+		return self.cur.fetchall()
+
+	def get_quantity_of_rows(self):
+		"""Method returns the quantity of group and file rows of the groups
+		that are paged."""
+		sql = """SELECT TOTAL(nfiles + 1) FROM groups
+				WHERE first_row IS NOT NULL"""
+		self.cur.execute(sql)
+		return int(self.cur.fetchone()[0])
+
+	def get_items_of_rows(self, start: int, stop: int):
+		"""Method returns the rows of every group that has a group or file row
+		from row `start` to before row `stop` of the paged groups. Each row
+		is prefixed with the first_row of its group. They are ordered by
+		group and then by file."""
+		sql1 = """SELECT first_row FROM groups WHERE first_row <= (?)
+				ORDER BY first_row DESC LIMIT 1"""
+		sql2 = """SELECT g.first_row, d.* FROM groups AS g
+				JOIN duplicates AS d ON d.group_id = g.group_id
+				WHERE g.first_row >= (?) AND g.first_row < (?)
+				ORDER BY g.first_row, d.sn"""
+		self.cur.execute(sql1, (start,))
+		first_row = self.cur.fetchone()
+		self.cur.execute(sql2, (first_row[0] if first_row else 0, stop))
+		return self.cur.fetchall()
+
+	def get_total_bytes_of_group(self, group_id: str):
+		"""Method returns the byte size of all the files of a group."""
+		sql = """SELECT total_bytes FROM groups WHERE group_id = (?)"""
+		self.cur.execute(sql, (group_id,))
+		return self.cur.fetchone()[0]
+
+	def get_ranks_of_groups(self, group_ids: list):
+		"""Method returns a dict of {group_id: rank}."""
+		group_ids = list(group_ids)
+		marks = ",".join("?" * len(group_ids))
+		sql = f"""SELECT group_id, rank FROM groups
+				WHERE group_id IN ({marks})"""
+		self.cur.execute(sql, group_ids)
+		return dict(self.cur.fetchall())
+
+	def get_total_bytes_of_groups(self, group_ids: list):
+		"""Method returns a dict of {group_id: byte size of all its files}."""
+		group_ids = list(group_ids)
+		marks = ",".join("?" * len(group_ids))
+		sql = f"""SELECT group_id, total_bytes FROM groups
+				WHERE group_id IN ({marks})"""
+		self.cur.execute(sql, group_ids)
+		return dict(self.cur.fetchall())
+
+	def get_totals_of_dtype(self, dtype: Literal["Original", "Copy"]):
+		"""Method returns the quantity and byte size of the files and of the
+		selected files of a dtype, i.e. (nfiles, nbytes, nselected,
+		selected_bytes)."""
+		sql = """SELECT nfiles, nbytes, nselected, selected_bytes FROM totals
+				WHERE dtype = (?)"""
+		self.cur.execute(sql, (dtype,))
+		totals = self.cur.fetchone()
+		if totals is None:
+			return 0, 0, 0, 0
+		return totals
+
+	def get_totals_of_selected(self):
+		"""Method returns the quantity and byte size of the selected files,
+		i.e. (nselected, selected_bytes)."""
+		sql = """SELECT TOTAL(nselected), TOTAL(selected_bytes) FROM totals"""
+		self.cur.execute(sql)
+		nselected, selected_bytes = self.cur.fetchone()
+		return int(nselected), int(selected_bytes)
+
 	def get_item_ids_of_group(self, group_id: str):
 		sql = """SELECT item_id	FROM duplicates	WHERE group_id in (?)"""
 		self.cur.execute(sql, (group_id,))
@@ -293,6 +746,30 @@ class DuplicatesDB:
 		# return [i[0] for i in self.cur.fetchall()]
 		return gids
 
+	def get_files_of_groups(self, group_ids: list):
+		"""Method returns a dict of {group_id: (item_ids, full_paths)} of
+		the files of groups in one query."""
+		group_ids = list(group_ids)
+		marks = ",".join("?" * len(group_ids))
+		sql = f"""SELECT group_id, item_id, full_path FROM duplicates
+				WHERE group_id IN ({marks}) ORDER BY sn"""
+		self.cur.execute(sql, group_ids)
+		files = {group_id: ([], []) for group_id in group_ids}
+		for group_id, item_id, full_path in self.cur.fetchall():
+			files[group_id][0].append(item_id)
+			files[group_id][1].append(full_path)
+		return files
+
+	def get_files_of_page(self, page: int):
+		"""Method returns the (group_id, item_id, full_path) of the files of
+		every group of a page in one query. They are ordered by group and
+		then by file."""
+		sql = """SELECT d.group_id, d.item_id, d.full_path FROM groups AS g
+				JOIN duplicates AS d ON d.group_id = g.group_id
+				WHERE g.page = (?) ORDER BY g.rank, d.sn"""
+		self.cur.execute(sql, (page,))
+		return self.cur.fetchall()
+
 	def get_full_paths_of_group(self, group_id: str):
 		sql = """SELECT full_path FROM duplicates WHERE group_id in (?)"""
 		self.cur.execute(sql, (group_id,))
@@ -362,15 +839,21 @@ class DuplicatesDB:
 		self.cur.execute(sql, (item_id,))
 		self.con.commit()
 
-	def toggle_selected_of_items(self, item_ids: list):
-		"""Method to toggle the value of the 'selected' column of the
-		`duplicate` table."""
-		sql = """UPDATE duplicates
-				SET selected = CASE selected
-								WHEN 0 THEN 1 
-								ELSE 0 END
-				WHERE item_id = ?"""
-		self.cur.executemany(sql, item_ids)
+	def get_selection_state(self):
+		"""Method returns the (sn, item_id, size_bytes, selected, is_original)
+		rows of the `duplicate` table that SelectionBitmap.load() needs."""
+		sql = """SELECT sn, item_id, COALESCE(size_bytes, 0), selected,
+					dtype = 'Original'
+				FROM duplicates ORDER BY sn"""
+		self.cur.execute(sql)
+		return self.cur.fetchall()
+
+	def set_selected_of_sns(self, rows: list):
+		"""Method to write a batch of (selected, sn) rows, e.g. from
+		SelectionBitmap.take_pending(), to the `duplicate` table in one
+		transaction."""
+		sql = """UPDATE duplicates SET selected = ? WHERE sn = ?"""
+		self.cur.executemany(sql, rows)
 		self.con.commit()
 
 	def set_selected_of_dtype(self, dtype: Literal["Original", "Copy"],
@@ -387,10 +870,446 @@ class DuplicatesDB:
 		self.cur.execute(sql, (dtype,))
 		self.con.commit()
 
+	def auto_select(self, keep: tuple = ("oldest",), prefer: str = None,
+					delete_in: str = None) -> int:
+		"""Method to select the files to delete of every group that is paged,
+		i.e. that matches the current filter, with rules. One file of every
+		group is kept and is unselected. Returns the quantity of selected
+		files.
+
+		The kept file is the first file of its group in this order:
+		prefer - files in this folder first
+		delete_in - files outside of this folder first
+		keep - keys of KEEP_RULES, e.g. ("resolution", "oldest") keeps the
+			   oldest of the files with the largest resolution.
+		Ties are broken by their serial number (sn).
+
+		All the other files are selected. When `delete_in` is given, only
+		those in this folder are selected, i.e. only the copies in it are
+		deleted. The selection is updated with one statement.
+		"""
+		unknown = set(keep).difference(KEEP_RULES)
+		if unknown:
+			raise ValueError(f"keep={keep} is invalid. Its values must be "
+							 f"some of these: {tuple(KEEP_RULES)}.")
+
+		def in_folder(folder):
+			"""Returns the LIKE pattern of the files in folder."""
+			folder = os.path.join(folder, "")  # ends with a separator
+			return folder.replace("\\", "\\\\").replace(
+				"%", "\\%").replace("_", "\\_") + "%"
+
+		# Named parameters, i.e. a condition can be used more than once in
+		# any order.
+		order = []
+		params = {}
+		if prefer:
+			order.append(r"(full_path LIKE :prefer ESCAPE '\') DESC")
+			params["prefer"] = in_folder(prefer)
+		if delete_in:
+			order.append(r"(full_path LIKE :delete_in ESCAPE '\')")
+			params["delete_in"] = in_folder(delete_in)
+		order.extend(KEEP_RULES[i] for i in keep)
+		order.append("sn")
+		select = "r.n > 1"
+		if delete_in:
+			select = r"r.n > 1 AND r.full_path LIKE :delete_in ESCAPE '\'"
+		self.cur.execute(
+			f"""UPDATE duplicates SET selected = s.selected
+			FROM (SELECT r.item_id, {select} AS selected
+				  FROM (SELECT item_id, full_path, ROW_NUMBER() OVER
+						(PARTITION BY group_id ORDER BY {", ".join(order)})
+						AS n
+						FROM duplicates
+						WHERE group_id IN (SELECT group_id FROM groups
+										   WHERE page IS NOT NULL)) AS r
+				  ) AS s
+			WHERE duplicates.item_id = s.item_id
+				AND duplicates.selected != s.selected""", params)
+		self.con.commit()
+		return self.get_totals_of_selected()[0]
+
 	def delete_fiid(self, fiid: str):
+		"""Method to delete a file. The pages and first_row of the groups
+		are reassigned, i.e. the rows after it move up."""
 		sql = """DELETE FROM duplicates WHERE item_id in (?)"""
 		self.cur.execute(sql, (fiid,))
-		self.con.commit()
+		self.assign_pages()
+
+
+class SelectionBitmap:
+	"""Class to hold the selected state of the files of a DuplicatesDB in a
+	bitmap that is indexed by their serial number (sn), i.e. bit sn is 1 when
+	the file is selected. It is used by tkinter's main event loop so that the
+	selection can be read and changed without sqlite3 queries.
+
+	Toggling an item is O(1). The quantity and byte size of the selected
+	files are kept as running totals that are initialised by a popcount of
+	the bitmap. Every change is recorded as a batch in an undo stack and in a
+	write-behind buffer that is written to the `duplicates` table in batches
+	with DuplicatesDB.set_selected_of_sns().
+
+	User Methods:
+	.load(rows) - rebuild the bitmap from DuplicatesDB.get_selection_state()
+	.is_selected(item_id) - returns True when an item is selected
+	.get_selected_of_items(item_ids) - returns the 0/1 values of items
+	.toggle(item_ids) - toggle the selection of items
+	.toggle_dtype(dtype) - toggle the selection of all items of a dtype
+	.undo() - revert the last batch and returns the ids of its items
+	.take_pending() - returns and clears the write-behind buffer
+	.count() - returns the popcount of the bitmap
+	"""
+
+	def __init__(self, on_change=None):
+		self.on_change = on_change  # called after every change
+		self.nselected = 0  # quantity of selected files
+		self.selected_bytes = 0  # byte size of selected files
+		self._sns = {}  # {item_id: sn, ...}
+		self._item_ids = np.empty(0, dtype=object)  # item_id of each sn
+		self._sizes = np.empty(0, dtype=np.int64)  # size_bytes of each sn
+		self._exists = np.empty(0, dtype=bool)  # sn is a file
+		self._originals = np.empty(0, dtype=bool)  # sn is an Original file
+		self._bits = np.empty(0, dtype=np.uint8)  # the bitmap
+		self._undo = []  # [[sn, ...], ...]
+		self._pending = {}  # {sn: selected, ...}
+
+	def load(self, rows: list):
+		"""Method to rebuild the bitmap from the (sn, item_id, size_bytes,
+		selected, is_original) rows of DuplicatesDB.get_selection_state().
+		The undo stack and the write-behind buffer are cleared."""
+		size = rows[-1][0] + 1 if rows else 0
+		sns, item_ids, sizes, selected, originals = zip(*rows) if rows \
+			else ((), (), (), (), ())
+		sns = np.array(sns, dtype=np.int64)
+		self._sns = dict(zip(item_ids, sns.tolist()))
+		self._item_ids = np.empty(size, dtype=object)
+		self._item_ids[sns] = item_ids
+		self._sizes = np.zeros(size, dtype=np.int64)
+		self._sizes[sns] = sizes
+		self._exists = np.zeros(size, dtype=bool)
+		self._exists[sns] = True
+		self._originals = np.zeros(size, dtype=bool)
+		self._originals[sns] = np.array(originals, dtype=bool)
+		bools = np.zeros(size, dtype=bool)
+		bools[sns] = np.array(selected, dtype=bool)
+		self._bits = np.packbits(bools, bitorder="little")
+		self.nselected = self.count()
+		self.selected_bytes = int(self._sizes[bools].sum())
+		self._undo.clear()
+		self._pending.clear()
+
+	def count(self) -> int:
+		"""Method returns the quantity of selected files from a popcount of
+		the bitmap."""
+		return int(POPCOUNT[self._bits].sum(dtype=np.int64))
+
+	def _is_set(self, sn: int) -> int:
+		return int(self._bits[sn >> 3] >> (sn & 7) & 1)
+
+	def _flip(self, sns: list):
+		"""Method to flip the bits of `sns` and to record their new values in
+		the running totals and the write-behind buffer."""
+		for sn in sns:
+			self._bits[sn >> 3] ^= 1 << (sn & 7)
+			value = self._is_set(sn)
+			sign = 1 if value else -1
+			self.nselected += sign
+			self.selected_bytes += sign * int(self._sizes[sn])
+			self._pending[sn] = value
+		if sns and self.on_change:
+			self.on_change()
+
+	def __contains__(self, item_id: str) -> bool:
+		return item_id in self._sns
+
+	def is_selected(self, item_id: str) -> bool:
+		return bool(self._is_set(self._sns[item_id]))
+
+	def get_selected_of_items(self, item_ids: list) -> list:
+		return [self._is_set(self._sns[i]) for i in item_ids]
+
+	def toggle(self, item_ids: list):
+		"""Method to toggle the selection of `item_ids` as one batch."""
+		sns = [self._sns[i] for i in item_ids]
+		self._flip(sns)
+		if sns:
+			self._undo.append(sns)
+
+	def toggle_dtype(self, dtype: Literal["Original", "Copy"]) -> int:
+		"""Method to toggle the selection of all items of a dtype as one
+		batch. Toggling only occurs when their selected values are all 0 or
+		all 1. Else, all their selected values are set to 1. Either way, all
+		their selected values are the same afterwards and this value is
+		returned."""
+		if dtype not in ("Original", "Copy"):
+			raise ValueError("The value of 'dtype' must be either 'Original'"
+							 " or 'Copy'.")
+		mask = self._originals.copy()
+		if dtype == "Copy":
+			mask = self._exists & ~mask
+		bools = np.unpackbits(self._bits, count=mask.size,
+							  bitorder="little").view(bool)
+		value = not bools[mask].all()
+		changed = np.flatnonzero(mask & (bools != value))
+		bools[changed] = value
+		self._bits = np.packbits(bools, bitorder="little")
+		sign = 1 if value else -1
+		self.nselected += sign * changed.size
+		self.selected_bytes += sign * int(self._sizes[changed].sum())
+		self._pending.update(dict.fromkeys(changed.tolist(), int(value)))
+		if changed.size:
+			self._undo.append(changed.tolist())
+			if self.on_change:
+				self.on_change()
+		return int(value and bool(mask.any()))
+
+	def undo(self) -> list:
+		"""Method to revert the last batch of changes and returns the ids of
+		its items."""
+		if not self._undo:
+			return []
+		sns = self._undo.pop()
+		self._flip(sns)
+		return self._item_ids[sns].tolist()
+
+	def get_pending_items(self) -> dict:
+		"""Method returns the {item_id: selected, ...} of the changes that are
+		not written to the database yet."""
+		return {self._item_ids[k]: v for k, v in self._pending.items()}
+
+	def set_items(self, values: dict):
+		"""Method to set the selection of the items of `values`, i.e.
+		{item_id: selected, ...}, that exist as one batch without undo."""
+		self._flip([self._sns[k] for k, v in values.items()
+					if k in self._sns and self._is_set(self._sns[k]) != v])
+
+	def take_pending(self) -> list:
+		"""Method returns the (selected, sn) rows of the changes that are not
+		written to the database yet and clears them."""
+		rows = [(v, k) for k, v in self._pending.items()]
+		self._pending.clear()
+		return rows
+
+	@property
+	def pending(self) -> bool:
+		return bool(self._pending)
+
+
+class DuplicatesDBWorker:
+	"""Class to run a DuplicatesDB instance in a dedicated thread, i.e. a
+	database actor that keeps sqlite3 work off tkinter's main event loop.
+
+	The "dbthread" creates and owns the sqlite3 connection. Requests are
+	taken from a queue and executed one at a time and in order. Every request
+	returns a concurrent.futures.Future. When a callback is given, it is called
+	with the result of the request in tkinter's main event loop, i.e. it can
+	safely update widgets.
+
+	DuplicatesDB methods that are not defined here are proxied as blocking
+	calls. So, `worker.get_selected()` behaves like `db.get_selected()`.
+	They wait for the "dbthread" in tkinter's main event loop, i.e. the hot
+	paths, e.g. page loads, use `.submit()` with a callback instead. Results
+	of reads that were prefetched with `.prefetch()` with the same arguments
+	are reused by these calls until the next write request is submitted. The
+	exception of a request with a callback is passed to its errback, or is
+	logged when it has none.
+
+	The `.generation` attribute counts the write requests other than the
+	write-behind of the selection, i.e. results of reads that were obtained
+	in an older generation may be outdated.
+
+	The `.selection` attribute is a SelectionBitmap of the database that is
+	read and toggled without requests. It is reloaded by a callback after
+	every write request, i.e. the callback of a write sees the reloaded
+	selection. Its changes are written behind, i.e. after a short delay or
+	before the next request, whichever is earlier. So, requests always see
+	the current selection.
+
+	User Methods:
+	.submit(method, *args, callback=None, errback=None, **kwargs) - run a
+	                                  DuplicatesDB method asynchronously
+	.prefetch(method, *args, **kwargs) - run a DuplicatesDB read method ahead
+										 of time
+	.flush_selection() - write the changes of `.selection` to the database
+	.close() - close the database and stop the "dbthread"
+	"""
+
+	def __init__(self, master):
+		self.master = master  # a tkinter widget
+		self._requests = queue.SimpleQueue()
+		self._callbacks = queue.SimpleQueue()
+		self._ncallbacks = 0  # no. of callbacks not yet delivered
+		self._after_id = None
+		self._poll_delay = POLL_MIN  # milliseconds
+		self._prefetched = {}  # {(method, args, kwargs): Future, ...}
+		self._selection = SelectionBitmap(on_change=self._schedule_flush)
+		self._nreloads = 0  # no. of reloads of self._selection not yet done
+		self._unloaded = {}  # {item_id: selected, ...} written during reloads
+		self._after_id_flush = None
+		self.generation = 0  # quantity of write requests
+		self._ready = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="dbthread",
+										daemon=True)
+		self._thread.start()
+		self._ready.wait()
+
+	def __getattr__(self, name):
+		if not callable(getattr(DuplicatesDB, name, None)):
+			raise AttributeError(f"{type(self).__name__!r} object has no "
+								 f"attribute {name!r}")
+
+		def blocking_call(*args, **kwargs):
+			self.flush_selection()  # a prefetched read may be stale
+			try:
+				future = self._prefetched.pop(
+					(name, args, tuple(sorted(kwargs.items()))))
+			except (KeyError, TypeError):
+				future = self.submit(name, *args, **kwargs)
+			return future.result()
+
+		return blocking_call
+
+	@property
+	def selection(self) -> SelectionBitmap:
+		return self._selection
+
+	def _selection_loaded(self, rows: list):
+		"""Callback to reload self._selection after a write request. The
+		changes of the selection made after the write was submitted are not
+		in `rows`, i.e. they are set again."""
+		self._nreloads -= 1
+		changes = {**self._unloaded, **self._selection.get_pending_items()}
+		self._selection.load(rows)
+		self._selection.set_items(changes)
+		if not self._nreloads:
+			self._unloaded.clear()
+
+	def _schedule_flush(self):
+		if not self._after_id_flush:
+			self._after_id_flush = self.master.after(WRITE_BEHIND_DELAY,
+													 self.flush_selection)
+
+	def flush_selection(self):
+		"""Method to request the "dbthread" to write the pending changes of
+		self.selection to the database in one batch."""
+		if self._after_id_flush:
+			self.master.after_cancel(self._after_id_flush)
+			self._after_id_flush = None
+		if self._selection.pending:
+			if self._nreloads:
+				self._unloaded.update(self._selection.get_pending_items())
+			self.submit("set_selected_of_sns", self._selection.take_pending())
+
+	def _run(self):
+		"""Method executed by the "dbthread"."""
+		db = DuplicatesDB()
+		self._ready.set()
+		while True:
+			request = self._requests.get()
+			if request is None:
+				break
+			method, args, kwargs, future = request
+			if not future.set_running_or_notify_cancel():
+				continue
+			try:
+				result = getattr(db, method)(*args, **kwargs)
+			except BaseException as exc:
+				future.set_exception(exc)
+			else:
+				future.set_result(result)
+		db.close()
+
+	def submit(self, method: str, *args, callback=None, errback=None,
+			   **kwargs) -> cf.Future:
+		"""Method to request the "dbthread" to run a DuplicatesDB method.
+		`callback` is called with its result and `errback` with its exception
+		in tkinter's main event loop. Submitting a method that is not a read
+		clears all prefetched results. Submitting a write other than the
+		write-behind of self.selection reloads it before `callback` is
+		called."""
+		if method != "set_selected_of_sns":
+			self.flush_selection()
+		write = not method.startswith(("get_", "is_"))
+		reload = write and method != "set_selected_of_sns"
+		if write:
+			self._prefetched.clear()
+		future = cf.Future()
+		self._requests.put((method, args, kwargs, future))
+		trigger = future
+		if reload:
+			self.generation += 1
+			self._nreloads += 1
+			trigger = cf.Future()
+			self._requests.put(("get_selection_state", (), {}, trigger))
+			self._add_callback(trigger, trigger, self._selection_loaded, None,
+							   "get_selection_state")
+		if callback or errback:
+			self._add_callback(trigger, future, callback, errback, method)
+		return future
+
+	def _add_callback(self, trigger: cf.Future, future: cf.Future, callback,
+					  errback, method: str):
+		"""Method to deliver the outcome of `future` to `callback` or
+		`errback` in tkinter's main event loop after `trigger` is done."""
+		self._ncallbacks += 1
+		trigger.add_done_callback(
+			lambda f: self._callbacks.put((callback, errback, method, future)))
+		if not self._after_id:
+			self._poll_delay = POLL_MIN
+			self._after_id = self.master.after(POLL_MIN,
+											   self._check_callbacks_queue)
+
+	def prefetch(self, method: str, *args, **kwargs) -> None:
+		"""Method to run a DuplicatesDB read method ahead of its blocking
+		call with the same arguments."""
+		if not method.startswith(("get_", "is_")):
+			raise ValueError(f"{method=} is not a read method.")
+		key = (method, args, tuple(sorted(kwargs.items())))
+		if key not in self._prefetched:
+			self._prefetched[key] = self.submit(method, *args, **kwargs)
+
+	def _check_callbacks_queue(self):
+		"""Method to deliver all the done requests with a callback. It polls
+		again after POLL_MIN milliseconds when some were delivered, else the
+		poll interval is doubled up to POLL_MAX milliseconds. Polling stops
+		when every callback is delivered."""
+		delivered = False
+		try:
+			while True:
+				try:
+					callback, errback, method, future = self._callbacks.get(
+						block=False)
+				except queue.Empty:
+					break
+				self._ncallbacks -= 1
+				delivered = True
+				exc = future.exception()
+				if exc is None:
+					if callback:
+						callback(future.result())
+				elif errback:
+					errback(exc)
+				else:
+					logger.error("DuplicatesDB.%s failed.", method,
+								 exc_info=exc)
+		finally:
+			if self._ncallbacks:
+				self._poll_delay = POLL_MIN if delivered else \
+					min(2 * self._poll_delay, POLL_MAX)
+				self._after_id = self.master.after(
+					self._poll_delay, self._check_callbacks_queue)
+			else:
+				self._after_id = None
+
+	def close(self):
+		self.flush_selection()
+		if self._after_id:
+			self.master.after_cancel(self._after_id)
+			self._after_id = None
+		self._prefetched.clear()
+		self._requests.put(None)
+		self._thread.join()
+
 
 # if __name__ == "__main__":
 # 	from adp.functions.picture_finder_concurrent import fast_scandir, scandir_images_concurrently
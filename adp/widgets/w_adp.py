@@ -74,6 +74,8 @@ class ADPTable(ttk.Frame):
         cfe - concurrent.future.Executor. Its value is either "process" or
               "thread". Default is "process".
         layout - Either "horizontal" or "vertical". Default is "vertical".
+        virtual - Either True or False. Default is True, i.e. the Table only
+                  holds the rows around its viewport.
 
     Widget's Roles:
     self: Create and display the Find, Gallery and About widgets and bind the
@@ -91,6 +93,7 @@ class ADPTable(ttk.Frame):
     def __init__(self, master, **options):
         self.cfe = pop_kwargs("cfe", ["process", "thread"], options)
         self.layout = pop_kwargs("layout", ["vertical", "horizontal"], options)
+        self.virtual = pop_kwargs("virtual", [True, False], options)
         super().__init__(master, **options)
         self.master = master
         self._create_widgets()
@@ -102,7 +105,7 @@ class ADPTable(ttk.Frame):
         self.find = Find(self, layout=self.layout, cfe=self.cfe)
         self.find.hide_selected_path()
 
-        self.table = Table(self)
+        self.table = Table(self, virtual=self.virtual)
         self.table.set_sdir(self.find.selected_dir)
         self.table.set_sql3db(self.find.sqlite3_db)
 
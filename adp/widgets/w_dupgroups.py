@@ -6,16 +6,24 @@ import concurrent.futures as cf
 import queue
 import os
 import threading
+import sqlite3
 from itertools import repeat
+from functools import partial
 
 # External Packages
-from PIL import Image, ImageTk
+from PIL import Image, ImageTk, ExifTags
 
 # Project module
 from adp.functions import filesize
+from adp.functions.thumbnail_store import (get_thumbnail_store,
+                                           get_freedesktop_thumbnail,
+                                           put_freedesktop_thumbnail,
+                                           get_exif_thumbnail,
+                                           get_thumbnail_size, image_to_ppm)
 
 __all__ = ["DupGroup", "get_thumbnail", "get_thumbnail_c",
-           "get_thumbnails_concurrently_with_queue", ]
+           "get_thumbnails_concurrently_with_queue",
+           "open_picture_for_thumbnail", ]
 __version__ = '0.1.1'
 __license__ = "Apache License, Version 2.0"
 __copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
@@ -23,24 +31,107 @@ __author__ = 'Chia Yan Hon, Julian.'
 __email__ = "julianchiayh@gmail.com"
 
 
-def get_thumbnail(fpath: str, psize: tuple[int, int] = (200, 200)) -> Image:
+# The transpositions that undo each EXIF Orientation, like
+# PIL.ImageOps.exif_transpose().
+TRANSPOSES = {2: Image.Transpose.FLIP_LEFT_RIGHT,
+              3: Image.Transpose.ROTATE_180,
+              4: Image.Transpose.FLIP_TOP_BOTTOM,
+              5: Image.Transpose.TRANSPOSE,
+              6: Image.Transpose.ROTATE_270,
+              7: Image.Transpose.TRANSVERSE,
+              8: Image.Transpose.ROTATE_90}
+
+
+def open_picture_for_thumbnail(fpath: str, size: tuple[int, int]) -> Image:
+    """Function returns the picture at fpath decoded at the least cost that
+    still covers a thumbnail of size, i.e. in this order:
+     1. the thumbnail that is embedded in its EXIF data, when it is large
+        enough,
+     2. a DCT-scaled decode of a JPEG, i.e. in draft mode at the smallest
+        scale (1/8, 1/4, 1/2) that is at least the size of the thumbnail,
+        and
+     3. a full decode of other formats, which is reduced by the largest
+        integer factor that keeps it at least the size of the thumbnail.
+    It is returned in RGB mode like the thumbnails of a ThumbnailStore and
+    upright, i.e. with the EXIF Orientation of the picture applied, which an
+    embedded thumbnail does not carry.
+    """
+    with Image.open(fpath) as img:
+        orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+        # The size of the thumbnail, i.e. not of the box that it fits in.
+        # Else, a panorama would be decoded at a larger scale than needed.
+        twidth, theight = get_thumbnail_size(img.size, size)
+        thumb = None
+        if img.format == "JPEG":
+            thumb = get_exif_thumbnail(img, size)
+            if thumb is None:
+                img.draft("RGB", (twidth, theight))
+        if thumb is None:
+            img.load()
+    if thumb is None:
+        factor = min(img.width // twidth, img.height // theight)
+        if factor > 1 and img.mode in ("L", "LA", "RGB", "RGBA"):
+            img = img.reduce(factor)
+    else:
+        img = thumb
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if orientation in TRANSPOSES:
+        img = img.transpose(TRANSPOSES[orientation])
+    return img
+
+
+def get_thumbnail(fpath: str, psize: tuple[int, int] = (200, 200),
+                  writeback: bool = False) -> Image:
     """Function uses the Image module of the Pillow pkg to convert a picture to
     a thumbnail size picture and returns the thumbnail picture.
 
+    The thumbnail is got from the ThumbnailStore of the process when it was
+    stored earlier, i.e. in this or an earlier session, and the picture is
+    unchanged since. Else, it is reduced from the thumbnail that a file
+    manager made in ~/.cache/thumbnails, or else it is converted from the
+    picture, see open_picture_for_thumbnail(). Either way, it is stored and
+    returned in RGB mode.
+
     fpath - file full path
     psize - desired pixel width and height of thumbnail,
+    writeback - write a "large" thumbnail to ~/.cache/thumbnails when the
+                picture is converted
     """
     # print(f"{threading.main_thread()=} {threading.current_thread()=}")
-    with Image.open(fpath) as img:
-        img.load()
-    img.thumbnail(psize, resample=Image.Resampling.NEAREST, reducing_gap=1.1)
-    # Above options used to gain optimal conversion performance at the
-    # expense of quality.
+    store = get_thumbnail_store(psize)
+    if store:
+        img = store.get(fpath)
+        if img is not None:
+            return img
+    img = get_freedesktop_thumbnail(fpath, psize)
+    if img is not None and img.mode != "RGB":
+        img = img.convert("RGB")  # e.g. a RGBA PNG
+    if img is None:
+        img = open_picture_for_thumbnail(fpath,
+                                         (256, 256) if writeback else psize)
+        if writeback:
+            img.thumbnail((256, 256), resample=Image.Resampling.BILINEAR,
+                          reducing_gap=2.0)
+            try:
+                put_freedesktop_thumbnail(fpath, img)
+            except OSError as exc:
+                print(f"Thumbnail of {fpath} is not written back: {exc}")
+        img.thumbnail(psize, resample=Image.Resampling.NEAREST,
+                      reducing_gap=1.1)
+        # Above options used to gain optimal conversion performance at the
+        # expense of quality.
+    if store:
+        try:
+            store.put(fpath, img)
+        except (OSError, sqlite3.Error) as exc:
+            print(f"Thumbnail of {fpath} is not stored: {exc}")
     return img
 
 
 def get_thumbnail_c(giid: str, fiid: str, fpath: str,
-                    psize: tuple[int, int] = (200, 200)) \
+                    psize: tuple[int, int] = (200, 200),
+                    writeback: bool = False) \
         -> tuple[str, str, Image]:
     """Function uses the Image module of the Pillow pkg to convert a picture to
     a thumbnail size picture and returns the thumbnail picture along with it's
@@ -50,25 +141,23 @@ def get_thumbnail_c(giid: str, fiid: str, fpath: str,
     fiid - file item id for a tkinter.ttk.Treeview widget
     fpath - file full path
     psize - desired pixel width and height of thumbnail,
+    writeback - see get_thumbnail()
     """
     # print(f"{threading.main_thread()=} {threading.current_thread()=}")
-    with Image.open(fpath) as img:
-        img.load()
-    img.thumbnail(psize, resample=Image.Resampling.NEAREST, reducing_gap=1.1)
-    # Above options used to gain optimal conversion performance at the
-    # expense of quality.
-    return giid, fiid, img
+    return giid, fiid, get_thumbnail(fpath, psize, writeback)
 
 
 def get_thumbnails_concurrently_with_queue(
         g_iids: list, f_iids: list, f_paths: list, rqueue: queue.Queue,
         ncpu : int = os.cpu_count(),
         cfe: str = "Process",
-        exit_event: threading.Event = None,) -> None:
+        exit_event: threading.Event = None,
+        writeback: bool = False) -> None:
     """Function to concurrently convert a list of picture files to
     thumbnail-sized pictures(tsp). These tsps can then be extracted from
-    `rqueue` individually."""
-    job_fn = get_thumbnail_c
+    `rqueue` individually. Stored thumbnails and those made by file managers
+    are reused, see get_thumbnail()."""
+    job_fn = partial(get_thumbnail_c, writeback=writeback)
     match cfe:
         case "process": executor = cf.ProcessPoolExecutor(max_workers=ncpu)
         case "thread": executor = cf.ThreadPoolExecutor(max_workers=ncpu)
@@ -102,18 +191,33 @@ class DupGroup(ttk.Frame):
             - consists of ttk.Labels that displays the group item id (giid),
               quantity and the total size of duplicate pictures.
 
+     An instance can be reused for another group with .rebind(), i.e. its
+     ttk.Checkbuttons are reused. The tk.PhotoImage of its thumbnails are
+     deleted explicitly when they are replaced, released or destroyed, i.e.
+     their pixels do not wait for the garbage collector.
+
+     kwargs:
+        total_bytes - the byte size of all the pictures, e.g. from the
+                      aggregates of a DuplicatesDB instance.
+
      User Method:
+     .rebind(g_iid, f_iids, f_paths, f_selected, total_bytes) - show another
+                                                                group
+     .set_thumbnail(fiid, ppm) - show the thumbnail of fiid
+     .release() - delete the thumbnails and hide this instance for reuse
      .reset() - to destroy/clear all its contents.
      """
 
     def __init__(self, master, g_iid: str, f_iids: list, f_paths: list,
-                 f_selected: list, with_image=True, **options):
+                 f_selected: list, with_image=True, total_bytes: int = None,
+                 **options):
         super().__init__(master, style='DupGroup.TFrame', **options)
         self.master = master
         self.g_iid = g_iid
         self.f_iids = f_iids
         self.f_paths = f_paths
         self.f_selected = f_selected
+        self.total_bytes = total_bytes  # byte size of all pictures
         self.total_size = self.get_total_size()
 
         self.infoframe = None  # A ttk.Frame widget
@@ -123,9 +227,10 @@ class DupGroup(ttk.Frame):
         self.iff_lbnimages = None  # A ttk.Frame widget
         self.iff_lbsize = None  # A ttk.Frame widget
 
-        self.imf_thumbnails = {}  # {fiid: ImageTk.PhotoImage, ...}
+        self.imf_thumbnails = {}  # {fiid: tk.PhotoImage, ...}
         self.imf_checkvalues = {}  # {fiid: tk.IntVar, ...}
         self.imf_checkbuttons = {}  # {fiid: ttk.Checkbutton, ...}
+        self._checkbuttons = []  # [(ttk.Checkbutton, tk.IntVar), ...] reused
 
         self._create_widgets_inside_self()
         if with_image:
@@ -157,26 +262,73 @@ class DupGroup(ttk.Frame):
         self.iff_lbsize.grid(row=2, column=0, sticky='w', padx=10, pady=5)
 
     def _create_checkbuttons(self, with_image: bool = True):
+        """Method to show a Checkbutton per picture. Existing Checkbuttons
+        are reused and the surplus ones are hidden."""
         imf = self.imagesframe
+        self.imf_checkbuttons.clear()
+        self.imf_checkvalues.clear()
         for mm, (fpath, fiid, fselected) in enumerate(
                 zip(self.f_paths, self.f_iids, self.f_selected)):
-            self.imf_checkvalues[fiid] = tk.IntVar(master=imf, value=fselected)
+            try:
+                cb, value = self._checkbuttons[mm]
+            except IndexError:
+                value = tk.IntVar(master=imf)
+                cb = ttk.Checkbutton(imf, variable=value, compound="top")
+                # Bind an event handler to each checkbutton
+                cb.bind('<ButtonRelease-1>', self.indicate_checkbutton_toggled)
+                self._checkbuttons.append((cb, value))
+            value.set(fselected)
+            cb["text"] = fiid
+            cb.grid(row=0, column=mm, sticky='nsew', padx=(0, 5), pady=5)
+            self.imf_checkvalues[fiid] = value
+            self.imf_checkbuttons[fiid] = cb
             if with_image:
-                img = get_thumbnail(fpath)
-                self.imf_thumbnails[fiid] = ImageTk.PhotoImage(img)
-                self.imf_checkbuttons[fiid] = ttk.Checkbutton(
-                    imf, text=fiid, image=self.imf_thumbnails[fiid],
-                    variable=self.imf_checkvalues[fiid], compound="top")
-            elif not with_image:
-                self.imf_checkbuttons[fiid] = ttk.Checkbutton(
-                    imf, text=fiid, variable=self.imf_checkvalues[fiid],
-                    compound="top")
-                self.imf_checkbuttons[fiid].grid(
-                    row=0, column=mm, sticky='nsew', padx=(0, 5), pady=5)
-
-            # Bind an event handler to each checkbutton
-            self.imf_checkbuttons[fiid].bind(
-                '<ButtonRelease-1>', self.indicate_checkbutton_toggled)
+                self.set_thumbnail(fiid, image_to_ppm(get_thumbnail(fpath)))
+        for cb, _ in self._checkbuttons[len(self.f_iids):]:
+            cb.grid_remove()
+
+    def rebind(self, g_iid: str, f_iids: list, f_paths: list,
+               f_selected: list, total_bytes: int = None) -> None:
+        """Method to show another group, without thumbnails, in this
+        instance."""
+        self.clear_thumbnails()
+        self.g_iid = g_iid
+        self.f_iids = f_iids
+        self.f_paths = f_paths
+        self.f_selected = f_selected
+        self.total_bytes = total_bytes
+        self.total_size = self.get_total_size()
+        self.iff_lbgrp["text"] = f"Duplicates Group {self.g_iid[1:]}:"
+        self._create_checkbuttons(with_image=False)
+        self._update_stats()
+
+    def set_thumbnail(self, fiid: str, ppm: bytes) -> None:
+        """Method to show a thumbnail, i.e. its PPM bytes, in the Checkbutton
+        of fiid. The tk.PhotoImage that it replaces is deleted."""
+        photo = tk.PhotoImage(master=self, data=ppm, format="PPM")
+        self.imf_checkbuttons[fiid]["image"] = photo
+        old = self.imf_thumbnails.pop(fiid, None)
+        self.imf_thumbnails[fiid] = photo
+        if old is not None:
+            old.tk.call("image", "delete", old.name)
+
+    def clear_thumbnails(self) -> None:
+        """Method to delete the tk.PhotoImage of every thumbnail."""
+        for fiid, photo in self.imf_thumbnails.items():
+            if fiid in self.imf_checkbuttons:
+                self.imf_checkbuttons[fiid]["image"] = ""
+            photo.tk.call("image", "delete", photo.name)
+        self.imf_thumbnails.clear()
+
+    def release(self) -> None:
+        """Method to delete the thumbnails and to hide this instance, i.e.
+        for a later .rebind()."""
+        self.clear_thumbnails()
+        self.grid_remove()
+
+    def destroy(self):
+        self.clear_thumbnails()
+        super().destroy()
 
     def _update_stats(self):
         # 1. Update self.iff_lbnimages
@@ -192,7 +344,12 @@ class DupGroup(ttk.Frame):
         self.iff_lbsize["text"] = f'{ts[0]:.2f} {ts[1]}'
 
     def get_total_size(self):
-        return filesize(sum([Path(i).stat().st_size for i in self.f_paths]))
+        """Method returns the quantity and unit of the total size of the
+        pictures. They are only stat-ed when self.total_bytes is not given."""
+        if self.total_bytes is None:
+            self.total_bytes = sum([Path(i).stat().st_size for i in
+                                    self.f_paths])
+        return filesize(self.total_bytes)
 
     def indicate_checkbutton_toggled(self, event):
         self.master.toggled_checkbutton = event.widget
@@ -200,8 +357,10 @@ class DupGroup(ttk.Frame):
 
     def reset(self):
         # 1. Destroy children widgets
+        self.clear_thumbnails()
         self.infoframe.destroy()
         self.imagesframe.destroy()
+        self._checkbuttons.clear()
 
         # Clear self.imagesframe attributes
         if self.imf_checkbuttons:
@@ -210,3 +369,61 @@ class DupGroup(ttk.Frame):
             self.imf_thumbnails.clear()
         if self.imf_checkvalues:
             self.imf_checkvalues.clear()
+
+
+if __name__ == "__main__":
+    import sys
+    from time import perf_counter
+
+    source = Path(sys.argv[1] if len(sys.argv) > 1 else
+                  Path.home() / "Pictures")
+
+    # 1. Compare a full decode with open_picture_for_thumbnail() over mixed
+    #    formats, i.e. without the ThumbnailStore and freedesktop thumbnails.
+    suffixes = {".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff", ".bmp"}
+    mixed = [i for i in source.rglob("*") if i.suffix.lower() in suffixes]
+    for suffix in sorted({i.suffix.lower() for i in mixed[:400]}):
+        files = [i for i in mixed[:400] if i.suffix.lower() == suffix]
+        start = perf_counter()
+        for p in files:
+            with Image.open(p) as im:
+                im.load()
+            im.thumbnail((200, 200), resample=Image.Resampling.NEAREST,
+                         reducing_gap=1.1)
+        full = perf_counter() - start
+        start = perf_counter()
+        for p in files:
+            im = open_picture_for_thumbnail(p, (200, 200))
+            im.thumbnail((200, 200), resample=Image.Resampling.NEAREST,
+                         reducing_gap=1.1)
+        reduced = perf_counter() - start
+        print(f"{len(files)} {suffix} pictures: full decode in {full:.4f} "
+              f"secs, reduced decode in {reduced:.4f} secs.")
+
+    # 2. Time the conversion of a page of thumbnails to Tk images with PIL's
+    #    Tk bridge and from PPM bytes in the main thread. The PPM bytes are
+    #    prepared by the workers, i.e. their time is printed separately.
+    #    Random thumbnails are used when source has no JPEG pictures.
+    paths = [i for i in source.rglob("*.jp*g")][:100]
+    if paths:
+        imgs = [get_thumbnail(str(p)) for p in paths]
+    else:
+        imgs = [Image.effect_noise((200, 150), 64).convert("RGB")
+                for _ in range(100)]
+    start = perf_counter()
+    ppms = [image_to_ppm(i) for i in imgs]
+    workers = perf_counter() - start
+    print(f"{len(imgs)} thumbnails: image_to_ppm in {workers:.4f} secs.")
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        sys.exit(f"Tk images are not timed: {exc}")
+    start = perf_counter()
+    photos = [ImageTk.PhotoImage(i) for i in imgs]
+    bridge = perf_counter() - start
+    start = perf_counter()
+    photos = [tk.PhotoImage(master=root, data=i, format="PPM") for i in ppms]
+    ppm = perf_counter() - start
+    root.destroy()
+    print(f"{len(imgs)} thumbnails: ImageTk.PhotoImage in {bridge:.4f} "
+          f"secs, tk.PhotoImage from PPM in {ppm:.4f} secs.")
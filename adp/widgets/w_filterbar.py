@@ -0,0 +1,153 @@
+# Python modules
+import tkinter as tk
+import tkinter.ttk as ttk
+from datetime import datetime
+
+__all__ = ["FilterBar"]
+__version__ = '0.1.1'
+__license__ = "Apache License, Version 2.0"
+__copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
+__author__ = 'Chia Yan Hon, Julian.'
+__email__ = "julianchiayh@gmail.com"
+
+MB = 1024 * 1024  # bytes
+SORTS = {"Reclaimable": "reclaimable", "Pictures": "nfiles",
+         "Newest": "newest", "Path": "path", "Found": "found"}
+
+
+class FilterBar(ttk.Frame):
+    """A row of ttk.Entry widgets to filter the duplicate groups that are
+    shown by the Table and Gallery widgets, i.e.:
+        Path - whitespace separated terms that a file path must contain
+        Size (MB) - the minimum and maximum size of a file
+        Date - the earliest and latest creation date (YYYY-MM-DD) of a file
+        Pictures - the minimum quantity of pictures in a group
+    and a ttk.Combobox to choose the order of the duplicate groups.
+
+    Its criteria are the keyword arguments of DuplicatesDB.set_filter() and
+    its sort key is the argument of DuplicatesDB.sort_groups().
+
+    User Methods:
+    .get_criteria() - returns a dict of the filter criteria
+    .get_sort_key() - returns the sort key
+    .clear() - empty all entries
+
+    Generated Virtual Events:
+    "<<FilterChanged>>" - after the "Apply" or "Clear" ttk.Button is
+                          clicked or the Return key is pressed in an entry.
+    "<<SortChanged>>" - after a sort key is chosen.
+    """
+
+    def __init__(self, master, **options):
+        super().__init__(master, **options)
+        self.text = tk.StringVar()
+        self.min_size = tk.StringVar()
+        self.max_size = tk.StringVar()
+        self.date_from = tk.StringVar()
+        self.date_to = tk.StringVar()
+        self.min_files = tk.StringVar()
+        self.sort = tk.StringVar(value=tuple(SORTS)[0])
+        self.entries = []  # widgets
+        self.cb_sort = None  # widget
+        self.bn_apply = None  # widget
+        self.bn_clear = None  # widget
+        self._create_widgets()
+
+    def _create_widgets(self):
+        lstyle = dict(style='Default.TLabel')
+        estyle = dict(style='Filter.TEntry')
+        layout = (
+            ("Path:", ((self.text, 24),)),
+            ("Size (MB):", ((self.min_size, 6), (self.max_size, 6))),
+            ("Date:", ((self.date_from, 10), (self.date_to, 10))),
+            ("Pictures ≥", ((self.min_files, 3),)),
+        )
+        column = 0
+        for text, variables in layout:
+            ttk.Label(self, text=text, **lstyle).grid(
+                row=0, column=column, sticky="e", padx=(10, 2), pady=5)
+            column += 1
+            for n, (variable, width) in enumerate(variables):
+                if n:
+                    ttk.Label(self, text="-", **lstyle).grid(
+                        row=0, column=column, padx=2, pady=5)
+                    column += 1
+                entry = ttk.Entry(self, textvariable=variable, width=width,
+                                  **estyle)
+                entry.grid(row=0, column=column, sticky="ew", pady=5)
+                entry.bind("<Return>", self._event_apply)
+                self.entries.append(entry)
+                column += 1
+        self.columnconfigure(1, weight=1)
+
+        ttk.Label(self, text="Sort:", **lstyle).grid(
+            row=0, column=column, sticky="e", padx=(10, 2), pady=5)
+        self.cb_sort = ttk.Combobox(self, textvariable=self.sort,
+                                    values=tuple(SORTS), state="readonly",
+                                    width=11, style='Filter.TCombobox')
+        self.cb_sort.grid(row=0, column=column + 1, sticky="ew", pady=5)
+        self.cb_sort.bind("<<ComboboxSelected>>", self._event_sort)
+        column += 2
+
+        self.bn_apply = ttk.Button(self, text="Apply", command=self._apply)
+        self.bn_clear = ttk.Button(self, text="Clear", command=self.clear)
+        self.bn_apply.grid(row=0, column=column, sticky="nsew", padx=(10, 5),
+                           pady=5)
+        self.bn_clear.grid(row=0, column=column + 1, sticky="nsew",
+                           padx=(5, 10), pady=5)
+
+    def get_criteria(self) -> dict:
+        """Method returns the criteria of the entries as keyword arguments of
+        DuplicatesDB.set_filter(). A ValueError is raised when an entry is
+        invalid."""
+        criteria = {}
+        text = self.text.get().strip()
+        if text:
+            criteria["text"] = text
+        for key, var in (("min_bytes", self.min_size),
+                         ("max_bytes", self.max_size)):
+            value = var.get().strip()
+            if value:
+                try:
+                    criteria[key] = int(float(value) * MB)
+                except ValueError:
+                    raise ValueError(f"Size '{value}' is not a number.")
+        for key, var in (("date_from", self.date_from),
+                         ("date_to", self.date_to)):
+            value = var.get().strip()
+            if value:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    raise ValueError(f"Date '{value}' is not in the "
+                                     f"YYYY-MM-DD format.")
+                criteria[key] = value
+        value = self.min_files.get().strip()
+        if value:
+            try:
+                criteria["min_files"] = int(value)
+            except ValueError:
+                raise ValueError(f"Pictures '{value}' is not an integer.")
+        return criteria
+
+    def get_sort_key(self) -> str:
+        """Method returns the chosen sort key, i.e. the argument of
+        DuplicatesDB.sort_groups()."""
+        return SORTS[self.sort.get()]
+
+    def clear(self):
+        """Method to empty all entries and to generate "<<FilterChanged>>"."""
+        for var in (self.text, self.min_size, self.max_size, self.date_from,
+                    self.date_to, self.min_files):
+            var.set("")
+        self.event_generate("<<FilterChanged>>")
+
+    def _apply(self):
+        self.event_generate("<<FilterChanged>>")
+
+    def _event_apply(self, event):
+        self._apply()
+
+    def _event_sort(self, event):
+        self.cb_sort.selection_clear()
+        self.event_generate("<<SortChanged>>")
@@ -20,7 +20,7 @@ from adp.functions.picture_finder_concurrent import (fast_scandir, scandir_image
 from adp.functions.duplicates_finder_serial import detect_duplicates_serially
 from adp.functions.duplicates_finder_concurrent import (detect_duplicates_concurrently)
 from adp.widgets.constants import CWD, HOME, RING1, RING2, MSG0, BG
-from adp.widgets.duplicates_db import DuplicatesDB
+from adp.widgets.duplicates_db import DuplicatesDBWorker
 from adp.widgets.w_findindicators import DonutCharts, Findings
 from adp.widgets.w_progressbar import Progressbarwithblank
 
@@ -120,9 +120,10 @@ class Find(ttk.Frame):
         self._progress = tk.DoubleVar()
         self._progress.set(0.0)
 
-        # Create sqlite database
-        self.sqlite3_db = DuplicatesDB()
+        # Create sqlite database that runs in its own thread
+        self.sqlite3_db = DuplicatesDBWorker(self)
         self.sqlite3_db.create_table()
+        self._start1 = None
 
         # Create widgets inside self
         self._create_widgets()
@@ -206,16 +207,59 @@ class Find(ttk.Frame):
         self.bn_find.instate(["!disabled"], self.disable_find_button)
 
     def _event_populate_sqlite_db(self, event) -> None:
-        r0 = perf_counter()
-        self.sqlite3_db.populate(self.selected_dir.get(), self.duplicates)
-        r1 = perf_counter()
-        loadtime = r1 - r0
+        # Populate in the "dbthread" so that tkinter's main event loop isn't
+        # blocked.
+        self._start1 = perf_counter()
+        # The byte sizes, the pixel dimensions and the creation times of the
+        # pictures that were captured when they were found are stored in the
+        # database.
+        sizes = {i.path: i.size for i in self.rimages}
+        dimensions = {i.path: (i.width, i.height) for i in self.rimages}
+        ctimes = {i.path: i.ctime for i in self.rimages if i.ctime}
+        self.sqlite3_db.submit("populate", self.selected_dir.get(),
+                               dict(self.duplicates), sizes, dimensions,
+                               ctimes, callback=self._sqlite_db_populated)
+
+    def _sqlite_db_populated(self, result) -> None:
+        loadtime = perf_counter() - self._start1
         tl, tl_units = timings(loadtime)
         print(f'SQLite3 database created in {tl:.6f} {tl_units}.')
+        if self.quantities:
+            self._update_donutcharts()
         self.event_generate("<<Sqlite3DBPopulated>>", when="tail")
         # print(f'<<Sqlite3DBPopulated>> generated by {self}')
 
     # --------- Methods ---------#
+    def _update_donutcharts(self) -> None:
+        """Method to update self.w_pho and self.w_dup with the quantities of
+        the found pictures and the byte sizes that are aggregated in
+        self.sqlite3_db. The byte sizes are read in its "dbthread", i.e. the
+        donut charts are updated by a callback."""
+        originals = self.sqlite3_db.submit("get_totals_of_dtype", "Original")
+        # The requests are run in order, i.e. originals is done before the
+        # callback of copies.
+        self.sqlite3_db.submit(
+            "get_totals_of_dtype", "Copy",
+            callback=lambda copies: self._show_donutcharts(
+                originals.result(), copies))
+
+    def _show_donutcharts(self, originals: tuple, copies: tuple) -> None:
+        """Method to update self.w_pho and self.w_dup with the totals of the
+        "Original" and "Copy" files of self.sqlite3_db."""
+        nduplicates, noriginals, ncopies = self.quantities
+        # Get Size (Bytes) of Duplicates
+        size_o = originals[1]
+        size_c = copies[1]
+        # Calculate Size (Bytes) of Pictures
+        size_p = sum((i.size for i in self.rimages))
+        size_d = size_o + size_c
+        size_u = size_p - size_d
+        # Calculate quantity of non-duplicated pictures in self.rimages
+        npictures = len(self.rimages)
+        nunique = npictures - nduplicates
+        self.w_pho.update_gui(nunique, nduplicates, size_u, size_d)
+        self.w_dup.update_gui(noriginals, ncopies, size_o, size_c)
+
     def show_selected_path(self) -> None:
         self.w_selected_path.grid()
 
@@ -461,21 +505,9 @@ class Find(ttk.Frame):
                             f' {noriginals} originals & {ncopies} copies.\n'
                             f'Total time: {time_total:.6f} secs.')
                     print(f"{text}")
-                    # Calculate Size (Bytes) of Duplicates
-                    size_o = sum([os.stat(j).st_size for i in
-                                  duplicates.values() for j in list(i)[:1]])
-                    size_c = sum([os.stat(j).st_size for i in
-                                  duplicates.values() for j in list(i)[:-1]])
-                    # Calculate Size (Bytes) of Pictures
-                    size_p = sum((i.size for i in self.rimages))
-                    size_d = size_o + size_c
-                    size_u = size_p - size_d
-                    # Calculate quantity of non-duplicated pictures in
-                    # self.rimages
-                    npictures = len(self.rimages)
-                    nunique = npictures - nduplicates
-                    self.w_pho.update_gui(nunique, nduplicates, size_u, size_d)
-                    self.w_dup.update_gui(noriginals, ncopies, size_o, size_c)
+                    # Note: The donut charts are updated with the byte sizes
+                    #       of the duplicates after they are aggregated in
+                    #       self.sqlite3_db.
                     self.w_pb.hide()
                     self.enable_folder_button()
                     self.after_idle(self.event_generate, "<<FindDone>>")
@@ -2,10 +2,8 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 import tkinter.messagebox as messagebox
-import threading
 import queue
 from time import perf_counter
-import gc
 import os
 
 # External Packages
@@ -13,11 +11,13 @@ from PIL import ImageTk
 
 # Project modules
 from adp.functions.tools import timings, pop_kwargs
+from adp.functions.thumbnail_store import ThumbnailCache, CACHE_BYTES
+from adp.functions.thumbnail_scheduler import (ThumbnailScheduler, VISIBLE,
+                                               ADJACENT, PREFETCH)
 from adp.widgets.constants import DFONT, BFONT, FG, BG, BG2, CWD
 from adp.widgets.w_table import Table
 from adp.widgets.w_scrframe import VerticalScrollFrame
-from adp.widgets.w_dupgroups import (DupGroup,
-                                     get_thumbnails_concurrently_with_queue)
+from adp.widgets.w_dupgroups import DupGroup, get_thumbnail
 
 __all__ = ["Gallery"]
 __version__ = '0.1.1'
@@ -29,6 +29,7 @@ __email__ = "julianchiayh@gmail.com"
 
 dfont = list(DFONT.values())
 bfont = list(BFONT.values())
+PREFETCH_FAST = 1.0  # secs between page turns in one direction to prefetch 2
 
 
 class Gallery(Table):
@@ -36,6 +37,16 @@ class Gallery(Table):
     VerticalScrollFrame widget to acts as a viewport to display the
     information in self.tree in an organised thumbnail format.
 
+    The thumbnails of the DupGroup instances are kept in a ThumbnailCache
+    of `cache_bytes` bytes, i.e. paging back and forth does not convert the
+    pictures again. Missing thumbnails are converted by a ThumbnailScheduler
+    in the order of the groups in the viewport, the groups of the shown
+    pages and then the groups of the next page, or the next two pages when
+    pages are turned fast, in the paging direction, i.e. a prefetch. The
+    jobs of groups that are no longer shown are cancelled. The thumbnails
+    are PPM bytes that are prepared by the workers, i.e. tk.PhotoImage reads
+    them directly.
+
     User Methods:
     .reset_viewport() - reset self.dupgroupsframe and self.viewport
 
@@ -46,6 +57,10 @@ class Gallery(Table):
 
     def __init__(self, master, **options):
         self._cfe = pop_kwargs("cfe", ["process", "thread"], options)
+        self.thumbnails = ThumbnailCache(options.pop("cache_bytes",
+                                                     CACHE_BYTES))
+        if options.get("virtual"):
+            raise ValueError("virtual=True is not supported by Gallery.")
         super().__init__(master, **options)
 
         self.viewport = None  # widget: VerticalScrollFrame instance
@@ -55,10 +70,17 @@ class Gallery(Table):
         self._after_id_dupgroups_paging = None
         self._after_id_update_dupgroups_checkvalues = None
         self._after_id_move_dupgroup_to_top_of_viewport = None
+        self._after_id_thumbnails_queue = None
         self._thumbnails_queue = queue.Queue()
-        self._exitevent = threading.Event()  # for graceful exit
-        self._tthread = None
+        self._scheduler = ThumbnailScheduler(get_thumbnail,
+                                             self._thumbnails_queue,
+                                             ncpu=os.cpu_count(),
+                                             cfe=self._cfe, ppm=True)
         self._start0 = None
+        self._last_page_turn = None  # (direction, perf_counter())
+        self._nresets = 0  # quantity of viewport resets
+        self._prefetch_token = None  # of the latest prefetch of thumbnails
+        self._awaiting_completed = False  # until "completed" is got
 
         self._create_viewport()
         self.create_tree_bindings_part_2()
@@ -85,26 +107,31 @@ class Gallery(Table):
 
     def _create_dupgroupframe(self) -> None:
         """This ttk.Frame is the primary container of all DupGroup widget
-        instances. It is the only child of self.view port.interior. Every
-        time a full reset of the viewport is needed, this widget will be
-        destroyed and recreated to store a new batch of DupGroup widget
-        instances."""
+        instances. It is the only child of self.view port.interior. The
+        DupGroup instances that are no longer shown are hidden in
+        self._dupgroups_pool to be rebound to other groups, i.e. they are
+        not destroyed."""
         # print(f"{threading.main_thread()=} {threading.current_thread()=}")
         # print(f"{threading.active_count()=} {threading.enumerate()=}")
         self.dupgroupsframe = ttk.Frame(self.viewport.interior)
         self.dupgroupsframe.grid(row=0, column=0, sticky="nsew")
         self.dupgroupsframe.toggled_checkbutton = None
         self.dupgroupsframe.dupgroups = {}  # to contain all giids and their DupGroup instances
+        self._dupgroups_pool = []  # hidden DupGroup instances
 
     def reset_viewport(self) -> None:
+        self._nresets += 1  # pending DupGroup creations are dropped
+        self._prefetch_token = None
+        self._awaiting_completed = False
         if not self.dupgroupsframe.dupgroups:
             return
 
-        # 1. Destroy self.dupgroupsframe and recreate it.
-        self.dupgroupsframe.destroy()
-        gc.collect()  # Needed.
-        self._create_dupgroupframe()
-        self._create_dupgroupsframe_bindings()
+        # 1. Release all DupGroup instances to self._dupgroups_pool. The
+        #    cancelled jobs do not signal completion.
+        self._scheduler.cancel()
+        self._release_dupgroups_for_giids(
+            list(self.dupgroupsframe.dupgroups))
+        self.dupgroupsframe.toggled_checkbutton = None
 
         # 2. Reset viewport
         self.viewport.interior["width"] = 10
@@ -114,140 +141,62 @@ class Gallery(Table):
         self._after_id_update_dupgroups_checkvalues = None
         self._after_id_move_dupgroup_to_top_of_viewport = None
 
-    def create_or_reattach_next_next_page(self, visible_giids, visible_fiids)\
-            -> None:
-        tree = self.tree
-        db = self.sql3db
-        if not self.is_updating:
-            self.is_updating = True
-            self.disable_buttons()
-
-            # B.2.T.1 Detach previous page items
-            if self.shown_giids[0]:
-                tree.detach(*self.shown_giids[0])
-
-            # B.2.T.2 Create or reattach next next page group and
-            #         file items
-            nnpage = self.shown_pages[2] + 1
-            nnpage_giids = db.get_group_ids_of_page(nnpage)
-            if not set(nnpage_giids).issubset(
-                    set(self.populated_giids)):
-                # Create next next page items
-                self._populate_tree_page_from_sql3db(nnpage)
-                evg = 0
-            else:
-                # Reattach next next page items
-                for iid in nnpage_giids:
-                    tree.move(iid, "", 'end')  # reattach
-                evg = 1
-
-            # B.2.T.3 Update self.shown_pages
-            self.shown_pages = [i + 1 for i in self.shown_pages]
-
-            # B.2.T.4 Update self.shown_giids
-            self.shown_giids[0] = self.shown_giids[1]
-            self.shown_giids[1] = self.shown_giids[2]
-            self.shown_giids[2] = nnpage_giids
-
-            # B.2.T.5 Ensure visible group and file items are still
-            #         visible
-            if visible_giids:
-                for vgiid in visible_giids:
-                    tree.see(vgiid)
-            for vfiid in visible_fiids:
-                tree.see(vfiid)
-
-            # B.2.T.6 Generate virtual event
-            # Generate virtual event to initiate followup process related to
-            # creating or reattaching next page Dupgroups in self.viewport
-            # in the Gallery widget.
-            if evg == 0:
-                tree.event_generate(
-                    "<<TreePopulateNextNextPageDone>>",
-                    when="tail")
-            elif evg == 1:
-                tree.event_generate(
-                    "<<TreeReattachNextNextPageDone>>",
-                    when="tail")
-
-    def reattach_previous_previous_page(self, visible_giids, visible_fiids) \
-            -> None:
-        tree = self.tree
-        db = self.sql3db
-        if not self.is_updating:
-            self.disable_buttons()
-            self.is_updating = True
-
-            # B.2.T.1 Detach next page items.
-            if self.shown_giids[2]:
-                tree.detach(*self.shown_giids[2])
-
-            # B.2.T.2 Reattach previous previous page group and file
-            #         items
-            pppage = self.shown_pages[0] - 1
-            pppage_giids = db.get_group_ids_of_page(pppage)
-            if pppage_giids:
-                for iid in pppage_giids[-1:None:-1]:  # in reverse order
-                    tree.move(iid, "", 0)  # reattach
-
-            # B.2.T.3 Update self.shown_pages
-            self.shown_pages = [i - 1 for i in self.shown_pages]
-
-            # B.2.T.4 Update self.shown_giids
-            self.shown_giids[2] = self.shown_giids[1]
-            self.shown_giids[1] = self.shown_giids[0]
-            self.shown_giids[0] = pppage_giids
-
-            # B.2.T.5 Ensure visible group and file items are
-            #         still visible"
-            if visible_giids:
-                for vgiid in visible_giids[-1:None:-1]:  # in reverse order
-                    tree.see(vgiid)
-            for vfiid in visible_fiids[-1:None:-1]:  # in reverse order
-                tree.see(vfiid)
-
-            # B.2.T.6 Generate virtual event
-            # Generate virtual event to initiate followup process related to
-            # reattaching previous page Dupgroups in self.viewport in the
-            # Gallery widget.
-            tree.event_generate(
-                "<<TreeReattachPreviousPreviousPageDone>>", when="tail")
+    def destroy(self) -> None:
+        self._scheduler.shutdown()
+        super().destroy()
+
+    def refresh_table(self) -> None:
+        """Method to repopulate self.tree and self.viewport after the paging
+        of self.sql3db is changed, e.g. by a filter."""
+        self.reset_table()
+        self.reset_viewport()
+        self.create_tree_bindings_part_2()
+        self.set_tree_column0_heading_text(self.sdir.get())
+        self.populate_tree_the_first_time()
+        self.update_bn_delete_state()
+
+    def _page_turned(self) -> None:
+        """Method overrides Table._page_turned(). A page turn of self.tree
+        ends when the thumbnails of the DupGroup instances of the next or
+        previous page are completed, see self._check_thumbnails_queue()."""
 
     def _dupgroups_page_forward(self) -> None:
-        # 1. Destroy previous-previous-page dupgroups
-        pppage = self.shown_pages[0] - 1
-        pppage_giids = self.sql3db.get_group_ids_of_page(pppage)
-        if pppage_giids:
-            self._destroy_dupgroups_for_giids(pppage_giids)
+        # 1. Release the dupgroups of the previous-previous page, i.e. those
+        #    that are not shown by self.tree.
+        self._release_dupgroups_not_shown()
 
-        # 2. Create dupgroups of next page
+        # 2. Create dupgroups of next page and prefetch the thumbnails of
+        #    the pages after it.
         npage_giids = self.shown_giids[2]
         self._create_dupgroups_for_giids_with_thread_queue(npage_giids)
-        # Note: 1. Commands defined hereafter will start immediately after the
-        #          thread has started and can complete before the thread_queue
-        #          has completed.
-        # self._create_dupgroups_for_giids_serially(npage_giids)
+        self._prefetch_thumbnails(1)
 
     def _dupgroups_page_backward(self) -> None:
-        # 1. Destroy next-next-page dupgroups
-        nnpage = self.shown_pages[2] + 1
-        nnpage_giids = self.sql3db.get_group_ids_of_page(nnpage)
-        if nnpage_giids:
-            self._destroy_dupgroups_for_giids(nnpage_giids)
+        # 1. Release the dupgroups of the next-next page, i.e. those that are
+        #    not shown by self.tree.
+        self._release_dupgroups_not_shown()
 
-        # 2. Create dupgroups of previous page
+        # 2. Create dupgroups of previous page and prefetch the thumbnails
+        #    of the pages before it.
         ppage_giids = self.shown_giids[0]
         self._create_dupgroups_for_giids_with_thread_queue(ppage_giids)
-        # Note: 1. Commands defined hereafter will start immediately after the
-        #          thread has started and can complete before or after the
-        #          thread_queue has completed.
-        # self._create_dupgroups_for_giids_serially(ppage_giids)
+        self._prefetch_thumbnails(-1)
+
+    def _release_dupgroups_not_shown(self) -> None:
+        shown_giids = {giid for giids in self.shown_giids for giid in giids}
+        self._release_dupgroups_for_giids(
+            [i for i in self.dupgroupsframe.dupgroups if i not in shown_giids])
 
-    def _destroy_dupgroups_for_giids(self, giids: list[str]) -> None:
+    def _release_dupgroups_for_giids(self, giids: list[str]) -> None:
+        """Method to hide the DupGroup instances of giids in
+        self._dupgroups_pool and to delete their thumbnails."""
+        self._scheduler.cancel(giids)
+        dgs = self.dupgroupsframe.dupgroups
         for giid in giids:
-            self.dupgroupsframe.dupgroups[giid].destroy()
-            del self.dupgroupsframe.dupgroups[giid]
-        gc.collect()  # Needed.
+            if giid in dgs:
+                dg = dgs.pop(giid)
+                dg.release()
+                self._dupgroups_pool.append(dg)
 
     # def _create_dupgroups_for_giids_serially(self, g_iids: list[str]):
     #     """Method to create DupGroup instances inside of self.dupgroupsframe
@@ -281,57 +230,139 @@ class Gallery(Table):
     def _create_dupgroups_for_giids_with_thread_queue(
             self, g_iids: list[str]) -> None:
         """Method to create DupGroup instances inside of self.dupgroupsframe
-        for a list of group item ids."""
+        for a list of group item ids. Their files, byte sizes and ranks are
+        read in the "dbthread", i.e. they are created by a callback."""
         self._start0 = perf_counter()
+        db = self.sql3db
+        nresets = self._nresets
+        # The requests are run in order, i.e. files and g_bytes are done
+        # before the callback of the ranks.
+        files = db.submit("get_files_of_groups", g_iids)
+        g_bytes = db.submit("get_total_bytes_of_groups", g_iids)
+        db.submit("get_ranks_of_groups", g_iids,
+                  callback=lambda g_ranks: nresets == self._nresets and
+                  self._create_dupgroups(g_iids, files.result(),
+                                         g_bytes.result(), g_ranks))
+
+    def _create_dupgroups(self, g_iids: list[str], files: dict,
+                          g_bytes: dict, g_ranks: dict) -> None:
+        """Callback of self._create_dupgroups_for_giids_with_thread_queue()
+        to create the DupGroup instances of g_iids with their files, i.e. a
+        dict of {giid: (fiids, fpaths)}, byte sizes and ranks."""
         dgf = self.dupgroupsframe
         dgs = self.dupgroupsframe.dupgroups
-        db = self.sql3db
+        selection = self.sql3db.selection
 
-        # 1. Create the DupGroup widget for each giid
-        f_iids = [db.get_item_ids_of_group(giid) for giid in g_iids]
-        f_paths = [db.get_full_paths_of_group(giid) for giid in g_iids]
-        f_selected = [db.get_selected_of_group(giid) for giid in g_iids]
+        # 1. Rebind a pooled DupGroup widget, else create one, for each giid
+        f_iids = [files[giid][0] for giid in g_iids]
+        f_paths = [files[giid][1] for giid in g_iids]
+        f_selected = [selection.get_selected_of_items(fiids)
+                      for fiids in f_iids]
         for giid, fiids, fpaths, fselected in zip(g_iids, f_iids, f_paths,
                                                   f_selected):
-            dgs[giid] = DupGroup(dgf, giid, fiids, fpaths, fselected,
-                                 # with_image=True,
-                                 with_image=False,
-                                 )
-            row = int(giid[1:])
-            dgs[giid].grid(row=row, column=0, sticky='nsew')
-
-        # 2. Concurrently convert each picture duplicate to a thumbnail and
-        #    include into the respective Checkbutton in the DupGroup widgets.
-        self._tthread = threading.Thread(
-            target=get_thumbnails_concurrently_with_queue,
-            args=(g_iids, f_iids, f_paths, self._thumbnails_queue),
-            kwargs={"ncpu": os.cpu_count(),
-                    "cfe": self._cfe,
-                    "exit_event": self._exitevent},
-            name="thumbnailthread")
-        self._tthread.start()
-        self._check_thumbnails_queue()
+            if self._dupgroups_pool:
+                dgs[giid] = self._dupgroups_pool.pop()
+                dgs[giid].rebind(giid, fiids, fpaths, fselected,
+                                 total_bytes=g_bytes.get(giid))
+            else:
+                dgs[giid] = DupGroup(dgf, giid, fiids, fpaths, fselected,
+                                     # with_image=True,
+                                     with_image=False,
+                                     total_bytes=g_bytes.get(giid),
+                                     )
+            dgs[giid].grid(row=g_ranks[giid], column=0, sticky='nsew')
+
+        # 2. Include the thumbnails in self.thumbnails into the respective
+        #    Checkbutton in the DupGroup widgets. Schedule the conversion of
+        #    the missing ones, i.e. the visible groups first. "completed" is
+        #    put in self._thumbnails_queue once they are all done.
+        visible = self._get_visible_group_iids_set()
+        self._awaiting_completed = True
+        with self._scheduler.batch():
+            for giid, fiids, fpaths in zip(g_iids, f_iids, f_paths):
+                priority = VISIBLE if giid in visible else ADJACENT
+                for fiid, fpath in zip(fiids, fpaths):
+                    ppm = self.thumbnails.get(fpath)
+                    if ppm is None:
+                        self._scheduler.submit(giid, fiid, fpath, priority)
+                    else:
+                        self._set_dupgroup_thumbnail(giid, fiid, ppm)
+        self._start_checking_thumbnails_queue()
+
+    def _get_visible_group_iids_set(self) -> set[str]:
+        vgiids, vfiids = self.get_visible_items()
+        return set(vgiids).union(i[:i.index("_")] for i in vfiids)
+
+    def _prefetch_thumbnails(self, direction: int) -> None:
+        """Method to schedule the conversion of the pictures of the next page,
+        or of the next two pages when the previous page turn in the same
+        direction was less than PREFETCH_FAST secs ago, to thumbnails in
+        self.thumbnails as PREFETCH jobs. A previous prefetch is cancelled.
+
+        direction - 1 for forward and -1 for backward paging
+        """
+        # 1. Get the direction and speed of paging
+        now = perf_counter()
+        npages = 1
+        if self._last_page_turn:
+            last_direction, last_time = self._last_page_turn
+            if last_direction == direction and now - last_time < PREFETCH_FAST:
+                npages = 2
+        self._last_page_turn = (direction, now)
+
+        # 2. Cancel the previous prefetch and read the files of the upcoming
+        #    pages in the "dbthread". Their pictures without thumbnails are
+        #    scheduled by its callbacks, unless a newer prefetch was started.
+        self._scheduler.cancel(priority=PREFETCH)
+        token = self._prefetch_token = object()
+        edge = self.shown_pages[2] if direction > 0 else self.shown_pages[0]
+        for n in range(1, npages + 1):
+            self.sql3db.submit(
+                "get_files_of_page", edge + n * direction,
+                callback=lambda rows: token is self._prefetch_token and
+                self._prefetch_files(rows))
+
+    def _prefetch_files(self, rows: list) -> None:
+        """Method to schedule the pictures of rows of (giid, fiid, fpath)
+        without thumbnails as PREFETCH jobs."""
+        for giid, fiid, fpath in rows:
+            if fpath not in self.thumbnails:
+                self._scheduler.submit(giid, fiid, fpath, PREFETCH)
+        self._start_checking_thumbnails_queue()
+
+    def _set_dupgroup_thumbnail(self, giid: str, fiid: str, ppm: bytes) \
+            -> None:
+        self.dupgroupsframe.dupgroups[giid].set_thumbnail(fiid, ppm)
+
+    def _start_checking_thumbnails_queue(self) -> None:
+        if self._after_id_thumbnails_queue is None:
+            self._check_thumbnails_queue()
 
     def _check_thumbnails_queue(self) -> None:
         duration = 1  # millisecond
+        self._after_id_thumbnails_queue = None
+        scheduled = len(self._scheduler)  # before the queue is checked
         try:
             info = self._thumbnails_queue.get(block=False)
         except queue.Empty:
-            # let's try again later
-            self.after(duration,
-                       lambda: self._check_thumbnails_queue())
+            # let's try again later while thumbnails are scheduled or until
+            # the "completed" of the last batch is got
+            if scheduled or self._awaiting_completed:
+                self._after_id_thumbnails_queue = self.after(
+                    duration, self._check_thumbnails_queue)
         else:
+            self._after_id_thumbnails_queue = self.after(
+                duration, self._check_thumbnails_queue)
             # Extract info from queue
             match info[0]:
                 case "thumbnail":
-                    giid, fiid, img = info[1]
-                    dgs = self.dupgroupsframe.dupgroups
-                    dgs[giid].imf_thumbnails[fiid] = ImageTk.PhotoImage(img)
-                    dgs[giid].imf_checkbuttons[fiid]["image"] = \
-                        dgs[giid].imf_thumbnails[fiid]
-                    self.show_1st_visible_treeview_groupitem_in_viewport()
-                    self.after(duration, lambda: self._check_thumbnails_queue())
+                    giid, fiid, fpath, ppm = info[1]
+                    self.thumbnails.put(fpath, ppm)
+                    if giid in self.dupgroupsframe.dupgroups:
+                        self._set_dupgroup_thumbnail(giid, fiid, ppm)
+                        self.show_1st_visible_treeview_groupitem_in_viewport()
                 case "completed":
+                    self._awaiting_completed = False
                     end0 = perf_counter()
                     loadtime = end0 - self._start0
                     tl, tl_units = timings(loadtime)
@@ -346,57 +377,45 @@ class Gallery(Table):
 
     def show_1st_visible_treeview_groupitem_in_viewport(self) -> None:
         """Method to ensure the Viewport 1st visible DupGroup instance
-        correspond to the 1st visible group item in the Treeview.
+        correspond to the 1st visible group item in the Treeview. Nothing is
+        done when no item is visible or when its DupGroup instance is not
+        created yet, e.g. its files are still read in the "dbthread".
         """
         dgs = self.dupgroupsframe.dupgroups
-        vgiids = self.get_visible_group_iids()
-        # self.update_idletasks()
+        vgiids, vfiids = self.get_visible_items()
+        self._scheduler.prioritize(
+            set(vgiids).union(i[:i.index("_")] for i in vfiids), VISIBLE)
         if vgiids:
-            first_tn_y = dgs[vgiids[0]].winfo_y()
-        else:
-            vfiids = self.get_visible_file_iids()
+            giid = vgiids[0]
+        elif vfiids:
             fiid0 = vfiids[0]
             giid = fiid0[0:fiid0.index("_")]
-            first_tn_y = dgs[giid].winfo_y()
+        else:
+            return
+        if giid not in dgs:
+            return
+        first_tn_y = dgs[giid].winfo_y()
         tnf_height = self.viewport.interior.winfo_reqheight()
-        self.viewport.canvas.yview_moveto(first_tn_y / tnf_height)
+        if tnf_height:
+            self.viewport.canvas.yview_moveto(first_tn_y / tnf_height)
 
     def _update_dupgroups_checkvalues(self) -> None:
         """Event handler to update the checkbox of every Checkbutton of every
          DupGroup instances."""
-        db = self.sql3db
+        selection = self.sql3db.selection
         dgs = self.dupgroupsframe.dupgroups
-        # 1. Get selected and unselected fiids from sql
-        sel_fiids = list(db.get_selected().keys())
-        unsel_fiids = list(db.get_selected(value=False).keys())
-
-        # 2. Get their corresponding unique giids
-        unique_sel_giids = set([i[:i.index("_")] for i in sel_fiids])
-        unique_unsel_giids = set([i[:i.index("_")] for i in unsel_fiids])
-
-        # 3. Identify those giids that are shown in the treeview
-        shown_giids = [giid for giids in self.shown_giids for giid in
-                       giids]
-        shown_giids_sel = unique_sel_giids.intersection(set(shown_giids))
-        shown_giids_unsel = \
-            unique_unsel_giids.intersection(set(shown_giids))
-
-        # 4. Extract those fiids that were ever populated in the treeview
-        shown_fiids_sel = [i for i in sel_fiids if i[:i.index("_")] in
-                           shown_giids_sel]
-        shown_fiids_unsel = [i for i in unsel_fiids if i[:i.index("_")] in
-                             shown_giids_unsel]
-
-        # 5. Update the checkvalues of each CheckButton (cb) in all Dupgroup
-        #    instances (regardless of whether they are visible or hidden).
-        # Selected fiids
-        for fiid in shown_fiids_sel:
-            giid = fiid[:fiid.index("_")]
-            dgs[giid].imf_checkvalues[fiid].set(True)
-        # Unselected fiids
-        for fiid in shown_fiids_unsel:
-            giid = fiid[:fiid.index("_")]
-            dgs[giid].imf_checkvalues[fiid].set(False)
+        # 1. Identify those giids that are shown in the treeview
+        shown_giids = {giid for giids in self.shown_giids for giid in giids}
+
+        # 2. Update the checkvalues of each CheckButton (cb) in their
+        #    Dupgroup instances (regardless of whether they are visible or
+        #    hidden) from the selection bitmap.
+        for giid in shown_giids.intersection(dgs):
+            checkvalues = dgs[giid].imf_checkvalues
+            fiids = [i for i in checkvalues if i in selection]
+            for fiid, value in zip(fiids,
+                                   selection.get_selected_of_items(fiids)):
+                checkvalues[fiid].set(value)
 
     def create_tree_bindings_part_2(self) -> None:
         tree = self.tree
@@ -438,7 +457,7 @@ class Gallery(Table):
         """Event handler to ensure the Viewport 1st visible DupGroup instance
          correspond to the group of the clicked file item in the Treeview."""
         fiid = self.clicked_f_items[0]
-        giid = self.sql3db.get_group_id_of_item(fiid)
+        giid = fiid[:fiid.index("_")]  # e.g. "G1_F0" of group "G1"
         try:
             dg_y = self.dupgroupsframe.dupgroups[giid].winfo_y()
         except KeyError:
@@ -464,6 +483,7 @@ class Gallery(Table):
         def do_task():
             giids = [giid for giids in self.shown_giids for giid in giids]
             self._create_dupgroups_for_giids_with_thread_queue(giids)
+            self._prefetch_thumbnails(1)
             # self._create_dupgroups_for_giids_serially(giids)
 
         self.after(200,  do_task)
@@ -522,16 +542,17 @@ class Gallery(Table):
         # 1. Get fiid of clicked Checkbutton
         fiid = event.widget.toggled_checkbutton.cget('text')
 
-        # 2. Toggle the fiid's selected value in the sql_database
-        db.toggle_selected_of_item(fiid)
+        # 2. Toggle the fiid's selected value in the selection bitmap of the
+        #    sql_database
+        db.selection.toggle([fiid])
 
         # 3. Update the fiid's appearance/tags in the Treeview
         self.update_tree_file_item_tags(fiid)
 
         # 4. Ensure all file items similar to fiid and their group item are
         #    visible in the Treeview.
-        giid = db.get_group_id_of_item(fiid)
-        fiids = db.get_item_ids_of_group(giid)
+        giid = fiid[:fiid.index("_")]  # e.g. "G1_F0" of group "G1"
+        fiids = tree.get_children(giid)
         for iid in fiids[-1::-1]:
             tree.see(iid)
         tree.see(giid)
@@ -2,15 +2,21 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 import tkinter.messagebox as messagebox
+from tkinter import filedialog
 import platform
 from time import perf_counter
 from pathlib import Path
+from itertools import groupby, chain
+from collections import OrderedDict
+from operator import itemgetter
+import concurrent.futures as cf
 
 # Project modules
 from adp.functions import timings
 from adp.widgets.constants import DFONT, BFONT, CWD, C0_light, D2_C1, D2_C2, BG
 from adp.widgets.w_scrframe import AutoScrollbar
-from adp.widgets.w_tools import string_pixel_size
+from adp.widgets.w_filterbar import FilterBar
+from adp.widgets.w_tools import FontMeasurer
 
 __all__ = ["Table"]
 __version__ = '0.1.1'
@@ -21,12 +27,57 @@ __email__ = "julianchiayh@gmail.com"
 
 dfont = list(DFONT.values())
 bfont = list(BFONT.values())
+VIRTUAL_MARGIN = 50  # rows that are materialized above and below the viewport
+DETACHED_ITEMS_BUDGET = 5000  # max. items in the detached pages of the tree
+POPULATE_SLICE = 0.008  # seconds of item insertion between event loop visits
+
+
+def prepare_page_items(rows: list, char_widths: dict, default_width: int) \
+        -> tuple:
+    """Function to prepare the group and file items of the rows of a page of
+    a DuplicatesDB for a Table. It does not use tkinter, so it can be called
+    in any thread. Returns (groups, longest):
+        groups - [(g_iid, g_values, files), ...] where files is
+                 [(f_iid, dtype, f_text, (fullpath, size, created on)), ...]
+        longest - the texts of the displayed columns, i.e. #0, iid, created
+                  on and size, with the largest width that is estimated from
+                  `char_widths`, i.e. {character: pixel width}. Unknown
+                  characters are `default_width` pixels wide.
+
+    Each row of data in db contains the following columns:
+    sn, item_id, group_id, hashhex, full_path, child_path, create_on,
+    file_size, selected
+    """
+    def estimate(text):
+        return sum([char_widths.get(c, default_width) for c in text])
+
+    groups = []
+    longest = ["", "", "", ""]
+    widths = [-1, -1, -1, -1]
+    for g_iid, group in groupby(rows, key=itemgetter(2)):
+        files = []
+        for mm, row in enumerate(group):
+            if mm == 0:
+                g_values = (row[3],)  # hashhex
+            f_iid, f_fullpath, f_childpath, f_ctime, f_size = \
+                row[1], *row[4:8]
+            dtype = "Original" if mm == 0 else "Copy"
+            files.append((f_iid, dtype, f_childpath,
+                          (f_fullpath, f_size, f_ctime)))
+            for nn, text in enumerate((f_childpath, f_iid, f_ctime, f_size)):
+                width = estimate(text)
+                if width > widths[nn]:
+                    widths[nn] = width
+                    longest[nn] = text
+        groups.append((g_iid, g_values, files))
+    return groups, longest
 
 
 class Table(ttk.PanedWindow):
     """ This widget consist of a ttk.Treeview with both a vertical and a
-    horizontal AutoScrollbar widgets and five ttk.Button widgets below them
-    of which two of them are for debugging purposes.
+    horizontal AutoScrollbar widgets, five ttk.Button widgets below them
+    of which two of them are for debugging purposes, an 'Auto-select'
+    ttk.Menubutton widget and a FilterBar widget.
 
     The treeview displays the sub-filepath, size and creation date of duplicated
     raster images, while the selection status is hidden (it is exposed
@@ -34,8 +85,13 @@ class Table(ttk.PanedWindow):
     treeview can be toggled via mouse pointer clicking. Alternatively, the
     selection or de-selection of either the original or copied versions of
     any of the duplicated raster images can be toggled via clicking on the
-    respective ttk.Buttons widgets. Finally, the deletion of the selected
-    raster image(s) occurs when the clicked 'Delete' button is released.
+    respective ttk.Buttons widgets, or the files to delete can be selected
+    with the rules of the 'Auto-select' menu. Finally, the deletion of the
+    selected raster image(s) occurs when the clicked 'Delete' button is
+    released.
+    The FilterBar restricts the paging of the treeview to the duplicate
+    groups that match its criteria and orders them by its sort key, e.g. by
+    the bytes that deleting their copies would reclaim.
 
     IMPORTANT:
     1. This widget is designed to be used with the Find widget.
@@ -52,12 +108,29 @@ class Table(ttk.PanedWindow):
        find.sqlite3_db after the find widget generates the
        "<<Sqlite3DBPopulated>>" virtual event or when the clicked `Populate`
        ttk.Button widget is released.
-    4. In Tk 8.6 and below, once a tag is created in a Treeview, it cannot
+    4. When the Table widget is instantiated with `virtual=True`, self.tree
+       only has the group and file items of the rows within its viewport
+       plus a margin of VIRTUAL_MARGIN rows, instead of pages of groups. Its
+       vertical scrollbar maps to all the rows of find.sqlite3_db and the
+       items are recreated from it whenever the viewport scrolls beyond the
+       margin. The Gallery widget does not support this mode.
+    5. In Tk 8.6 and below, once a tag is created in a Treeview, it cannot
        be deleted. It remains throughout the lifetime of the Treeview. This
        is a memory leak bug and it will only be fixed in Tk 8.7 (see
        https://stackoverflow.com/questions/76689557/deleting-all-items-of-a-ttk-treeview-does-not-delete-or-unconfigure-their-tagnam).
        To avoid this memory leak bug when resetting the Treeview widget,
        the only option is to destroy and recreate the Treeview widget.
+       Hence, items are styled by a few shared tags and not by per-item
+       tags.
+    6. Pages that are scrolled out of self.tree are detached and kept in a
+       least-recently-used cache for reattachment. When their items exceed
+       self.detached_items_budget, the least recently detached pages are
+       deleted. They are recreated from find.sqlite3_db when they are
+       shown again.
+    7. The pages next to an inserted page are read in the "dbthread" and
+       their items are prepared by prepare_page_items() on a "prefetch"
+       thread ahead of time. So, crossing a page boundary only inserts
+       prepared items into self.tree.
 
     Generated Virtual Events:
 
@@ -102,10 +175,23 @@ class Table(ttk.PanedWindow):
             else:
                 raise TypeError(f"debug={debug} is invalid. It must either be "
                                 f"True or False.")
+        try:
+            virtual = options.pop("virtual")
+        except KeyError:
+            self.virtual = False
+        else:
+            if isinstance(virtual, bool):
+                self.virtual = virtual
+            else:
+                raise TypeError(f"virtual={virtual} is invalid. It must either "
+                                f"be True or False.")
         super().__init__(master, **options)
         self.master = master
         self.sql3db = None
         self.sdir = None
+        self.detached_items_budget = DETACHED_ITEMS_BUDGET
+        self._prefetcher = cf.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="prefetch")
         self._initialise_paging_and_selection_attributes()
         self.table = None  # widget
         self.tree = None  # widget
@@ -114,9 +200,11 @@ class Table(ttk.PanedWindow):
         self.framebns = None  # widget
         self.bn_originals = None  # widget
         self.bn_copies = None  # widget
+        self.bn_auto = None  # widget
         self.bn_delete = None  # widget
         self.bn_populate_tree = None  # widget
         self.bn_reset = None  # widget
+        self.filterbar = None  # widget
 
         i1 = str(CWD) + "/icons/copy.png"
         i2 = str(CWD) + "/icons/delete.png"
@@ -131,12 +219,25 @@ class Table(ttk.PanedWindow):
     def _initialise_paging_and_selection_attributes(self):
         self.populated = False  # Bool indicates if self.tree is populated
         self.populated_giids = set()
+        # {page: (giids, nitems, {"Original": fiids, "Copy": fiids}), ...}
+        self.detached_pages = OrderedDict()
         self.shown_pages = [-1, -1, -1]  # (previous, current, next)
         self.shown_giids = [[], [], []]  # (previous, current, next)
+        self.all_pages = []  # page numbers of sql3db
         self.up_after_id = None
         self.down_after_id = None
         self.clicked_f_items = None
         self.is_updating = False
+        self._start_filter = None
+        self.cols_maxwidth = None  # px width of #0, iid, created on & size
+        self._vtotal = 0  # virtual mode: quantity of rows in self.sql3db
+        self._vfirst = 0  # virtual mode: row of the first item in self.tree
+        self._vcount = 0  # virtual mode: quantity of items in self.tree
+        self._vtop = 0  # virtual mode: row at the top of the viewport
+        self._vvisible = 0  # virtual mode: rows last shown in the viewport
+        self._vafter_id = None
+        self._populate_after_id = None  # next slice of the first population
+        self.prepared_pages = {}  # {page: (db generation, Future), ...}
 
     # ---------- Methods ---------
     def set_tree_column0_heading_text(self, text: str):
@@ -159,6 +260,7 @@ class Table(ttk.PanedWindow):
         self.add(self.table)
         self.create_tree_with_scrollbars()
         self.create_buttons()
+        self.create_filterbar()
 
     def create_tree_with_scrollbars(self):
         self.tree = ttk.Treeview(self.table, height=10, selectmode='extended',
@@ -195,6 +297,18 @@ class Table(ttk.PanedWindow):
                                  command=self.tree.xview)
         self.tree.configure(yscrollcommand=self.ysb.set,
                             xscrollcommand=self.xsb.set)
+        if self.virtual:
+            self.ysb.configure(command=self._virtual_yview)
+            self.tree.configure(yscrollcommand=self._virtual_yscroll)
+
+        # Shared tags define the appearance of all items. Tags created first
+        # have higher priority.
+        self.tree.tag_configure("Selected", foreground="red",
+                                image=self.icon_delete)
+        self.tree.tag_configure("Original", foreground=D2_C1)
+        self.tree.tag_configure("Copy", foreground=D2_C2)
+        self.tree.tag_configure("Duplicates Group", foreground=C0_light,
+                                font=bfont)
 
         # Position treeview, scrollbars in self
         self.table.columnconfigure(0, weight=1)
@@ -221,6 +335,22 @@ class Table(ttk.PanedWindow):
                                     command=self._delete_button_invoked,
                                     style="Delete.TButton"
                                     )
+        self.bn_auto = ttk.Menubutton(self.framebns, text="Auto-select")
+        self.bn_auto["menu"] = menu = tk.Menu(self.bn_auto, tearoff=False)
+        for label, keep in (("Keep oldest", ("oldest",)),
+                            ("Keep newest", ("newest",)),
+                            ("Keep largest resolution",
+                             ("resolution", "oldest"))):
+            menu.add_command(label=label,
+                             command=lambda k=keep: self.auto_select(keep=k))
+        menu.add_separator()
+        menu.add_command(label="Keep in folder...",
+                         command=lambda: self._ask_folder_to_auto_select(
+                             "prefer", "Select The Folder Of Files To Keep."))
+        menu.add_command(label="Delete copies in folder...",
+                         command=lambda: self._ask_folder_to_auto_select(
+                             "delete_in",
+                             "Select The Folder Of Copies To Delete."))
         self.disable_buttons()
         self.bn_delete.state(['disabled'])
 
@@ -233,6 +363,7 @@ class Table(ttk.PanedWindow):
         self.bn_originals.grid(row=0, column=0, sticky="nsew", padx=(10, 5),
                                pady=5)
         self.bn_copies.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
+        self.bn_auto.grid(row=0, column=2, sticky="nsew", padx=5, pady=5)
         self.bn_delete.grid(row=0, column=6, sticky="nsew", padx=(5, 10),
                             pady=5)
 
@@ -247,16 +378,24 @@ class Table(ttk.PanedWindow):
             self.bn_reset.grid(row=0, column=4, padx=5, pady=5,)
             self.bn_reset.state(("disabled",))
 
+    def create_filterbar(self):
+        self.filterbar = FilterBar(self.table, style='Framebns.TFrame')
+        self.filterbar.grid(row=3, column=0, columnspan=2, sticky='ew')
+        self.filterbar.bind("<<FilterChanged>>", self._event_apply_filter)
+        self.filterbar.bind("<<SortChanged>>", self._event_apply_sort)
+
     def disable_buttons(self):
         """Method to disable buttons."""
         self.bn_originals.state(['disabled'])
         self.bn_copies.state(['disabled'])
+        self.bn_auto.state(['disabled'])
         # self.bn_delete.state(['disabled'])
 
     def enable_buttons(self):
         """Method to enable buttons"""
         self.bn_originals.state(['!disabled'])
         self.bn_copies.state(['!disabled'])
+        self.bn_auto.state(['!disabled'])
         # self.bn_delete.state(['!disabled'])
 
     def get_tree_displaycolumns_headings_text(self, icon_column=True):
@@ -272,7 +411,7 @@ class Table(ttk.PanedWindow):
         """Event handler to populate self.tree for the first time."""
         # 1. Update self.shown_pages
         # self.shown_pages = [-1, -1, -1]  is default
-        all_pages = self.sql3db.get_all_page_numbers()
+        all_pages = self.all_pages = self.sql3db.get_all_page_numbers()
         if all_pages:
             if len(all_pages) == 1:  # only 1 page
                 self.shown_pages = [-1, 0, -1]
@@ -282,121 +421,356 @@ class Table(ttk.PanedWindow):
 
         # 2. When to populate tree for the first time
         if spage[1] == 0:
-            # 2.1. Populate tree with current page
             t1 = perf_counter()
-            self._populate_tree_page_from_sql3db(spage[1])  # current page
-            self.populated = True
-
-            # 2.2. Populate tree with next page
-            if spage[2] > 0:
-                self._populate_tree_page_from_sql3db(spage[2])  # next page
-            t2 = perf_counter()
-            loadtime = t2 - t1
-            tl, tl_units = timings(loadtime)
-            print(f'Populated Table in {tl:.6f} {tl_units}.')
-
-            # 2.3. Update self.shown_giids
-            for n, page in enumerate(self.shown_pages):
-                if page >= 0:
-                    self.shown_giids[n] = \
-                        self.sql3db.get_group_ids_of_page(page)
-                else:
-                    self.shown_giids[n] = []
-
-            # 2.4. Generate virtual event immediately
-            self.tree.event_generate("<<TreePopulateDone>>")
-
-            # 2.5. Set state of buttons
-            self.enable_buttons()
-            if isinstance(self.bn_populate_tree, ttk.Button):
-                self.bn_populate_tree.state(("disabled",))
-            if isinstance(self.bn_reset, ttk.Button):
-                self.bn_reset.state(("!disabled",))
-            self.tree.update_idletasks()
-
-    def _populate_tree_page_from_sql3db(self, page: int):
-        """Method to populate treeview with info from sql3db. Arguments
-        'start' and 'end' are the first and last indexes of the duplicate
-        groups that are to be considered while keyword argument `step` is their
-        increment."""
+            if self.virtual:
+                # 2.1. Populate tree with the rows at the top of sql3db
+                self._vtotal = self.sql3db.get_quantity_of_rows()
+                self._show_virtual_rows(0)
+                self._tree_populated_the_first_time(t1)
+            else:
+                # 2.1. Populate tree with current page and then with next
+                #      page in slices. Steps 2.3 to 2.5 are done after the
+                #      last slice.
+                pages = [spage[1]] + ([spage[2]] if spage[2] > 0 else [])
+                self._populate_tree_pages_in_slices(pages, t1)
+
+    def _populate_tree_pages_in_slices(self, pages: list, t1: float):
+        """Method to populate treeview with the duplicate groups of `pages`
+        of sql3db in slices of about POPULATE_SLICE seconds. The first slice
+        is inserted and drawn immediately and each following slice is
+        inserted when tkinter's main event loop is idle, i.e. after it has
+        handled the pending events and redrawn the window. So, the first
+        visible rows appear at once and a page of huge groups does not
+        freeze the window."""
         tree = self.tree
-        db = self.sql3db
-        # 1. Initialise width of every displayed column of the tree
-        headings = tuple(self.get_tree_displaycolumns_headings_text())
-        wpad = 20
-        cols_maxwidth = [string_pixel_size(i, **BFONT)[0] + wpad for i in
-                         headings]
+
+        def insert_pages():
+            for page in pages:
+                groups, longest = self._get_prepared_page(page)
+                self._widen_columns(tuple([i] for i in longest))
+                g_iids = []
+                yield from self._insert_prepared_items(groups, "end", g_iids)
+                self._page_items_inserted(page, "end", g_iids)
+
+        items = insert_pages()
+
+        def insert_slice():
+            self._populate_after_id = None
+            end = perf_counter() + POPULATE_SLICE
+            for _ in items:
+                if perf_counter() > end:
+                    break
+            else:
+                self._tree_populated_the_first_time(t1)
+                return
+            self._populate_after_id = self.after_idle(insert_slice)
+
+        insert_slice()
+        tree.update_idletasks()
+
+    def _tree_populated_the_first_time(self, t1: float):
+        """Method to complete the first population of self.tree that began
+        at perf_counter() `t1`."""
+        self.populated = True
+        t2 = perf_counter()
+        loadtime = t2 - t1
+        tl, tl_units = timings(loadtime)
+        print(f'Populated Table in {tl:.6f} {tl_units}.')
+
+        # 2.3. Update self.shown_giids
+        for n, page in enumerate(self.shown_pages):
+            if page >= 0 and not self.virtual:
+                self.shown_giids[n] = \
+                    self.sql3db.get_group_ids_of_page(page)
+            else:
+                self.shown_giids[n] = []
+
+        # 2.4. Generate virtual event immediately
+        self.tree.event_generate("<<TreePopulateDone>>")
+
+        # 2.5. Set state of buttons
+        self.enable_buttons()
+        if isinstance(self.bn_populate_tree, ttk.Button):
+            self.bn_populate_tree.state(("disabled",))
+        if isinstance(self.bn_reset, ttk.Button):
+            self.bn_reset.state(("!disabled",))
+        self.tree.update_idletasks()
+
+    def _populate_tree_page_from_sql3db(self, page: int, index="end"):
+        """Method to populate treeview with the duplicate groups of a page
+        of sql3db. Their group items are inserted from `index` of the
+        toplevel items, i.e. at the end by default. A page that was prepared
+        ahead of time by self._prefetch_page() is only inserted."""
+        # 1. Get the prepared items of the page and widen the displayed
+        #    columns to fit their longest text.
+        groups, longest = self._get_prepared_page(page)
+        self._widen_columns(tuple([i] for i in longest))
 
         # 2. Create every group and file items of the tree
-        """Each row of data in db contains the following columns: 
-        sn, item_id, group_id, hashhex, full_path, child_path, create_on,
-        file_size, selected
-        """
-        g_iids = db.get_group_ids_of_page(page)
-        for g_iid in g_iids:
+        g_iids = []
+        for _ in self._insert_prepared_items(groups, index, g_iids):
+            pass
+
+        # 3. to 4.
+        self._page_items_inserted(page, index, g_iids)
+
+    def _insert_prepared_items(self, groups: list, index, g_iids: list):
+        """Generator to insert the group and file items of a page that was
+        prepared by prepare_page_items() into self.tree from `index` of its
+        toplevel items. The group item ids are appended to `g_iids`. Their
+        selection is read from the selection bitmap of sql3db. It yields
+        after every file item, i.e. its caller can pause the insertion."""
+        tree = self.tree
+        selection = self.sql3db.selection
+        for g_iid, g_values, files in groups:
             # Insert Group Nodes
-            group = db.get_group_items(g_iid)
-            g_hashhex = group[0][3]
-            g_values = (g_hashhex,)
-            # tree.tag_configure(g_iid, foreground=D2_C1, font=bfont)
-            tree.tag_configure(g_iid, foreground=C0_light, font=bfont)
-            tree.insert("", "end", iid=g_iid, image=self.icon_duplicates,
-                        open=True, tags=[g_iid, 'Duplicates Group'],
+            g_iids.append(g_iid)
+            tree.insert("", index, iid=g_iid, image=self.icon_duplicates,
+                        open=True, tags=['Duplicates Group'],
                         text=f"Duplicates Group {g_iid[1:]}", values=g_values)
+            if index != "end":
+                index += 1
 
-            for mm, row in enumerate(group):
+            for f_iid, dtype, f_text, (f_fullpath, f_size, f_ctime) in files:
                 # Insert File Nodes (children of each Group Node)
-                f_iid = row[1]
-                f_fullpath = row[4]
-                f_childpath = row[5]
-                f_text = f_childpath
-                f_ctime = row[6]
-                f_size = row[7]
-                if row[8]:
-                    f_selected = True
-                    tree.tag_configure(f_iid, foreground="red",
-                                       image=self.icon_delete)
-                    if mm == 0:
-                        f_tags = [f_iid, 'File', "Original", "Selected"]
-                    else:
-                        f_tags = [f_iid, 'File', "Copy", "Selected"]
-                else:
-                    f_selected = False
-                    if mm == 0:
-                        f_tags = [f_iid, 'File', "Original", "Not Selected"]
-                        self.tree.tag_configure(f_iid, foreground=D2_C1,
-                                                image="")
-                    else:
-                        f_tags = [f_iid, 'File', "Copy", "Not Selected"]
-                        self.tree.tag_configure(f_iid, foreground=D2_C2,
-                                                image="")
+                f_selected = selection.is_selected(f_iid)
+                f_tags = ['File', dtype,
+                          "Selected" if f_selected else "Not Selected"]
                 f_values = (f_fullpath, f_size, f_ctime, f_selected, f_iid)
                 # "fullpath", "size", "created on", "selected", "iid"
                 tree.insert(g_iid, "end", iid=f_iid, tags=f_tags, text=f_text,
                             values=f_values)
+                yield
 
-                # Update columns max width variables
-                row_values = [f_childpath, f_iid, f_ctime, f_size]
-                row_maxwidths = [string_pixel_size(i, **DFONT)[0] + wpad
-                                 for i in row_values]
-                leftpad = 60  # pixels
-                row_maxwidths[0] += leftpad
-                for nn, (rmw, cmw) in enumerate(
-                        zip(row_maxwidths, cols_maxwidth)):
-                    if rmw > cmw:
-                        cols_maxwidth[nn] = rmw
-
-        # 3. Reconfigure the width of column #0 to fit all text
-        tree.column('#0', width=cols_maxwidth[0])
-        tree.column('iid', width=cols_maxwidth[1])
-        tree.column('created on', width=cols_maxwidth[2])
-        tree.column('size', width=cols_maxwidth[3])
-
-        # 4. Update self.populated_giids
+    def _page_items_inserted(self, page: int, index, g_iids: list):
+        """Method to complete the insertion of the group items `g_iids` of a
+        page of sql3db from `index` of the toplevel items of self.tree."""
+        # 3. Update self.populated_giids
         self.populated_giids.update(g_iids)
 
+        # 4. Prepare the pages ahead of and behind the page in the scroll
+        #    direction ahead of time, unless they are in self.tree.
+        neighbours = (page + 1, page - 1) if index == "end" else \
+            (page - 1, page + 1)
+        for npage in neighbours:
+            if npage >= 0 and npage not in self.shown_pages and \
+                    npage not in self.detached_pages:
+                self._prefetch_page(npage)
+
+    def _prefetch_page(self, page: int):
+        """Method to read the rows of a page of sql3db in the "dbthread" and
+        to prepare its items on the "prefetch" thread, i.e. without blocking
+        tkinter's main event loop."""
+        db = self.sql3db
+        if page in self.prepared_pages:
+            return
+        rows = db.submit("get_items_of_page", page)
+        fm = FontMeasurer.get(self, **DFONT)
+        char_widths = fm.char_widths()  # a copy for the "prefetch" thread
+        default_width = fm.measure("0")
+        self.prepared_pages[page] = (db.generation, self._prefetcher.submit(
+            lambda: prepare_page_items(rows.result(), char_widths,
+                                       default_width)))
+
+    def _get_prepared_page(self, page: int) -> tuple:
+        """Method returns the (groups, longest) items of a page that were
+        prepared by self._prefetch_page(). They are prepared now when they
+        were not prefetched or when sql3db was changed since."""
+        db = self.sql3db
+        try:
+            generation, future = self.prepared_pages.pop(page)
+        except KeyError:
+            pass
+        else:
+            if generation == db.generation:
+                return future.result()
+        fm = FontMeasurer.get(self, **DFONT)
+        return prepare_page_items(db.get_items_of_page(page),
+                                  fm.char_widths(), fm.measure("0"))
+
+    def _detach_page(self, page: int, giids: list):
+        """Method to detach the group items of a page from self.tree and to
+        cache them and their file items by dtype as the most recently
+        detached page. Thereafter, the least recently detached pages are
+        deleted until the items of the cached pages are within
+        self.detached_items_budget."""
+        tree = self.tree
+        tree.detach(*giids)
+        dtypes = {"Original": [], "Copy": []}
+        for giid in giids:
+            # The first file item of a group is its Original
+            fiids = tree.get_children(giid)
+            dtypes["Original"].extend(fiids[:1])
+            dtypes["Copy"].extend(fiids[1:])
+        nitems = len(giids) + sum(len(i) for i in dtypes.values())
+        self.detached_pages[page] = (giids, nitems, dtypes)
+        self.detached_pages.move_to_end(page)
+        total = sum(n for _, n, _ in self.detached_pages.values())
+        while total > self.detached_items_budget and \
+                len(self.detached_pages) > 1:
+            _, (old_giids, old_nitems, _) = self.detached_pages.popitem(
+                last=False)
+            tree.delete(*old_giids)
+            self.populated_giids.difference_update(old_giids)
+            total -= old_nitems
+
+    def _reattach_page(self, page: int, index) -> bool:
+        """Method to reattach the group items of a cached detached page at
+        `index` of the toplevel items of self.tree. Returns False when the
+        page is not cached, i.e. it has to be (re)created from sql3db."""
+        try:
+            giids, _, _ = self.detached_pages.pop(page)
+        except KeyError:
+            return False
+        if index == "end":
+            for iid in giids:
+                self.tree.move(iid, "", "end")  # reattach
+        else:
+            for iid in giids[-1:None:-1]:  # in reverse order
+                self.tree.move(iid, "", index)  # reattach
+        return True
+
+    def _widen_columns(self, cols_texts: tuple):
+        """Method to widen the displayed columns of self.tree, i.e. #0, iid,
+        created on and size, to fit their longest text. Only the text with the
+        largest estimated width of each column is measured. The widths are
+        initialised with the width of their heading text and they only
+        grow."""
+        dfm = FontMeasurer.get(self, **DFONT)
+        wpad = 20
+        leftpad = 60  # pixels
+        if self.cols_maxwidth is None:
+            bfm = FontMeasurer.get(self, **BFONT)
+            headings = tuple(self.get_tree_displaycolumns_headings_text())
+            self.cols_maxwidth = [bfm.measure(i) + wpad for i in headings]
+        for nn, (column, texts) in enumerate(zip(
+                ('#0', 'iid', 'created on', 'size'), cols_texts)):
+            if not texts:
+                continue
+            width = dfm.measure(dfm.longest(texts)) + wpad
+            if nn == 0:
+                width += leftpad
+            if width > self.cols_maxwidth[nn]:
+                self.cols_maxwidth[nn] = width
+                self.tree.column(column, width=width)
+
+    def _get_rowheight(self) -> int:
+        """Method returns the pixel height of a row of a ttk.Treeview."""
+        rowheight = ttk.Style(self).lookup("Treeview", "rowheight")
+        if rowheight:
+            return int(rowheight)
+        return FontMeasurer.get(self, **DFONT).linespace
+
+    # ---------- Virtual mode ---------
+    def _get_virtual_visible_rows(self) -> int:
+        """Method returns the quantity of rows that fit in the viewport of
+        self.tree."""
+        rowheight = self._get_rowheight()
+        return max(1, self.tree.winfo_height() // rowheight, self._vvisible)
+
+    def _show_virtual_rows(self, top: int, force: bool = False):
+        """Method to show the rows from row `top` of self.sql3db in the
+        viewport of self.tree. Its items are only recreated when these rows
+        are not all in self.tree or when `force` is True."""
+        visible = self._get_virtual_visible_rows()
+        top = max(0, min(top, self._vtotal - visible))
+        if force or top < self._vfirst or \
+                top + visible > self._vfirst + self._vcount:
+            self._render_virtual_rows(top - VIRTUAL_MARGIN,
+                                      top + visible + VIRTUAL_MARGIN)
+        self._vtop = top
+        self.tree.yview_moveto(0.0)
+        self.tree.yview_scroll(top - self._vfirst, "units")
+
+    def _render_virtual_rows(self, start: int, stop: int):
+        """Method to recreate the items of self.tree with the groups that
+        have rows from row `start` to before row `stop` of self.sql3db. The
+        selection of the files is read from self.sql3db.selection, i.e. not
+        from their rows, which lag behind it until it is written."""
+        tree = self.tree
+        selection = self.sql3db.selection
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+        rows = self.sql3db.get_items_of_rows(max(0, start), stop)
+        self._vfirst = rows[0][0] if rows else 0
+        self._vcount = 0
+        cols_texts = ([], [], [], [])  # texts of #0, iid, created on & size
+        """Each row contains the first_row of its group followed by the
+        columns of the duplicates table:
+        sn, item_id, group_id, hashhex, full_path, child_path, create_on,
+        file_size, selected, dtype
+        """
+        for _, group in groupby(rows, key=itemgetter(0)):
+            group = list(group)
+            g_iid = group[0][3]
+            tree.insert("", "end", iid=g_iid, image=self.icon_duplicates,
+                        open=True, tags=['Duplicates Group'],
+                        text=f"Duplicates Group {g_iid[1:]}",
+                        values=(group[0][4],))
+            for row in group:
+                (f_iid, f_fullpath, f_childpath, f_ctime, f_size, _,
+                 dtype) = row[2], *row[5:11]
+                f_selected = selection.is_selected(f_iid)
+                f_tags = ['File', dtype,
+                          "Selected" if f_selected else "Not Selected"]
+                f_values = (f_fullpath, f_size, f_ctime, f_selected, f_iid)
+                tree.insert(g_iid, "end", iid=f_iid, tags=f_tags,
+                            text=f_childpath, values=f_values)
+                for texts, text in zip(cols_texts,
+                                       (f_childpath, f_iid, f_ctime, f_size)):
+                    texts.append(text)
+            self._vcount += 1 + len(group)
+        self._widen_columns(cols_texts)
+
+    def _virtual_yview(self, *args):
+        """Command of self.ysb in the virtual mode."""
+        if not self.populated:
+            return
+        visible = self._get_virtual_visible_rows()
+        match args:
+            case (tk.MOVETO, fraction):
+                top = round(float(fraction) * self._vtotal)
+            case (tk.SCROLL, number, tk.PAGES):
+                top = self._vtop + int(number) * visible
+            case (tk.SCROLL, number, _):
+                top = self._vtop + int(number)
+            case _:
+                return
+        self._show_virtual_rows(top)
+
+    def _virtual_yscroll(self, first, last):
+        """yscrollcommand of self.tree in the virtual mode. It maps the
+        viewport of self.tree to all the rows of self.sql3db in self.ysb
+        and recreates the items of self.tree when the viewport is scrolled,
+        e.g. by the mousewheel or keyboard, to within half the margin of
+        the first or last item."""
+        if not self._vcount or not self._vtotal:
+            self.ysb.set(0.0, 1.0)
+            return
+        first, last = float(first), float(last)
+        top = self._vfirst + round(first * self._vcount)
+        bottom = self._vfirst + round(last * self._vcount)
+        self._vtop = top
+        self._vvisible = bottom - top
+        self.ysb.set(top / self._vtotal, bottom / self._vtotal)
+        near_first = top - self._vfirst < VIRTUAL_MARGIN // 2 and \
+            self._vfirst > 0
+        near_last = self._vfirst + self._vcount - bottom < \
+            VIRTUAL_MARGIN // 2 and self._vfirst + self._vcount < self._vtotal
+        if (near_first or near_last) and not self._vafter_id:
+            self._vafter_id = self.after_idle(self._rerender_virtual_rows)
+
+    def _rerender_virtual_rows(self):
+        self._vafter_id = None
+        self._show_virtual_rows(self._vtop, force=True)
+
     def reset_table(self):
         # 1. Reinitialise these attributes
+        if self._vafter_id:
+            self.after_cancel(self._vafter_id)
+        if self._populate_after_id:
+            self.after_cancel(self._populate_after_id)
         self._initialise_paging_and_selection_attributes()
 
         # 2. Destroy and recreate tree and scrollbars
@@ -416,54 +790,111 @@ class Table(ttk.PanedWindow):
         # 4. Recreate events bindings
         self._create_bindings()
 
-    def get_visible_group_iids(self):
-        """Method to get the idd of visible toplevel items in the Treeview"""
+    def refresh_table(self):
+        """Method to repopulate self.tree after the paging of self.sql3db is
+        changed, e.g. by a filter."""
+        self.reset_table()
+        self.set_tree_column0_heading_text(self.sdir.get())
+        self.populate_tree_the_first_time()
+        self.update_bn_delete_state()
+
+    def apply_filter(self):
+        """Method to page self.tree over the duplicate groups that match the
+        criteria of self.filterbar. The groups are filtered in the "dbthread"
+        and self.tree is refreshed after its completion."""
+        if self.sql3db is None or self.is_updating:
+            return
+        try:
+            criteria = self.filterbar.get_criteria()
+        except ValueError as err:
+            messagebox.showerror("Filter", str(err), parent=self)
+            return
+        self.is_updating = True
+        self.disable_buttons()
+        self._start_filter = perf_counter()
+        self.sql3db.submit("set_filter", callback=self._filter_applied,
+                           **criteria)
+
+    def _filter_applied(self, ngroups: int):
+        dtime, dunits = timings(perf_counter() - self._start_filter)
+        print(f'Filtered {ngroups} groups in {dtime:.6f} {dunits}.')
+        self.refresh_table()
+
+    def apply_sort(self):
+        """Method to page self.tree over the duplicate groups in the order of
+        the sort key of self.filterbar. The groups are sorted in the
+        "dbthread" and self.tree is refreshed after its completion."""
+        if self.sql3db is None or self.is_updating:
+            return
+        self.is_updating = True
+        self.disable_buttons()
+        self._start_filter = perf_counter()
+        self.sql3db.submit("sort_groups", self.filterbar.get_sort_key(),
+                           callback=self._sort_applied)
+
+    def _sort_applied(self, result):
+        dtime, dunits = timings(perf_counter() - self._start_filter)
+        print(f'Sorted groups in {dtime:.6f} {dunits}.')
+        self.refresh_table()
+
+    def get_visible_items(self) -> tuple:
+        """Method returns the (group iids, file iids) of the rows that are
+        visible in the viewport of self.tree in their displayed order. A row
+        that is hidden by self.xsb is excluded.
+
+        The row at the top of the viewport is found with tree.identify_row()
+        and the following rows are found one row height apart, i.e. the cost
+        only depends on the height of the viewport and neither the tree nor
+        sql3db is scanned."""
         tree = self.tree
-        self.update_idletasks()
-        # pcn_giids = tree.get_children()
-        pcn_giids = [j for i in self.shown_giids for j in i]
-        visible_pcn_giids = [iid for iid in pcn_giids
-                             if isinstance(tree.bbox(iid), tuple)]
-        if visible_pcn_giids:
-            if self.xsb.winfo_ismapped():
-                xsb_y = self.xsb.winfo_y()
-                _, y, _, h = tree.bbox(visible_pcn_giids[-1])
-                last_giid_btm = y + h
-                if last_giid_btm > xsb_y:
-                    visible_pcn_giids.pop()
-            return visible_pcn_giids
+        rowheight = self._get_rowheight()
+        if self.xsb.winfo_ismapped():
+            bottom = self.xsb.winfo_y()  # rows must end above it
         else:
-            return None
+            bottom = tree.winfo_height() + rowheight  # rows must start in it
+
+        # 1. Find the row at the top of the viewport, i.e. below the headings
+        top = ""
+        for y in range(0, 2 * rowheight + 1, max(1, rowheight // 2)):
+            top = tree.identify_row(y)
+            if top:
+                break
+        if not top:
+            return [], []
+        _, y, _, _ = tree.bbox(top)
+
+        # 2. Walk down the viewport one row at a time
+        giids = []
+        fiids = []
+        last = None
+        y += rowheight // 2  # middle of a row
+        while y - rowheight // 2 + rowheight <= bottom:
+            iid = tree.identify_row(y)
+            if not iid:
+                break
+            if iid != last:
+                (fiids if "F" in iid else giids).append(iid)
+                last = iid
+            y += rowheight
+        return giids, fiids
 
-    def get_visible_file_iids(self):
+    def get_visible_group_iids(self):
         """Method to get the idd of visible toplevel items in the Treeview"""
-        tree = self.tree
-        db = self.sql3db
-        self.update_idletasks()
-        pcn_giids = [j for i in self.shown_giids for j in i]
-        pcn_fiids = []
-        for giid in pcn_giids:
-            pcn_fiids.extend(db.get_item_ids_of_group(giid))
-        visible_pcn_fiids = [iid for iid in pcn_fiids
-                             if isinstance(tree.bbox(iid), tuple)]
-        if visible_pcn_fiids:
-            if self.xsb.winfo_ismapped():
-                xsb_y = self.xsb.winfo_y()
-                _, y, _, h = tree.bbox(visible_pcn_fiids[-1])
-                last_fiid_btm = y + h
-                if last_fiid_btm > xsb_y:
-                    visible_pcn_fiids.pop()
-            return visible_pcn_fiids
-        else:
-            return None
+        giids, _ = self.get_visible_items()
+        return giids if giids else None
+
+    def get_visible_file_iids(self):
+        """Method to get the idd of visible file items in the Treeview"""
+        _, fiids = self.get_visible_items()
+        return fiids if fiids else None
 
     def _bn_toggle_dtype(self, dtype):
         """Method to toggle the selection of items with dtype having the value
         of either 'Original' or 'Copy'.
-        1. Toggle the selected values in the sql-databse.
-        2. Update the appearances of file items in the treeview current page,
-           i.e. attached items are updated.
-        3. Update the appearances of all detached items.
+        1. Toggle the selected values in the selection bitmap.
+        2. Get the file items of the dtype in the treeview, i.e. the attached
+           items and the items of the cached detached pages.
+        3. Update their appearances with the shared tags.
         4. Update state of delete button
         5. Generate virtual event <<TreeFileItemsToggled>>
         """
@@ -474,81 +905,120 @@ class Table(ttk.PanedWindow):
         # Exit method if updating
         if self.is_updating:
             return
+        self.is_updating = True
+        self.disable_buttons()
 
+        # 1. Toggle the selected values in the selection bitmap of the
+        #    SQL_database. They are written to it behind.
+        #    Note: Toggling only occurs when the selected values are all 0 or
+        #          are all 1. If this situation is not the case, then all
+        #          selected values will be set to 1. Either way, all the
+        #          selected values of the dtype are the same afterwards.
+        selected = self.sql3db.selection.toggle_dtype(dtype)
+        self._dtype_toggled(dtype, selected)
+
+    def _dtype_toggled(self, dtype: str, selected: int):
+        """Method to update self.tree and the delete button after the
+        selection of items of `dtype` is toggled to `selected` in the
+        sql-database."""
         tree = self.tree
-        db = self.sql3db
 
-        def update_column_and_tag_values(fids: list, selected_values: list):
-            """Function to toggle the appearances of fidds in the Treeview
-            widget."""
-            for fid, sel in zip(fids, selected_values):
-                fid_tags = list(tree.item(fid, option='tags'))
-                if sel == 0:
-                    tree.set(fid, column="selected", value="False")
-                    fid_tags[3] = 'Not Selected'
-                    if dtype in ["Original"]:
-                        tree.tag_configure(fid, foreground=D2_C1, image='')
-                    else:
-                        tree.tag_configure(fid, foreground=D2_C2, image='')
-                else:
-                    tree.set(fid, column="selected", value="True")
-                    fid_tags[3] = 'Selected'
-                    tree.tag_configure(fid, foreground="red",
-                                       image=self.icon_delete)
-                tree.item(fid, tags=fid_tags)  # Update tags
+        # 2. Get the file items of the dtype in the Treeview widget.
+        fiids = self.get_file_items(dtype)
 
-        # 1. Toggle the values in the selected column of the SQL_database
-        #    Note: Toggling only occurs when the selected values are all 0 or
-        #          are all 1. If this situation is not the case, then all
-        #          selected values will be set to 0.
-        f_iids = db.get_selected_of_dtype(dtype)
-        if all(f_iids) or not any(f_iids):
-            db.toggle_all_selected_of_dtype(dtype)
-        else:
-            # Set all value to True
-            db.set_selected_of_dtype(dtype, "1")
-
-        # 2. Set the corresponding appearances of the attached items in the
-        #    Treeview widget.
-        #    Note: The Treeview widget only shows 3 pages of the sql_database
-        #          and not the entire sql_database. Namely, the previous,
-        #          current and next pages stored in self.shown_pages.
-        # 2.1 Get the iids of all dtype pictures attached to the Treeview widget
-        attached_iids = tree.tag_has(dtype)
-        # 2.2. Get their selected values from the sql-database
-        aselected = [db.get_selected_of_item(iid) for iid in attached_iids]
-        # 2.3. Update their appearances in the Treeview widget
-        update_column_and_tag_values(attached_iids, aselected)
-
-        # 3. Set the corresponding appearances of the detached items of the
-        #    Treeview widget.
-        # 3.1 Get detached group items
-        shown_giids = [giid for giids in self.shown_giids for giid in giids]
-        detached_giids = list(set(self.populated_giids).difference(shown_giids))
-        # 3.2 Get their children
-        detached_fiids = []
-        detached_dtype_fiids = []
-        for dgiid in detached_giids:
-            fiids = tree.get_children(dgiid)
-            detached_fiids.extend(fiids)
-            for fiid in fiids:
-                if db.get_item(fiid)[9] in dtype:
-                    detached_dtype_fiids.append(fiid)
-        # 3.3 Get the selected values of the detached items from the
-        #      sql-database
-        d_sel_values = [db.get_selected_of_item(iid) for iid in
-                        detached_dtype_fiids]
-        # 3.4 Update their appearances in the Treeview widget
-        update_column_and_tag_values(detached_dtype_fiids, d_sel_values)
+        # 3. Update their appearances in the Treeview widget
+        self.restyle_file_items(fiids, selected)
 
         # 4. Update state of delete button
         self.update_bn_delete_state()
 
         # 5. Generate virtual event <<TreeFileItemsToggled>>
+        self.is_updating = False
+        self.enable_buttons()
         tree.event_generate("<<TreeFileItemsToggled>>", when="now")
 
+    def get_file_items(self, tag: str = "File") -> list:
+        """Method returns the file items of self.tree that have `tag`, i.e.
+        "File", "Original" or "Copy", i.e. the attached items and the items
+        of the cached detached pages.
+        Note: `tag has` only finds attached items. The items of the cached
+              detached pages are read from their cache."""
+        fiids = list(self.tree.tag_has(tag))
+        for _, _, dtypes in self.detached_pages.values():
+            if tag == "File":
+                fiids.extend(chain.from_iterable(dtypes.values()))
+            else:
+                fiids.extend(dtypes[tag])
+        return fiids
+
+    def auto_select(self, **rules):
+        """Method to select the files to delete of the filtered groups with
+        the rules of DuplicatesDB.auto_select(), e.g. keep=("oldest",),
+        prefer=folder or delete_in=folder. This is done in the "dbthread";
+        the file items of self.tree are restyled after its completion."""
+        if self.is_updating:
+            return
+        self.is_updating = True
+        self.disable_buttons()
+        self.sql3db.submit("auto_select", callback=self._auto_selected,
+                           **rules)
+
+    def _auto_selected(self, nselected: int):
+        self.restyle_file_items_from_selection(self.get_file_items())
+        self.update_bn_delete_state()
+        self.is_updating = False
+        self.enable_buttons()
+        self.tree.event_generate("<<TreeFileItemsToggled>>", when="now")
+
+    def _ask_folder_to_auto_select(self, rule: str, title: str):
+        folder = filedialog.askdirectory(title=title)
+        if folder:
+            self.auto_select(**{rule: folder})
+
+    def restyle_file_items(self, fiids: list, selected: int):
+        """Method to set the shared "Selected" or "Not Selected" tag of the
+        file items of self.tree. Their tags are replaced with one `tag
+        remove` and one `tag add` command each. Their selection is held by
+        the selection bitmap of self.sql3db, i.e. their "selected" column is
+        only updated when it is displayed, i.e. in debug mode."""
+        if not fiids:
+            return
+        tree = self.tree
+        if selected:
+            old, new, value = "Not Selected", "Selected", "True"
+        else:
+            old, new, value = "Selected", "Not Selected", "False"
+        tree.tk.call(tree, "tag", "remove", old, fiids)
+        tree.tk.call(tree, "tag", "add", new, fiids)
+        if self.debug:
+            for fiid in fiids:
+                tree.set(fiid, column="selected", value=value)
+
+    def restyle_file_items_from_selection(self, fiids: list):
+        """Method to restyle the file items of self.tree that exist with
+        their values in the selection bitmap of self.sql3db."""
+        tree = self.tree
+        selection = self.sql3db.selection
+        fiids = [i for i in fiids if tree.exists(i)]
+        values = selection.get_selected_of_items(fiids)
+        self.restyle_file_items([i for i, v in zip(fiids, values) if v], 1)
+        self.restyle_file_items([i for i, v in zip(fiids, values) if not v],
+                                0)
+
+    def undo_selection(self):
+        """Method to revert the last toggle of the selection, i.e. of the
+        "Originals" or "Copies" buttons or of the clicked file items."""
+        if self.is_updating:
+            return
+        fiids = self.sql3db.selection.undo()
+        if not fiids:
+            return
+        self.restyle_file_items_from_selection(fiids)
+        self.update_bn_delete_state()
+        self.tree.event_generate("<<TreeFileItemsToggled>>")
+
     def update_bn_delete_state(self):
-        if not self.sql3db.get_selected():
+        if not self.sql3db.selection.nselected:
             self.bn_delete.state(["disabled"])
         else:
             self.bn_delete.state(["!disabled"])
@@ -568,9 +1038,13 @@ class Table(ttk.PanedWindow):
         if self.debug:
             self.bn_reset.state(["disabled"])
 
-        # 3. Get selected files from sql_database
-        selected = self.sql3db.get_fiid_giid_fpath_of_selected()
+        # 3. Get selected files from sql_database in the "dbthread". Their
+        #    deletion is done after its completion.
+        self.sql3db.submit("get_fiid_giid_fpath_of_selected",
+                           callback=self._delete_selected_files)
 
+    def _delete_selected_files(self, selected: dict):
+        """Method to delete the selected picture files."""
         # 4. Delete the selected picture files
         start = perf_counter()
         for fiid, (giid, fpath) in selected.items():
@@ -585,17 +1059,15 @@ class Table(ttk.PanedWindow):
 
     def _tree_show_next_next_page(self):
         tree = self.tree
-        db = self.sql3db
         ysb = self.ysb
 
         # 1. Exit if tree is unpopulated
-        all_pages = db.get_all_page_numbers()
+        all_pages = self.all_pages
         if not self.populated or not all_pages:
             return None
 
         # 2. Get visible giids and fiids
-        visible_giids = self.get_visible_group_iids()
-        visible_fiids = self.get_visible_file_iids()
+        visible_giids, visible_fiids = self.get_visible_items()
 
         # 3. Get coordinate of the scrollbar sash
         _, ysb_btm = ysb.get()  # 0.0 to 1.0 values denote top to bottom
@@ -622,14 +1094,13 @@ class Table(ttk.PanedWindow):
                     # Gallery widget.
                     tree.event_generate("<<TreeScrollDownDone>>", when="tail")
             else:  # B. Next page isn't last page
-                # B.1 Get File items id of next page
-                npage_fiids = []
-                for giid in self.shown_giids[2]:
-                    npage_fiids.extend(db.get_item_ids_of_group(giid))
+                # B.1 Get group items id of next page
+                npage_giids = set(self.shown_giids[2])
                 # B.2 Determine whether any visible group and file items belongs
                 #     to the next page
                 vf_in_npage = any(
-                    [fiid in npage_fiids for fiid in visible_fiids])
+                    [fiid[:fiid.index("_")] in npage_giids
+                     for fiid in visible_fiids])
                 if visible_giids:
                     vg_in_npage = any([giid in self.shown_giids[2] for giid in
                                        visible_giids])
@@ -660,76 +1131,90 @@ class Table(ttk.PanedWindow):
                                             when="tail")
 
     def create_or_reattach_next_next_page(self, visible_giids, visible_fiids):
-        tree = self.tree
-        db = self.sql3db
         if not self.is_updating:
             self.is_updating = True
             self.disable_buttons()
 
-            # B.2.T.1 Detach previous page items
-            if self.shown_giids[0]:
-                tree.detach(*self.shown_giids[0])
-
-            # B.2.T.2 Create or reattach next next page group and
-            #         file items
+            # B.2.T.1 Read the group ids of the next next page, and its rows
+            #         when they are not detached, in the "dbthread". The
+            #         next steps are done by its callback.
             nnpage = self.shown_pages[2] + 1
-            nnpage_giids = db.get_group_ids_of_page(nnpage)
-            if not set(nnpage_giids).issubset(
-                    set(self.populated_giids)):
-                # Create next next page items
-                self._populate_tree_page_from_sql3db(nnpage)
-                evg = 0
-            else:
-                # Reattach next next page items
-                for iid in nnpage_giids:
-                    tree.move(iid, "", 'end')  # reattach
-                evg = 1
-
-            # B.2.T.3 Update self.shown_pages
-            self.shown_pages = [i + 1 for i in self.shown_pages]
-
-            # B.2.T.4 Update self.shown_giids
-            self.shown_giids[0] = self.shown_giids[1]
-            self.shown_giids[1] = self.shown_giids[2]
-            self.shown_giids[2] = nnpage_giids
-
-            # B.2.T.5 Ensure visible group and file items are still
-            #         visible
-            if visible_giids:
-                for vgiid in visible_giids:
-                    tree.see(vgiid)
-            for vfiid in visible_fiids:
-                tree.see(vfiid)
-
-            # B.2.T.6 Generate virtual event
-            # Generate virtual event to initiate followup process related to
-            # creating or reattaching next page Dupgroups in self.viewport
-            # in the Gallery widget.
-            if evg == 0:
-                tree.event_generate(
-                    "<<TreePopulateNextNextPageDone>>",
-                    when="tail")
-            elif evg == 1:
-                tree.event_generate(
-                    "<<TreeReattachNextNextPageDone>>",
-                    when="tail")
-
-            self.is_updating = False
-            self.enable_buttons()
+            if nnpage not in self.detached_pages:
+                self._prefetch_page(nnpage)
+            tree = self.tree
+            self.sql3db.submit(
+                "get_group_ids_of_page", nnpage,
+                callback=lambda nnpage_giids: tree is self.tree and
+                self._show_next_next_page(nnpage, nnpage_giids,
+                                          visible_giids, visible_fiids))
+
+    def _show_next_next_page(self, nnpage, nnpage_giids, visible_giids,
+                             visible_fiids):
+        """Callback of self.create_or_reattach_next_next_page() to show the
+        group items of the next next page, nnpage, and then to detach the
+        previous page items, i.e. self.tree always has the items around its
+        viewport."""
+        tree = self.tree
+
+        # B.2.T.2 Create or reattach next next page group and file items
+        if self._reattach_page(nnpage, "end"):
+            # Reattached next next page items
+            evg = 1
+        else:
+            # Create next next page items
+            self._populate_tree_page_from_sql3db(nnpage)
+            evg = 0
+
+        # B.2.T.3 Detach previous page items
+        if self.shown_giids[0]:
+            self._detach_page(self.shown_pages[0], self.shown_giids[0])
+
+        # B.2.T.4 Update self.shown_pages
+        self.shown_pages = [i + 1 for i in self.shown_pages]
+
+        # B.2.T.5 Update self.shown_giids
+        self.shown_giids[0] = self.shown_giids[1]
+        self.shown_giids[1] = self.shown_giids[2]
+        self.shown_giids[2] = nnpage_giids
+
+        # B.2.T.6 Ensure visible group and file items are still visible
+        if visible_giids:
+            for vgiid in visible_giids:
+                tree.see(vgiid)
+        for vfiid in visible_fiids:
+            tree.see(vfiid)
+
+        # B.2.T.7 Generate virtual event
+        # Generate virtual event to initiate followup process related to
+        # creating or reattaching next page Dupgroups in self.viewport in the
+        # Gallery widget.
+        if evg == 0:
+            tree.event_generate(
+                "<<TreePopulateNextNextPageDone>>",
+                when="tail")
+        elif evg == 1:
+            tree.event_generate(
+                "<<TreeReattachNextNextPageDone>>",
+                when="tail")
+        self._page_turned()
+
+    def _page_turned(self):
+        """Method to end a page turn of self.tree, i.e. another page turn
+        can start."""
+        self.is_updating = False
+        self.enable_buttons()
 
     def _tree_show_previous_previous_page(self):
         tree = self.tree
-        db = self.sql3db
         ysb = self.ysb
 
         # 1. Exit if tree is unpopulated
-        all_pages = db.get_all_page_numbers()
+        all_pages = self.all_pages
         if not self.populated or not all_pages:
             return
 
         # 2. Get visible giids and fiids
-        visible_giids = self.get_visible_group_iids()
-        visible_fiids = self.get_visible_file_iids()
+        visible_giids, visible_fiids = self.get_visible_items()
 
         # 3 Get coordinate of the scrollbar sash
         ysb_top, _ = ysb.get()  # 0.0 to 1.0 values denote top to bottom
@@ -755,15 +1240,14 @@ class Table(ttk.PanedWindow):
                     tree.event_generate("<<TreeScrollUpDone>>", when="tail")
 
             else:  # B. Previous page isn't first page
-                # B.1 Get File items id of previous page
-                ppage_fiids = []  # previous page fiids
-                for giid in self.shown_giids[0]:
-                    ppage_fiids.extend(db.get_item_ids_of_group(giid))
+                # B.1 Get group items id of previous page
+                ppage_giids = set(self.shown_giids[0])
 
                 # B.2 Determine whether any visible group and file items belongs
                 #     to the previous page
                 vf_in_ppage = any(
-                    [fiid in ppage_fiids for fiid in visible_fiids])
+                    [fiid[:fiid.index("_")] in ppage_giids
+                     for fiid in visible_fiids])
                 if visible_giids:
                     vg_in_ppage = any(
                         [giid in self.shown_giids[0] for giid in visible_giids])
@@ -790,57 +1274,71 @@ class Table(ttk.PanedWindow):
                         tree.event_generate("<<TreeScrollUpDone>>", when="tail")
 
     def reattach_previous_previous_page(self, visible_giids, visible_fiids):
-        tree = self.tree
-        db = self.sql3db
         if not self.is_updating:
             self.disable_buttons()
             self.is_updating = True
 
-            # B.2.T.1 Detach next page items.
-            if self.shown_giids[2]:
-                tree.detach(*self.shown_giids[2])
-
-            # B.2.T.2 Reattach previous previous page group and file
-            #         items
+            # B.2.T.1 Read the group ids of the previous previous page, and
+            #         its rows when they are not detached, in the
+            #         "dbthread". The next steps are done by its callback.
             pppage = self.shown_pages[0] - 1
-            pppage_giids = db.get_group_ids_of_page(pppage)
-            if pppage_giids:
-                for iid in pppage_giids[-1:None:-1]:  # in reverse order
-                    tree.move(iid, "", 0)  # reattach
-
-            # B.2.T.3 Update self.shown_pages
-            self.shown_pages = [i - 1 for i in self.shown_pages]
-
-            # B.2.T.4 Update self.shown_giids
-            self.shown_giids[2] = self.shown_giids[1]
-            self.shown_giids[1] = self.shown_giids[0]
-            self.shown_giids[0] = pppage_giids
-
-            # B.2.T.5 Ensure visible group and file items are
-            #         still visible"
-            if visible_giids:
-                for vgiid in visible_giids[-1:None:-1]:  # in reverse order
-                    tree.see(vgiid)
-            for vfiid in visible_fiids[-1:None:-1]:  # in reverse order
-                tree.see(vfiid)
-
-            # B.2.T.6 Generate virtual event
-            # Generate virtual event to initiate followup process related to
-            # reattaching previous page Dupgroups in self.viewport in the
-            # Gallery widget.
-            tree.event_generate(
-                "<<TreeReattachPreviousPreviousPageDone>>", when="tail")
+            if pppage >= 0 and pppage not in self.detached_pages:
+                self._prefetch_page(pppage)
+            tree = self.tree
+            self.sql3db.submit(
+                "get_group_ids_of_page", pppage,
+                callback=lambda pppage_giids: tree is self.tree and
+                self._show_previous_previous_page(pppage, pppage_giids,
+                                                  visible_giids,
+                                                  visible_fiids))
+
+    def _show_previous_previous_page(self, pppage, pppage_giids,
+                                     visible_giids, visible_fiids):
+        """Callback of self.reattach_previous_previous_page() to show the
+        group items of the previous previous page, pppage, and then to detach
+        the next page items, i.e. self.tree always has the items around its
+        viewport."""
+        tree = self.tree
 
-            self.is_updating = False
-            self.enable_buttons()
+        # B.2.T.2 Reattach previous previous page group and file items.
+        #         Recreate them when they were deleted.
+        if pppage_giids and not self._reattach_page(pppage, 0):
+            self._populate_tree_page_from_sql3db(pppage, index=0)
+
+        # B.2.T.3 Detach next page items.
+        if self.shown_giids[2]:
+            self._detach_page(self.shown_pages[2], self.shown_giids[2])
+
+        # B.2.T.4 Update self.shown_pages
+        self.shown_pages = [i - 1 for i in self.shown_pages]
+
+        # B.2.T.5 Update self.shown_giids
+        self.shown_giids[2] = self.shown_giids[1]
+        self.shown_giids[1] = self.shown_giids[0]
+        self.shown_giids[0] = pppage_giids
+
+        # B.2.T.6 Ensure visible group and file items are still visible"
+        if visible_giids:
+            for vgiid in visible_giids[-1:None:-1]:  # in reverse order
+                tree.see(vgiid)
+        for vfiid in visible_fiids[-1:None:-1]:  # in reverse order
+            tree.see(vfiid)
+
+        # B.2.T.7 Generate virtual event
+        # Generate virtual event to initiate followup process related to
+        # reattaching previous page Dupgroups in self.viewport in the Gallery
+        # widget.
+        tree.event_generate(
+            "<<TreeReattachPreviousPreviousPageDone>>", when="tail")
+        self._page_turned()
 
     def update_tree_file_item_tags(self, fiid):
         """Method to update the Treeview tags of a given file item id (fiid)"""
         tree = self.tree
         db = self.sql3db
 
-        # 1. Get the fiid's "selected" column value
-        selected = db.get_selected_of_item(fiid)
+        # 1. Get the fiid's "selected" value
+        selected = db.selection.is_selected(fiid)
 
         # 2. Get fiid's Treeview tags
         f_item_tags = list(tree.item(fiid, option='tags'))  # tree f_item tag
@@ -848,15 +1346,10 @@ class Table(ttk.PanedWindow):
         # 3. Toggle fiid's Treeview tags
         if selected:  # Selected == Ture
             tree.set(fiid, column="selected", value="True")
-            f_item_tags[3] = 'Selected'
-            tree.tag_configure(fiid, foreground='red', image=self.icon_delete)
+            f_item_tags[2] = 'Selected'
         else:  # Selected == False
             tree.set(fiid, column="selected", value="False")
-            f_item_tags[3] = 'Not Selected'
-            if f_item_tags[2] in 'Original':
-                tree.tag_configure(fiid, foreground=D2_C1, image='')
-            elif f_item_tags[2] in 'Copy':
-                tree.tag_configure(fiid, foreground=D2_C2, image='')
+            f_item_tags[2] = 'Not Selected'
         tree.item(fiid, tags=f_item_tags)  # Update tags
 
     def _create_bindings(self):
@@ -865,8 +1358,18 @@ class Table(ttk.PanedWindow):
         xsb = self.xsb
 
         # Control vertical scrolling movement of self.tree and self.ysb due to
-        # mousewheel.
-        if platform.system() in "Linux":
+        # mousewheel. In the virtual mode, self.tree scrolls natively and
+        # self.ysb scrolls via self._virtual_yview().
+        if self.virtual:
+            if platform.system() in "Linux":
+                ysb.bind('<Button-4>',
+                         lambda e: self._virtual_yview(tk.SCROLL, -3, "units"))
+                ysb.bind('<Button-5>',
+                         lambda e: self._virtual_yview(tk.SCROLL, 3, "units"))
+            else:
+                ysb.bind("<MouseWheel>", lambda e: self._virtual_yview(
+                    tk.SCROLL, -3 if e.delta > 0 else 3, "units"))
+        elif platform.system() in "Linux":
             tree.bind('<Button-4>', self._event_schedule_scroll_up)
             tree.bind('<Button-5>', self._event_schedule_scroll_down)
             ysb.bind('<Button-4>', self._event_schedule_scroll_up)
@@ -876,9 +1379,11 @@ class Table(ttk.PanedWindow):
             ysb.bind("<MouseWheel>", self._event_on_mousewheel)
 
         # Control how self.tree show next next page and previous previous page
-        tree.bind("<<TreeScrollDown>>", self._event_tree_show_next_next_page)
-        tree.bind("<<TreeScrollUp>>",
-                  self._event_tree_show_previous_previous_page)
+        if not self.virtual:
+            tree.bind("<<TreeScrollDown>>",
+                      self._event_tree_show_next_next_page)
+            tree.bind("<<TreeScrollUp>>",
+                      self._event_tree_show_previous_previous_page)
 
         # Control horizontal scrolling movement of self.xsb due to mousewheel
         xsb.bind("<<AutoScrollbarOn>>", self._event_bind_xsb)
@@ -889,12 +1394,24 @@ class Table(ttk.PanedWindow):
         tree.tag_bind('File', sequence='<ButtonRelease-1>',
                       callback=self._event_b1_release_to_toggle_selection)
 
+        # 2. Use Control-z to undo the last toggle of the selection
+        tree.bind('<Control-z>', self._event_undo_selection)
+
     def _event_reset_table(self, event):
         self.reset_table()
 
+    def _event_undo_selection(self, event):
+        self.undo_selection()
+
     def event_populate_tree_the_first_time(self, event):
         self.populate_tree_the_first_time()
 
+    def _event_apply_filter(self, event):
+        self.apply_filter()
+
+    def _event_apply_sort(self, event):
+        self.apply_sort()
+
     def _event_on_mousewheel(self, event):
         """Event handler to manage Mousewheel rotation for Mac and Windows OS.
         """
@@ -1016,19 +1533,18 @@ class Table(ttk.PanedWindow):
         # 2.1. Get id of only selected file item(s)
         self.clicked_f_items = [i for i in tree.selection() if "F" in i]
 
-        # 2.2. Toggle the "selected" column value, color and the 5th tag value
-        #      of these f_items.
-        for n, fiid in enumerate(self.clicked_f_items):
-
-                # 1.Toggle fiid  "selected" column value in sql_database
-                db.toggle_selected_of_item(fiid)
+        # 2.2. Toggle the "selected" value and the shared tags of these
+        #      f_items.
+        if self.clicked_f_items:
+            # 1. Toggle their values in the selection bitmap of sql_database
+            #    as one batch. They are written to it behind.
+            db.selection.toggle(self.clicked_f_items)
 
-                # 2.Update the Treeview tags of a given file item id (fiid)
-                self.update_tree_file_item_tags(fiid)
+            # 2. Update their Treeview tags in one pass
+            self.restyle_file_items_from_selection(self.clicked_f_items)
 
-                # 3. Generate virtual event to allow immediate follow-up action
-                if n == 0:
-                    tree.event_generate("<<MoveDupGroupToTop>>")
+            # 3. Generate virtual event to allow immediate follow-up action
+            tree.event_generate("<<MoveDupGroupToTop>>")
 
         # 2.3. Update state of delete button
         self.update_bn_delete_state()
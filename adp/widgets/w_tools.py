@@ -2,7 +2,8 @@
 import tkinter as tk
 import tkinter.font
 
-__all__ = ["string_pixel_size", "get_geometry_values", "str_geometry_values"]
+__all__ = ["string_pixel_size", "FontMeasurer", "get_geometry_values",
+           "str_geometry_values"]
 __version__ = '0.1.1'
 __license__ = "Apache License, Version 2.0"
 __copyright__ = "Copyright 2024, Chia Yan Hon, Julian."
@@ -11,7 +12,7 @@ __email__ = "julianchiayh@gmail.com"
 
 
 def string_pixel_size(text, family, size, weight=tk.NORMAL, slant="roman",
-                      underline=False, overstrike=False):
+                      underline=False, overstrike=False, root=None):
     """ Function returns the width and height of a given text.
     Args:
      family	The font family name as a string.
@@ -23,14 +24,105 @@ def string_pixel_size(text, family, size, weight=tk.NORMAL, slant="roman",
      slant	'italic' for italic, 'roman' for unslanted.
      underline	1 for underlined text, 0 for normal.
      overstrike	1 for overstruck text, 0 for normal.
+     root	A widget of the Tk instance of the font. Default is the default
+            root window.
     """
-    rfont = tk.font.Font(family=family, size=size, weight=weight, slant=slant,
-                         underline=underline, overstrike=overstrike)
+    rfont = FontMeasurer.get(root=root, family=family, size=size,
+                             weight=weight, slant=slant, underline=underline,
+                             overstrike=overstrike)
     w = rfont.measure(text)  # string pixel width
-    h = rfont.metrics("linespace")  # string pixel height
+    h = rfont.linespace  # string pixel height
     return w, h
 
 
+class FontMeasurer:
+    """Class to measure the pixel width of strings in a font without the cost
+    of creating a tk.font.Font instance for every measurement.
+
+    Its tk.font.Font instance is reused and the width of every measured
+    string is memoized. Alternatively, the width of a string can be
+    estimated from the memoized width of each of its characters, i.e.
+    without calling Tk at all. The estimate ignores kerning, so it is good
+    for finding the longest of many strings which is then measured exactly.
+
+    Instances are shared per font and per Tk instance via the .get() class
+    method. The instances of a Tk instance are forgotten when its root window
+    is destroyed, i.e. a new Tk instance does not reuse the fonts of an old
+    one.
+
+    User Methods:
+    .measure(text) - returns the exact pixel width of text
+    .estimate(text) - returns the estimated pixel width of text
+    .longest(texts) - returns the text with the largest estimated width
+    .char_widths() - returns a copy of the memoized character widths, e.g.
+                     to estimate widths in another thread
+    """
+    _instances = {}  # {Tk interpreter: {font options: FontMeasurer, ...}, ...}
+    maxsize = 100_000  # max. quantity of memoized strings
+
+    def __init__(self, family, size, weight=tk.NORMAL, slant="roman",
+                 underline=False, overstrike=False, root=None):
+        self.font = tk.font.Font(root=root, family=family, size=size,
+                                 weight=weight, slant=slant,
+                                 underline=underline, overstrike=overstrike)
+        self.linespace = self.font.metrics("linespace")
+        self._widths = {}  # {text: pixel width, ...}
+        self._char_widths = {}  # {character: pixel width, ...}
+
+    @classmethod
+    def get(cls, root=None, **font):
+        """Method returns the shared FontMeasurer instance of a font of the
+        Tk instance of widget root, i.e. of the default root window when root
+        is None."""
+        if root is None:
+            root = tk._get_default_root("measure a font")
+        root = root._root()
+        try:
+            measurers = cls._instances[root.tk]
+        except KeyError:
+            measurers = cls._instances[root.tk] = {}
+            root.bind("<Destroy>", lambda event: cls._forget(event, root),
+                      add="+")
+        key = tuple(sorted(font.items()))
+        try:
+            return measurers[key]
+        except KeyError:
+            measurer = measurers[key] = cls(root=root, **font)
+            return measurer
+
+    @classmethod
+    def _forget(cls, event, root) -> None:
+        """Method to forget the instances of the Tk instance of root when
+        root is destroyed. The <Destroy> events of its children are
+        ignored."""
+        if event.widget is root:
+            cls._instances.pop(root.tk, None)
+
+    def measure(self, text: str) -> int:
+        try:
+            return self._widths[text]
+        except KeyError:
+            if len(self._widths) >= self.maxsize:
+                self._widths.clear()
+            width = self._widths[text] = self.font.measure(text)
+            return width
+
+    def estimate(self, text: str) -> int:
+        widths = self._char_widths
+        try:
+            return sum([widths[c] for c in text])
+        except KeyError:
+            for c in set(text).difference(widths):
+                widths[c] = self.font.measure(c)
+            return sum([widths[c] for c in text])
+
+    def longest(self, texts):
+        return max(texts, key=self.estimate)
+
+    def char_widths(self) -> dict:
+        return dict(self._char_widths)
+
+
 def get_geometry_values(geo: str):
     """Function to return the integer values of the (width, height, x, y) that
     is returned by tkinter w.winfo_geometry() method."""
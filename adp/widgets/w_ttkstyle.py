@@ -124,6 +124,15 @@ def customise_ttk_widgets_style(ss):
     #                   ]
     #       )
 
+    # ttk.Entry
+    ss.configure('Filter.TEntry', fieldbackground=BG2, foreground=FG,
+                 insertcolor=FG, padding=2)
+
+    # ttk.Combobox
+    ss.configure('Filter.TCombobox', arrowcolor=FG, padding=2)
+    ss.map('Filter.TCombobox', fieldbackground=[('readonly', BG2)],
+           foreground=[('readonly', FG)], background=[('readonly', BG)])
+
     # ttk.Panedwindow
     ss.configure("TPanedwindow", background="orange")
     # ss.configure("TPanedwindow", background="#8c8cee")
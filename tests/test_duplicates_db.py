@@ -0,0 +1,223 @@
+# Python modules
+import os
+import time
+import unittest
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from itertools import count
+
+# Project module
+from adp.widgets.duplicates_db import DuplicatesDB, DuplicatesDBWorker
+
+
+class TestAutoSelect(unittest.TestCase):
+    """Tests of DuplicatesDB.auto_select()."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.sdir = Path(self._tmpdir.name)
+        (self.sdir / "a").mkdir()
+        (self.sdir / "b_x").mkdir()
+        dups = {}
+        for n in range(3):
+            # The copy in b_x is older, i.e. it is kept by the "oldest" rule
+            # unless prefer or delete_in says otherwise.
+            paths = [self.sdir / "b_x" / f"p{n}.jpg",
+                     self.sdir / "a" / f"p{n}.jpg"]
+            for m, path in enumerate(paths):
+                path.write_bytes(b"x" * 10)
+                os.utime(path, (time.time() + m, time.time() + m))
+            dups[f"{n:016x}"] = set(paths)
+        self.db = DuplicatesDB()
+        self.db.populate(str(self.sdir), dups)
+
+    def tearDown(self):
+        self.db.con.close()
+        self._tmpdir.cleanup()
+
+    def get_selected_folders(self) -> set:
+        self.db.cur.execute(
+            """SELECT full_path FROM duplicates WHERE selected""")
+        return {Path(i[0]).parent.name for i in self.db.cur.fetchall()}
+
+    def test_prefer_and_delete_in(self):
+        nselected = self.db.auto_select(prefer=str(self.sdir / "a"),
+                                        delete_in=str(self.sdir / "b_x"))
+        self.assertEqual(nselected, 3)
+        self.assertEqual(self.get_selected_folders(), {"b_x"})
+
+    def test_delete_in(self):
+        nselected = self.db.auto_select(delete_in=str(self.sdir / "a"))
+        self.assertEqual(nselected, 3)
+        self.assertEqual(self.get_selected_folders(), {"a"})
+
+
+class TestPopulate(unittest.TestCase):
+    """Tests of DuplicatesDB.populate()."""
+
+    def test_ctimes_of_the_scan_are_used(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = [str(Path(tmpdir) / f"p{m}.jpg") for m in range(3)]
+            for path in paths:
+                Path(path).write_bytes(b"x" * 10)
+            # The newest file by name is the oldest by the captured ctimes
+            ctimes = {path: 1_000_000 - m for m, path in enumerate(paths)}
+            db = DuplicatesDB()
+            db.populate(tmpdir, {"0" * 16: set(paths)}, ctimes=ctimes)
+            db.cur.execute("""SELECT full_path, create_on, dtype
+                           FROM duplicates ORDER BY sn""")
+            rows = db.cur.fetchall()
+            db.con.close()
+        self.assertEqual([i[0] for i in rows], paths[::-1])
+        self.assertEqual(rows[0][2], "Original")
+        self.assertEqual(rows[0][1], datetime.fromtimestamp(
+            ctimes[paths[2]]).strftime("%Y-%m-%d %H:%M:%S"))
+
+
+class TestDeleteFiid(unittest.TestCase):
+    """Tests of the rows of DuplicatesDB after DuplicatesDB.delete_fiid()."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        sdir = Path(self._tmpdir.name)
+        dups = {}
+        for n in range(3):
+            paths = [sdir / f"p{n}_{m}.jpg" for m in range(3)]
+            for path in paths:
+                path.write_bytes(b"x" * 10)
+            dups[f"{n:016x}"] = set(paths)
+        self.db = DuplicatesDB()
+        self.db.populate(str(sdir), dups)
+
+    def tearDown(self):
+        self.db.con.close()
+        self._tmpdir.cleanup()
+
+    def get_first_rows(self) -> list:
+        rows = self.db.get_items_of_rows(0, self.db.get_quantity_of_rows())
+        return sorted({row[0] for row in rows})
+
+    def test_rows_move_up(self):
+        self.assertEqual(self.get_first_rows(), [0, 4, 8])
+        first, second = self.db.get_group_ids_of_page(0)[:2]
+        self.db.delete_fiid(self.db.get_files_of_groups([first])[first][0][0])
+        self.assertEqual(self.get_first_rows(), [0, 3, 7])
+        for fiid in self.db.get_files_of_groups([second])[second][0]:
+            self.db.delete_fiid(fiid)
+        self.assertEqual(self.db.get_quantity_of_rows(), 7)
+        self.assertEqual(self.get_first_rows(), [0, 3])
+
+
+class TestDuplicatesDBWorker(unittest.TestCase):
+    """Tests of the prefetched reads of DuplicatesDBWorker."""
+
+    def setUp(self):
+        self.worker = DuplicatesDBWorker(None)  # no callbacks, no tk master
+
+    def tearDown(self):
+        self.worker.close()
+
+    def test_prefetch_key_includes_kwargs(self):
+        self.worker.prefetch("get_totals_of_dtype", dtype="Copy")
+        self.worker.get_totals_of_dtype(dtype="Original")
+        self.assertEqual(len(self.worker._prefetched), 1)
+        self.worker.get_totals_of_dtype(dtype="Copy")
+        self.assertFalse(self.worker._prefetched)
+
+
+class FakeMaster:
+    """Stand-in of a tkinter widget whose after() calls are run by
+    run_after_calls()."""
+
+    def __init__(self):
+        self.calls = {}  # {after_id: (ms, func), ...}
+        self._ids = count()
+
+    def after(self, ms, func):
+        after_id = next(self._ids)
+        self.calls[after_id] = (ms, func)
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.calls.pop(after_id, None)
+
+    def run_after_calls(self) -> list:
+        """Method to run the scheduled calls once and returns their
+        delays."""
+        calls, self.calls = self.calls, {}
+        for ms, func in calls.values():
+            func()
+        return [ms for ms, _ in calls.values()]
+
+
+class TestDuplicatesDBWorkerCallbacks(unittest.TestCase):
+    """Tests of the callbacks of DuplicatesDBWorker."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        sdir = Path(self._tmpdir.name)
+        self.dups = {}
+        for n in range(3):
+            paths = [sdir / f"p{n}.jpg", sdir / f"p{n}_copy.jpg"]
+            for path in paths:
+                path.write_bytes(b"x" * 10)
+            self.dups[f"{n:016x}"] = set(paths)
+        self.sdir = str(sdir)
+        self.master = FakeMaster()
+        self.worker = DuplicatesDBWorker(self.master)
+
+    def tearDown(self):
+        self.worker.close()
+        self._tmpdir.cleanup()
+
+    def wait_for_callbacks(self):
+        while self.worker._ncallbacks:
+            time.sleep(0.001)
+            self.master.run_after_calls()
+
+    def test_callbacks_are_drained_in_one_poll(self):
+        results = []
+        futures = [self.worker.submit("get_totals_of_dtype", dtype,
+                                      callback=results.append)
+                   for dtype in ("Original", "Copy", "Original")]
+        for future in futures:
+            future.result()
+        self.master.run_after_calls()
+        self.assertEqual(len(results), 3)
+        self.assertFalse(self.master.calls)  # polling stopped
+
+    def test_exceptions_go_to_errback_or_log(self):
+        errors = []
+        self.worker.submit("get_group_ids_of_page", callback=errors.append,
+                           errback=errors.append)
+        with self.assertLogs("adp.widgets.duplicates_db", "ERROR"):
+            self.worker.submit("get_group_ids_of_page", callback=print)
+            self.wait_for_callbacks()
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], TypeError)
+
+    def test_callback_of_write_sees_reloaded_selection(self):
+        seen = []
+        self.worker.submit("populate", self.sdir, self.dups)
+        self.worker.submit(
+            "auto_select", callback=lambda n: seen.append(
+                (n, self.worker.selection.nselected)))
+        self.wait_for_callbacks()
+        self.assertEqual(seen, [(3, 3)])
+
+    def test_toggles_during_reload_are_kept(self):
+        self.worker.submit("populate", self.sdir, self.dups)
+        self.wait_for_callbacks()
+        selection = self.worker.selection
+        fiid = next(iter(selection._sns))
+        self.worker.submit("set_filter")
+        selection.toggle([fiid])
+        self.worker.flush_selection()  # written while the reload is due
+        self.wait_for_callbacks()
+        self.assertTrue(selection.is_selected(fiid))
+        self.assertEqual(selection.nselected, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
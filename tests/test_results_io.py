@@ -0,0 +1,43 @@
+# Python modules
+import unittest
+import tempfile
+from pathlib import Path
+
+# Project module
+from adp.functions.results_io import (write_rows, read_rows,
+                                      export_rasterimages, import_rasterimages,
+                                      export_duplicates, import_duplicates)
+
+
+class TestResultsIO(unittest.TestCase):
+    """Tests of the export and import of results."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = Path(self._tmpdir.name)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_empty_results(self):
+        for suffix in (".jsonl", ".csv", ".npz"):
+            with self.subTest(suffix=suffix):
+                path = self.tmpdir / f"duplicates{suffix}"
+                self.assertEqual(export_duplicates({}, path), 0)
+                self.assertEqual(import_duplicates(path), {})
+                path = self.tmpdir / f"pictures{suffix}"
+                self.assertEqual(export_rasterimages([], path), 0)
+                self.assertEqual(list(import_rasterimages(path)), [])
+
+    def test_none_in_str_column(self):
+        fields = ("path", "note")
+        rows = [("a.jpg", None), ("b.jpg", ""), ("c.jpg", "ü")]
+        for suffix in (".jsonl", ".npz"):
+            with self.subTest(suffix=suffix):
+                path = self.tmpdir / f"rows{suffix}"
+                write_rows(rows, fields, path)
+                self.assertEqual(list(read_rows(path)), [fields] + rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+# Python modules
+import queue
+import unittest
+
+# Project module
+from adp.functions.thumbnail_scheduler import (ThumbnailScheduler, VISIBLE,
+                                               PREFETCH)
+
+
+def _size(fpath: str) -> tuple:
+    return fpath, len(fpath)
+
+
+class TestThumbnailScheduler(unittest.TestCase):
+    """Tests of the ("completed", ()) signal of ThumbnailScheduler."""
+
+    def setUp(self):
+        self.rqueue = queue.Queue()
+        self.scheduler = ThumbnailScheduler(_size, self.rqueue, ncpu=1,
+                                            cfe="thread")
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def get_kinds(self, n: int) -> list:
+        return [self.rqueue.get(timeout=5)[0] for _ in range(n)]
+
+    def test_completed_after_batch(self):
+        with self.scheduler.batch():
+            for n in range(5):
+                self.scheduler.submit("G0", f"G0_{n}", f"p{n}", VISIBLE)
+        self.assertEqual(self.get_kinds(6), ["thumbnail"] * 5 + ["completed"])
+        self.assertTrue(self.rqueue.empty())
+
+    def test_cancel_does_not_complete(self):
+        with self.scheduler.batch():
+            for n in range(5):
+                self.scheduler.submit("G0", f"G0_{n}", f"p{n}", VISIBLE)
+            self.scheduler.cancel()
+            self.scheduler.submit("G1", "G1_0", "q0", VISIBLE)
+        kinds = self.get_kinds(1)
+        while kinds[-1] != "completed":
+            kinds += self.get_kinds(1)
+        self.assertEqual(kinds.count("completed"), 1)
+        self.assertFalse(len(self.scheduler))
+
+    def test_prefetch_does_not_complete(self):
+        self.scheduler.submit("G0", "G0_0", "p0", PREFETCH)
+        self.assertEqual(self.get_kinds(1), ["thumbnail"])
+        with self.assertRaises(queue.Empty):
+            self.rqueue.get(timeout=0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
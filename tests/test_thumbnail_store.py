@@ -0,0 +1,218 @@
+# Python modules
+import io
+import struct
+import hashlib
+import unittest
+import tempfile
+from pathlib import Path
+
+# External Packages
+from PIL import Image
+
+# Project module
+from adp.functions import thumbnail_store
+
+
+def save_jpeg_with_exif_thumbnail(path, img: Image.Image, thumb: Image.Image,
+                                  orientation: int = 1) -> None:
+    """Function to save img as a JPEG at path with thumb as the JPEG
+    thumbnail of its EXIF data, i.e. in IFD1 like a camera does, and an
+    Orientation tag in IFD0."""
+    data = io.BytesIO()
+    thumb.save(data, "JPEG")
+    data = data.getvalue()
+    # TIFF header, IFD0 of 1 entry at 8, IFD1 of 2 entries at 26 and the
+    # thumbnail at 56. The offsets are from the TIFF header.
+    tiff = b"II*\x00" + struct.pack("<I", 8)
+    tiff += struct.pack("<H", 1) + \
+        struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0) + \
+        struct.pack("<I", 26)
+    tiff += struct.pack("<H", 2) + \
+        struct.pack("<HHII", 0x0201, 4, 1, 56) + \
+        struct.pack("<HHII", 0x0202, 4, 1, len(data)) + struct.pack("<I", 0)
+    img.save(path, "JPEG", exif=b"Exif\x00\x00" + tiff + data)
+
+
+class TestFreedesktopThumbnails(unittest.TestCase):
+    """Tests of the freedesktop.org thumbnails of thumbnail_store."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = Path(self._tmpdir.name)
+        self._freedesktop_dir = thumbnail_store.FREEDESKTOP_DIR
+        thumbnail_store.FREEDESKTOP_DIR = self.tmpdir / "thumbnails"
+
+    def tearDown(self):
+        thumbnail_store.FREEDESKTOP_DIR = self._freedesktop_dir
+        self._tmpdir.cleanup()
+
+    def test_uri_of_name_with_parentheses(self):
+        path = self.tmpdir / "IMG (1) it's #2.jpg"
+        uri, name = thumbnail_store._get_freedesktop_uri_and_name(path)
+        # As escaped by g_filename_to_uri() of GLib
+        expected = f"file://{self.tmpdir}/IMG%20(1)%20it's%20%232.jpg"
+        self.assertEqual(uri, expected)
+        self.assertEqual(name,
+                         f"{hashlib.md5(expected.encode()).hexdigest()}.png")
+
+    def test_put_and_get(self):
+        path = self.tmpdir / "IMG (1).jpg"
+        Image.new("RGB", (640, 480), "red").save(path)
+        thumb = Image.new("RGB", (256, 192), "red")
+        thumbnail_store.put_freedesktop_thumbnail(path, thumb)
+        img = thumbnail_store.get_freedesktop_thumbnail(path, (200, 200))
+        self.assertEqual(img.size, (200, 150))
+
+
+class TestThumbnailStore(unittest.TestCase):
+    """Tests of the capacity and the cleanup of ThumbnailStore."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = Path(self._tmpdir.name)
+        self.paths = []
+        for n in range(3):
+            path = self.tmpdir / f"p{n}.jpg"
+            Image.new("RGB", (64, 48), (n, 0, 0)).save(path)
+            self.paths.append(path)
+        psize = (20, 20)
+        self.capacity = 2 * psize[0] * psize[1] * 3  # 2 slots
+        self.store = thumbnail_store.ThumbnailStore(self.tmpdir / "cache",
+                                                    psize, self.capacity)
+
+    def tearDown(self):
+        self.store.close()
+        self._tmpdir.cleanup()
+
+    def put_all(self):
+        for n, path in enumerate(self.paths):
+            self.store.put(path, Image.new("RGB", (20, 15), (n, 0, 0)))
+
+    def test_capacity(self):
+        self.put_all()
+        self.assertIsNone(self.store.get(self.paths[0]))  # reused slot
+        for n, path in enumerate(self.paths[1:], 1):
+            self.assertEqual(self.store.get(path).getpixel((0, 0)),
+                             (n, 0, 0))
+        atlases = list(self.store.directory.glob("*.atlas"))
+        self.assertLessEqual(sum(i.stat().st_size for i in atlases),
+                             self.capacity)
+
+    def test_clear(self):
+        self.put_all()
+        stale = list(self.store.directory.glob("*.atlas"))
+        self.store.clear()
+        # The mapped atlas files are kept until a store is opened again.
+        self.assertTrue(all(i.exists() for i in stale))
+        self.assertTrue(all(self.store.get(p) is None for p in self.paths))
+        self.put_all()
+        self.assertIsNotNone(self.store.get(self.paths[2]))
+        self.store.close()
+        self.store = thumbnail_store.ThumbnailStore(
+            self.store.directory, self.store.psize, self.capacity)
+        self.assertFalse(any(i.exists() for i in stale))
+        self.assertIsNotNone(self.store.get(self.paths[2]))
+
+    def test_slot_rewritten_while_copied(self):
+        self.store.put(self.paths[0], Image.new("RGB", (20, 15), "red"))
+        # Another process reuses the slot between the index read and the
+        # copy of get().
+        other = thumbnail_store.ThumbnailStore(
+            self.store.directory, self.store.psize, self.capacity)
+        locate = self.store._locate
+
+        def rewrite_then_locate(slot):
+            other.put(self.paths[1], Image.new("RGB", (20, 15), "blue"))
+            other.put(self.paths[2], Image.new("RGB", (20, 15), "lime"))
+            return locate(slot)
+
+        self.store._locate = rewrite_then_locate
+        try:
+            self.assertIsNone(self.store.get(self.paths[0]))
+        finally:
+            self.store._locate = locate
+            other.close()
+        self.assertEqual(self.store.get(self.paths[2]).getpixel((0, 0)),
+                         (0, 255, 0))
+
+    def test_other_capacity_clears(self):
+        self.put_all()
+        self.store.close()
+        self.store = thumbnail_store.ThumbnailStore(
+            self.store.directory, self.store.psize, 4 * self.capacity)
+        self.assertTrue(all(self.store.get(p) is None for p in self.paths))
+
+    def test_remove_stores_of_other_psizes(self):
+        self.put_all()
+        other = thumbnail_store.ThumbnailStore(self.store.directory,
+                                               (30, 30), self.capacity)
+        other.put(self.paths[0], Image.new("RGB", (30, 20)))
+        other.close()
+        thumbnail_store._remove_stores(self.store.directory, {(20, 20)})
+        names = {i.name for i in self.store.directory.iterdir()}
+        self.assertTrue(names)
+        self.assertFalse([i for i in names if "30x30" in i])
+        self.assertIsNotNone(self.store.get(self.paths[2]))
+
+
+class TestExifThumbnail(unittest.TestCase):
+    """Tests of get_exif_thumbnail() with the 160x120 IFD1 thumbnail of a
+    camera."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmpdir.name) / "camera.jpg"
+        save_jpeg_with_exif_thumbnail(
+            self.path, Image.new("RGB", (1600, 1200), "red"),
+            Image.new("RGB", (160, 120), "lime"))
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_enlarged_to_the_default_size(self):
+        with Image.open(self.path) as img:
+            thumb = thumbnail_store.get_exif_thumbnail(img, (200, 200))
+        self.assertEqual(thumb.size, (200, 150))
+        r, g, b = thumb.getpixel((100, 75))
+        self.assertGreater(g, 200)
+        self.assertLess(r, 50)
+
+    def test_too_small(self):
+        with Image.open(self.path) as img:
+            self.assertIsNone(
+                thumbnail_store.get_exif_thumbnail(img, (256, 256)))
+            self.assertIsNotNone(
+                thumbnail_store.get_exif_thumbnail(img, (256, 256), 0.6))
+
+
+class TestImageToPPM(unittest.TestCase):
+    """Tests of the binary PGM and PPM data of image_to_ppm()."""
+
+    def decode(self, ppm: bytes) -> tuple:
+        """Method returns the magic number, width, height, maxval and pixels
+        of a binary PGM or PPM image with a single space separated
+        header."""
+        header, pixels = ppm.split(b"\n", 1)
+        magic, width, height, maxval = header.split(b" ")
+        return magic, int(width), int(height), int(maxval), pixels
+
+    def test_modes(self):
+        noise = Image.frombytes("RGB", (7, 5), bytes(range(105)))
+        pictures = {"L": (noise.convert("L"), b"P5", "L"),
+                    "RGB": (noise, b"P6", "RGB"),
+                    "RGBA": (noise.convert("RGBA"), b"P6", "RGB"),
+                    "P": (noise.convert("P"), b"P6", "RGB")}
+        for mode, (img, magic, pmode) in pictures.items():
+            with self.subTest(mode=mode):
+                ppm = thumbnail_store.image_to_ppm(img)
+                self.assertEqual(self.decode(ppm), (
+                    magic, 7, 5, 255, img.convert(pmode).tobytes()))
+                with Image.open(io.BytesIO(ppm)) as decoded:
+                    self.assertEqual(decoded.mode, pmode)
+                    self.assertEqual(decoded.size, (7, 5))
+                    self.assertEqual(decoded.tobytes(),
+                                     img.convert(pmode).tobytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
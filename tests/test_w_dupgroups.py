@@ -0,0 +1,105 @@
+# Python modules
+import unittest
+import tkinter as tk
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# External Packages
+from PIL import Image
+
+# Project module
+from adp.widgets import w_dupgroups
+from tests.test_thumbnail_store import save_jpeg_with_exif_thumbnail
+
+
+def has_display() -> bool:
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        return False
+    return True
+
+
+class TestGetThumbnail(unittest.TestCase):
+    """Tests of the mode of the thumbnails of w_dupgroups.get_thumbnail()."""
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.tmpdir = Path(self._tmpdir.name)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_decoded_thumbnails_are_rgb(self):
+        pictures = {"rgba.png": Image.new("RGBA", (640, 480), (9, 0, 0, 99)),
+                    "la.png": Image.new("LA", (640, 480)),
+                    "l.png": Image.new("L", (640, 480)),
+                    "p.gif": Image.new("P", (640, 480))}
+        with mock.patch.object(w_dupgroups, "get_thumbnail_store",
+                               return_value=None), \
+                mock.patch.object(w_dupgroups, "get_freedesktop_thumbnail",
+                                  return_value=None):
+            for name, img in pictures.items():
+                with self.subTest(name=name):
+                    path = self.tmpdir / name
+                    img.save(path)
+                    thumb = w_dupgroups.get_thumbnail(str(path), (200, 200))
+                    self.assertEqual(thumb.mode, "RGB")
+                    self.assertEqual(thumb.size, (200, 150))
+
+    def test_exif_thumbnail_is_rgb_and_upright(self):
+        path = self.tmpdir / "camera.jpg"
+        # Orientation 6, i.e. the camera was turned clockwise.
+        save_jpeg_with_exif_thumbnail(
+            path, Image.new("RGB", (1600, 1200), "red"),
+            Image.new("L", (160, 120), 255), orientation=6)
+        thumb = w_dupgroups.open_picture_for_thumbnail(str(path), (200, 200))
+        self.assertEqual(thumb.mode, "RGB")
+        self.assertEqual(thumb.size, (150, 200))
+        self.assertEqual(thumb.getpixel((75, 100)), (255, 255, 255))
+
+
+@unittest.skipUnless(has_display(), "needs a display")
+class TestDupGroupPooling(unittest.TestCase):
+    """Tests of the reuse of a DupGroup instance with .release() and
+    .rebind()."""
+
+    def setUp(self):
+        self.root = tk.Tk()
+        self.dg = w_dupgroups.DupGroup(
+            self.root, "G0", ["G0_F0", "G0_F1", "G0_F2"], ["a", "b", "c"],
+            [0, 1, 0], with_image=False, total_bytes=30)
+        self.dg.grid()
+        self.ppm = w_dupgroups.image_to_ppm(Image.new("RGB", (4, 3)))
+
+    def tearDown(self):
+        self.root.destroy()
+
+    def test_release_deletes_thumbnails_and_hides(self):
+        self.dg.set_thumbnail("G0_F0", self.ppm)
+        name = self.dg.imf_thumbnails["G0_F0"].name
+        self.dg.release()
+        self.assertNotIn(name, self.root.image_names())
+        self.assertFalse(self.dg.imf_thumbnails)
+        self.assertFalse(self.dg.grid_info())
+
+    def test_rebind_reuses_checkbuttons(self):
+        self.dg.set_thumbnail("G0_F1", self.ppm)
+        name = self.dg.imf_thumbnails["G0_F1"].name
+        cbs = [cb for cb, _ in self.dg._checkbuttons]
+        self.dg.release()
+        self.dg.rebind("G7", ["G7_F0", "G7_F1"], ["d", "e"], [1, 0],
+                       total_bytes=20)
+        self.assertNotIn(name, self.root.image_names())
+        self.assertEqual([cb for cb, _ in self.dg._checkbuttons], cbs)
+        self.assertEqual(list(self.dg.imf_checkbuttons), ["G7_F0", "G7_F1"])
+        self.assertEqual(self.dg.imf_checkvalues["G7_F0"].get(), 1)
+        self.assertEqual(str(cbs[0]["text"]), "G7_F0")
+        self.assertFalse(cbs[2].grid_info())  # the surplus is hidden
+        self.assertEqual(self.dg.iff_lbgrp["text"], "Duplicates Group 7:")
+        self.assertEqual(self.dg.iff_lbnimages["text"], "2 Pictures")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+# Python modules
+import unittest
+from unittest import mock
+
+# Project module
+from adp.widgets.w_gallery import Gallery
+
+
+class TestShowFirstVisibleGroupItem(unittest.TestCase):
+    """Tests of Gallery.show_1st_visible_treeview_groupitem_in_viewport()
+    when the viewport cannot follow self.tree. A mock stands in for the
+    Gallery instance, i.e. no display is needed."""
+
+    def setUp(self):
+        self.gallery = mock.Mock()
+        self.gallery.dupgroupsframe.dupgroups = {}
+        self.gallery.viewport.interior.winfo_reqheight.return_value = 100
+
+    def show(self, vgiids: list, vfiids: list):
+        self.gallery.get_visible_items.return_value = (vgiids, vfiids)
+        Gallery.show_1st_visible_treeview_groupitem_in_viewport(self.gallery)
+
+    def test_no_visible_items(self):
+        self.show([], [])
+        self.gallery.viewport.canvas.yview_moveto.assert_not_called()
+
+    def test_dupgroup_not_created(self):
+        self.show(["G3"], ["G3_F0"])
+        self.show([], ["G4_F1"])
+        self.gallery.viewport.canvas.yview_moveto.assert_not_called()
+
+    def test_dupgroup_of_visible_file_item(self):
+        dg = mock.Mock()
+        dg.winfo_y.return_value = 25
+        self.gallery.dupgroupsframe.dupgroups["G4"] = dg
+        self.show([], ["G4_F1", "G4_F2"])
+        self.gallery.viewport.canvas.yview_moveto.assert_called_once_with(
+            0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()